@@ -7,6 +7,8 @@ extends Node2D
 const HERO_BASE_PATH := "res://assets/sprites/generated/heroes/"
 const MONSTER_PATH := "res://assets/sprites/generated/monsters/"
 const FOLLOWER_PATH := "res://assets/sprites/generated/followers/"
+# Written by tools/generate_sprites.py --trim: where each cropped sprite sat on its canvas
+const TRIM_INDEX_PATH := "res://assets/sprite_trim.json"
 
 # Pose regions within a 192x64 strip
 const POSE_IDLE := Rect2(0, 0, 64, 64)
@@ -26,6 +28,11 @@ var _base_sprite: Sprite2D
 var _atlas_texture: AtlasTexture
 var _idle_tween: Tween
 var _initialized: bool = false
+var _trim_offset := Vector2.ZERO
+
+# Cached trim index (loaded once)
+static var _trim_index: Dictionary = {}
+static var _trim_loaded: bool = false
 
 
 func _ready() -> void:
@@ -69,6 +76,7 @@ func set_follower(follower_key: String) -> void:
 		_base_sprite.texture = tex
 		_base_sprite.visible = true
 		_atlas_texture = null  # Not a strip
+		_apply_trim(path)
 
 
 ## Flip horizontally (for left/right positioning).
@@ -76,6 +84,7 @@ func set_flipped(flipped: bool) -> void:
 	_ensure_sprite()
 	_is_flipped = flipped
 	_base_sprite.flip_h = flipped
+	_update_offset()
 
 
 ## Switch to the specified pose (idle, attack, hurt).
@@ -166,6 +175,40 @@ func stop_idle_bob() -> void:
 
 # ── Internal ──────────────────────────────────────────────────────────
 
+static func _load_trim_index() -> void:
+	if _trim_loaded:
+		return
+	_trim_loaded = true
+	var file := FileAccess.open(TRIM_INDEX_PATH, FileAccess.READ)
+	if file:
+		var data = JSON.parse_string(file.get_as_text())
+		file.close()
+		if data is Dictionary:
+			_trim_index = data
+
+
+## Offset a trimmed sprite so it draws where its full canvas would have.
+## Returns true if the texture at path was trimmed.
+func _apply_trim(path: String) -> bool:
+	_load_trim_index()
+	var entry = _trim_index.get(path.trim_prefix("res://assets/"))
+	_trim_offset = Vector2.ZERO
+	if entry is Dictionary:
+		var canvas: Array = entry["canvas"]
+		var offset: Array = entry["offset"]
+		var size: Array = entry["size"]
+		# Sprite2D centers the texture, so shift by (trimmed center - canvas center)
+		_trim_offset = Vector2(offset[0] + size[0] * 0.5 - canvas[0] * 0.5,
+				offset[1] + size[1] * 0.5 - canvas[1] * 0.5)
+	_update_offset()
+	return entry is Dictionary
+
+
+## flip_h mirrors the texture about its own center, so mirror the trim offset too.
+func _update_offset() -> void:
+	_base_sprite.offset = Vector2(-_trim_offset.x if _is_flipped else _trim_offset.x, _trim_offset.y)
+
+
 func _load_sprite(path: String) -> void:
 	var tex = load(path)
 	if not tex:
@@ -175,8 +218,9 @@ func _load_sprite(path: String) -> void:
 	# Check if it's a 3-frame strip (width ~= 3 * height) or a single frame
 	var tex_width: int = tex.get_width()
 	var tex_height: int = tex.get_height()
+	var trimmed := _apply_trim(path)
 
-	if tex_width >= tex_height * 2:
+	if tex_width >= tex_height * 2 and not trimmed:
 		# Strip format — use AtlasTexture with pose regions
 		var atlas := AtlasTexture.new()
 		atlas.atlas = tex
@@ -6,16 +6,20 @@ Clean monospace pixel font. Each character is defined on a 5-wide pixel grid
 and converted to filled TrueType rectangles. No curves, no winding issues.
 
 Usage:
-    pip install fonttools
+    pip install fonttools Pillow
     python generate_font.py
 """
 
-import sys, argparse
+import sys, argparse, json, re
 from pathlib import Path
 
 try:
     from fontTools.fontBuilder import FontBuilder
     from fontTools.pens.ttGlyphPen import TTGlyphPen
+    from fontTools.ttLib import newTable
+    from fontTools.ttLib.tables.BitmapGlyphMetrics import SmallGlyphMetrics
+    from fontTools.ttLib.tables.E_B_D_T_ import ebdt_bitmap_format_1
+    from fontTools.ttLib.tables.E_B_L_C_ import SbitLineMetrics, Strike, eblc_index_sub_table_1
 except ImportError:
     print("Install fonttools: pip install fonttools"); sys.exit(1)
 
@@ -40,18 +44,106 @@ def _rect(pen, x, y, w, h):
     pen.lineTo((x, y + h))
     pen.closePath()
 
-def draw_bitmap(pen, bitmap, top_y):
-    for row_i, row in enumerate(bitmap):
-        y = top_y - (row_i + 1) * PX
-        col = 0
-        while col < len(row):
-            if row[col] == '#':
-                start = col
-                while col < len(row) and row[col] == '#':
-                    col += 1
-                _rect(pen, X_OFF + start * PX, y, (col - start) * PX, PX)
-            else:
+def _runs(row):
+    """(start, end) column spans of '#' in one bitmap row."""
+    runs, col = [], 0
+    while col < len(row):
+        if row[col] == '#':
+            start = col
+            while col < len(row) and row[col] == '#':
                 col += 1
+            runs.append((start, col))
+        else:
+            col += 1
+    return runs
+
+def merge_rects(bitmap):
+    """Greedy 2D merge: stack identical runs of consecutive rows into one rectangle.
+
+    Returns (col, row, width, height) in grid cells, row counted from the top.
+    """
+    rects, open_runs = [], {}  # (start, end) -> first row
+    for row_i, row in enumerate(bitmap + ['']):
+        runs = set(_runs(row))
+        for span in list(open_runs):
+            if span not in runs:
+                first = open_runs.pop(span)
+                rects.append((span[0], first, span[1] - span[0], row_i - first))
+        for span in runs:
+            open_runs.setdefault(span, row_i)
+    return sorted(rects, key=lambda r: (r[1], r[0]))
+
+def trace_outlines(bitmap):
+    """Union of filled cells as closed polygons: one outer contour per
+    4-connected component, plus one per hole.
+
+    Contours run counter-clockwise like _rect (holes clockwise) in grid units,
+    y up from the bitmap's bottom edge, with collinear points dropped.
+    """
+    n = len(bitmap)
+    edges = set()
+    for row_i, row in enumerate(bitmap):
+        y0 = n - row_i - 1
+        for x0, ch in enumerate(row):
+            if ch != '#':
+                continue
+            corners = [(x0, y0), (x0 + 1, y0), (x0 + 1, y0 + 1), (x0, y0 + 1)]
+            for a, b in zip(corners, corners[1:] + corners[:1]):
+                if (b, a) in edges:
+                    edges.discard((b, a))  # Shared with a neighbour — interior
+                else:
+                    edges.add((a, b))
+
+    outgoing = {}
+    for a, b in edges:
+        outgoing.setdefault(a, []).append(b)
+
+    def turn(prev, cur, nxt):
+        # Left turn first keeps diagonal-touching cells in separate contours
+        dx1, dy1 = cur[0] - prev[0], cur[1] - prev[1]
+        dx2, dy2 = nxt[0] - cur[0], nxt[1] - cur[1]
+        return -(dx1 * dy2 - dy1 * dx2)
+
+    contours = []
+    for start in sorted(outgoing):
+        while outgoing.get(start):
+            points = [start]
+            cur = outgoing[start].pop()
+            prev = start
+            while cur != start:
+                options = outgoing[cur]
+                nxt = min(options, key=lambda p: turn(prev, cur, p)) if len(options) > 1 else options[0]
+                options.remove(nxt)
+                points.append(cur)
+                prev, cur = cur, nxt
+            # Drop points in the middle of straight edges
+            corners = [p for i, p in enumerate(points)
+                       if turn(points[i - 1], p, points[(i + 1) % len(points)]) != 0]
+            contours.append(corners)
+    return contours
+
+def draw_bitmap(pen, bitmap, top_y, outline="rects"):
+    """Draw a glyph bitmap as filled outlines.
+
+    outline: "runs" = one rectangle per horizontal run per row,
+             "rects" = runs merged vertically into larger rectangles,
+             "union" = one polygon per connected component (holes cut out).
+    """
+    bottom = top_y - len(bitmap) * PX
+    if outline == "union":
+        for contour in trace_outlines(bitmap):
+            pen.moveTo((X_OFF + contour[0][0] * PX, bottom + contour[0][1] * PX))
+            for gx, gy in contour[1:]:
+                pen.lineTo((X_OFF + gx * PX, bottom + gy * PX))
+            pen.closePath()
+        return
+    if outline == "rects":
+        rects = merge_rects(bitmap)
+    else:
+        rects = [(start, row_i, end - start, 1)
+                 for row_i, row in enumerate(bitmap) for start, end in _runs(row)]
+    for col, row_i, w, h in rects:
+        _rect(pen, X_OFF + col * PX, top_y - (row_i + h) * PX, w * PX, h * PX)
 
 # ── Glyph Definitions ────────────────────────────────────────────────────
 # (bitmap_rows_top_to_bottom, top_y)
@@ -161,9 +253,218 @@ G = {
 }
 
 
+# ── Embedded Bitmaps ──────────────────────────────────────────────────────
+# EBDT/EBLC strikes at integer multiples of the design grid: at ppem
+# UPM / PX * scale every font pixel is exactly scale x scale screen pixels,
+# so renderers can blit these instead of scan-converting the outlines.
+
+NOTDEF_BITMAP = (['#####'] + ['#...#'] * 5 + ['#####'], CAP)
+
+def _pack_rows(bitmap, scale):
+    """1-bit rows, each pixel repeated scale times, byte-aligned (format 1)."""
+    data = bytearray()
+    for row in bitmap:
+        bits = ''.join(('1' if ch == '#' else '0') * scale for ch in row)
+        bits += '0' * (-len(bits) % 8)
+        row_bytes = int(bits, 2).to_bytes(len(bits) // 8, "big") if bits else b""
+        data += row_bytes * scale
+    return bytes(data)
+
+def _line_metrics(scale, glyph_metrics):
+    m = SbitLineMetrics()
+    m.ascender = FONT_ASCENT // PX * scale
+    m.descender = -FONT_DESCENT // PX * scale
+    m.widthMax = max(g.width for g in glyph_metrics)
+    m.caretSlopeNumerator, m.caretSlopeDenominator, m.caretOffset = 1, 0, 0
+    m.minOriginSB = min(g.BearingX for g in glyph_metrics)
+    m.minAdvanceSB = min(g.Advance - g.BearingX - g.width for g in glyph_metrics)
+    m.maxBeforeBL = max(g.BearingY for g in glyph_metrics)
+    m.minAfterBL = min(g.BearingY - g.height for g in glyph_metrics)
+    m.pad1 = m.pad2 = 0
+    return m
+
+def add_bitmap_strikes(font, scales, bitmaps):
+    """Add EBDT/EBLC with one strike per scale.
+
+    bitmaps: glyph name -> (rows, top_y); glyphs not listed get an empty bitmap.
+    """
+    ppem_per_scale = UPM // PX
+    names = sorted(font.getGlyphOrder(), key=font.getGlyphID)
+    eblc, ebdt = newTable("EBLC"), newTable("EBDT")
+    eblc.version = ebdt.version = 2.0
+    eblc.strikes, ebdt.strikeData = [], []
+
+    for scale in scales:
+        glyphs = {}
+        for name in names:
+            rows, top_y = bitmaps.get(name, ([], 0))
+            metrics = SmallGlyphMetrics()
+            metrics.width = max((len(r) for r in rows), default=0) * scale
+            metrics.height = len(rows) * scale
+            metrics.BearingX = X_OFF // PX * scale
+            metrics.BearingY = top_y // PX * scale if rows else 0
+            metrics.Advance = ADVANCE // PX * scale
+            glyph = ebdt_bitmap_format_1(None, None)
+            glyph.metrics = metrics
+            glyph.imageData = _pack_rows(rows, scale)
+            glyphs[name] = glyph
+
+        subtable = eblc_index_sub_table_1(None, None)
+        subtable.indexFormat, subtable.imageFormat = 1, 1
+        subtable.names = names
+        del subtable.data, subtable.ttFont  # Built here, nothing to decompile
+
+        strike = Strike()
+        size = strike.bitmapSizeTable
+        size.colorRef = 0
+        size.hori = _line_metrics(scale, [g.metrics for g in glyphs.values()])
+        size.vert = _line_metrics(scale, [g.metrics for g in glyphs.values()])
+        size.ppemX = size.ppemY = ppem_per_scale * scale
+        size.bitDepth = 1
+        size.flags = 1  # Horizontal metrics
+        strike.indexSubTables = [subtable]
+        eblc.strikes.append(strike)
+        ebdt.strikeData.append(glyphs)
+
+    font["EBLC"], font["EBDT"] = eblc, ebdt
+
+# ── Bitmap Font Atlas ─────────────────────────────────────────────────────
+# BMFont text .fnt + packed PNG per scale, straight from G. Godot imports
+# .fnt as a bitmap FontFile, so damage numbers and log text draw from one
+# texture with no runtime rasterization.
+
+ATLAS_PADDING = 1   # Transparent gap between glyphs (texture filtering safety)
+
+def _atlas_layout(glyphs, scale, width):
+    """Shelf-pack glyph boxes; returns ({ch: (x, y)}, atlas height)."""
+    positions, x, y, shelf = {}, 0, 0, 0
+    for ch, (rows, _) in glyphs:
+        w, h = max((len(r) for r in rows), default=0) * scale, len(rows) * scale
+        if x + w > width:
+            x, y, shelf = 0, y + shelf + ATLAS_PADDING, 0
+        positions[ch] = (x, y)
+        x += w + ATLAS_PADDING
+        shelf = max(shelf, h)
+    return positions, y + shelf
+
+def export_atlas(out_dir, stem, scale):
+    """Write <stem>_<scale>x.png + .fnt; returns the two paths."""
+    from PIL import Image
+
+    glyphs = [(chr(cp), G.get(chr(cp), ([], 0))) for cp in range(32, 127)]
+    width = 64
+    while True:
+        positions, height = _atlas_layout(glyphs, scale, width)
+        if height <= width:
+            break
+        width *= 2
+    height = 1 << max(height - 1, 0).bit_length()
+
+    atlas = Image.new("RGBA", (width, height), (255, 255, 255, 0))
+    base = FONT_ASCENT // PX * scale
+    chars = []
+    for ch, (rows, top_y) in glyphs:
+        x, y = positions[ch]
+        for row_i, row in enumerate(rows):
+            for col, cell in enumerate(row):
+                if cell == '#':
+                    atlas.paste((255, 255, 255, 255), (x + col * scale, y + row_i * scale,
+                                                       x + (col + 1) * scale, y + (row_i + 1) * scale))
+        w, h = max((len(r) for r in rows), default=0) * scale, len(rows) * scale
+        yoffset = base - top_y // PX * scale if rows else 0
+        chars.append(f"char id={ord(ch)} x={x} y={y} width={w} height={h} "
+                     f"xoffset={X_OFF // PX * scale} yoffset={yoffset} "
+                     f"xadvance={ADVANCE // PX * scale} page=0 chnl=15")
+
+    png_path = out_dir / f"{stem}_{scale}x.png"
+    fnt_path = out_dir / f"{stem}_{scale}x.fnt"
+    atlas.save(png_path, optimize=True)
+    line_height = (FONT_ASCENT + FONT_DESCENT) // PX * scale
+    fnt_path.write_text("\n".join([
+        f'info face="Somdie Mono" size={UPM // PX * scale} bold=0 italic=0 charset="" unicode=1 '
+        f'stretchH=100 smooth=0 aa=1 padding=0,0,0,0 spacing={ATLAS_PADDING},{ATLAS_PADDING} outline=0',
+        f"common lineHeight={line_height} base={base} scaleW={width} scaleH={height} pages=1 packed=0 "
+        f"alphaChnl=0 redChnl=4 greenChnl=4 blueChnl=4",
+        f'page id=0 file="{png_path.name}"',
+        f"chars count={len(chars)}",
+        *chars,
+    ]) + "\n")
+    return png_path, fnt_path
+
+# ── Web Fonts ─────────────────────────────────────────────────────────────
+# WOFF/WOFF2 for the website and the Vite client, optionally subset to the
+# characters their pages, scripts and the game data actually contain.
+
+REPO_ROOT = Path(__file__).parent.parent.parent
+WEB_DIR = REPO_ROOT / "pixel-arena-website" / "fonts"
+TEXT_SOURCES = [
+    ("pixel-arena-website", "*.html"),
+    ("pixel-arena-website/js", "*.js"),
+    ("pixel-arena", "index.html"),
+    ("pixel-arena/src", "**/*.js"),
+    ("pixel-arena-godot/data", "*.json"),
+]
+ALWAYS_KEEP = " 0123456789+-%.,:/"  # Numbers are built at runtime, not written in source
+
+_JS_STRING = re.compile(r"""'((?:[^'\\\n]|\\.)*)'|"((?:[^"\\\n]|\\.)*)"|`((?:[^`\\]|\\.)*)`""")
+_HTML_TAG = re.compile(r"<script\b.*?</script>|<style\b.*?</style>|<[^>]*>", re.S)
+
+def _json_strings(value):
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for v in value.values():
+            yield from _json_strings(v)
+    elif isinstance(value, list):
+        for v in value:
+            yield from _json_strings(v)
+
+def scan_used_text():
+    """Characters in user-facing strings: HTML text, JS string literals, data values."""
+    chars = set(ALWAYS_KEEP)
+    for rel_dir, pattern in TEXT_SOURCES:
+        for path in sorted((REPO_ROOT / rel_dir).glob(pattern)):
+            if "node_modules" in path.parts:
+                continue
+            text = path.read_text(encoding="utf-8", errors="ignore")
+            if path.suffix == ".json":
+                strings = _json_strings(json.loads(text))
+            elif path.suffix == ".html":
+                strings = [_HTML_TAG.sub(" ", text)] + [
+                    "".join(m) for m in _JS_STRING.findall(text)]
+            else:
+                strings = ("".join(m) for m in _JS_STRING.findall(text))
+            for string in strings:
+                chars.update(string)
+    return "".join(sorted(chars))
+
+def export_web(ttf_path, out_dir, text=None):
+    """Write WOFF2 and WOFF (subset to text if given); returns [(path, bytes)]."""
+    from fontTools import subset
+
+    options = subset.Options()
+    options.drop_tables += ["EBDT", "EBLC"]  # Browsers scale by CSS, not by strike
+    options.notdef_outline = True
+    options.name_IDs = ["*"]
+    outputs = []
+    for flavor in ("woff2", "woff"):
+        font = subset.load_font(str(ttf_path), options)
+        subsetter = subset.Subsetter(options)
+        if text is None:
+            subsetter.populate(unicodes=font.getBestCmap().keys())
+        else:
+            subsetter.populate(text=text)
+        subsetter.subset(font)
+        suffix = ".subset" if text is not None else ""
+        path = out_dir / f"{ttf_path.stem}{suffix}.{flavor}"
+        options.flavor = flavor
+        subset.save_font(font, str(path), options)
+        outputs.append((path, path.stat().st_size))
+    return outputs
+
 # ── Font Assembly ─────────────────────────────────────────────────────────
 
-def build_font():
+def build_font(outline="rects", strikes=(1, 2, 3, 4)):
     glyph_names = [".notdef"]
     cmap = {}
 
@@ -199,7 +500,7 @@ def build_font():
         if ch in G:
             try:
                 bitmap, top_y = G[ch]
-                draw_bitmap(pen, bitmap, top_y)
+                draw_bitmap(pen, bitmap, top_y, outline)
             except Exception as e:
                 errors.append(f"  {ch!r} ({name}): {e}")
                 pen = TTGlyphPen(None)
@@ -241,25 +542,95 @@ def build_font():
     )
     fb.setupPost(isFixedPitch=1)
 
+    if strikes:
+        bitmaps = {cmap[ord(ch)]: G[ch] for ch in G}
+        bitmaps[".notdef"] = NOTDEF_BITMAP
+        add_bitmap_strikes(fb.font, strikes, bitmaps)
+
     return fb.font
 
 
+def outline_stats(outline):
+    """(contours, points) over all glyphs for an outline mode."""
+    contours = points = 0
+    for bitmap, top_y in G.values():
+        pen = TTGlyphPen(None)
+        draw_bitmap(pen, bitmap, top_y, outline)
+        glyph = pen.glyph()
+        contours += glyph.numberOfContours
+        points += len(glyph.coordinates)
+    return contours, points
+
+
 def main():
     parser = argparse.ArgumentParser(description="Generate Somdie Mono font")
-    parser.parse_args()
+    parser.add_argument("--outline", choices=["runs", "rects", "union"], default="rects",
+                        help="runs = rectangle per row run, rects = merged rectangles (default), "
+                             "union = one polygon per connected component")
+    parser.add_argument("--strikes", default="1,2,3,4",
+                        help="Embedded bitmap strikes as multiples of the 5x7 grid "
+                             "(1 = 10ppem; default: 1,2,3,4; 'none' for outlines only)")
+    parser.add_argument("--atlas", default="1,2,3,4",
+                        help="Scales for BMFont atlas exports (PNG + .fnt; default: 1,2,3,4; 'none' to skip)")
+    parser.add_argument("--web", action="store_true",
+                        help=f"Also write WOFF2/WOFF for the web clients (to {WEB_DIR.relative_to(REPO_ROOT)})")
+    parser.add_argument("--subset", action="store_true",
+                        help="With --web: also write copies subset to characters used by the sites and game data")
+    args = parser.parse_args()
+    strikes = () if args.strikes == "none" else tuple(int(s) for s in args.strikes.split(","))
+    atlas_scales = () if args.atlas == "none" else tuple(int(s) for s in args.atlas.split(","))
 
     out_dir = Path(__file__).parent.parent / "assets" / "fonts"
     out_dir.mkdir(parents=True, exist_ok=True)
     out_path = out_dir / "somdie_mono.ttf"
 
     print("Building Somdie Mono (bitmap grid)...")
-    font = build_font()
+    font = build_font(args.outline, strikes)
     font.save(str(out_path))
 
     size = out_path.stat().st_size
     print(f"Saved: {out_path} ({size:,} bytes)")
     print(f"Glyphs: 95 printable ASCII (32-126)")
     print(f"Metrics: UPM={UPM}, advance={ADVANCE}, px={PX}, cap={CAP}, x-height={XH}")
+    base_c, base_p = outline_stats("runs")
+    c, p = outline_stats(args.outline)
+    print(f"Outlines ({args.outline}): {c} contours / {p} points "
+          f"(row runs: {base_c} / {base_p}, {100 * (1 - p / base_p):.0f}% fewer points)")
+    if strikes:
+        print(f"Bitmap strikes: {', '.join(f'{UPM // PX * s}ppem' for s in strikes)} (EBDT/EBLC)")
+
+    for scale in atlas_scales:
+        try:
+            png_path, fnt_path = export_atlas(out_dir, out_path.stem, scale)
+        except ImportError:
+            print("Skipping atlas export — install Pillow: pip install Pillow")
+            break
+        print(f"Atlas {scale}x: {png_path.name} + {fnt_path.name} ({png_path.stat().st_size:,} bytes)")
+
+    if args.web:
+        WEB_DIR.mkdir(parents=True, exist_ok=True)
+        try:
+            outputs = export_web(out_path, WEB_DIR)
+            if args.subset:
+                text = scan_used_text()
+                covered = sum(1 for ch in text if 32 <= ord(ch) < 127)
+                print(f"Subset: {covered}/95 glyphs used by web pages, scripts and data")
+                # Dropping a glyph or two can cost more in table overhead than it
+                # saves, so a subset file is only kept when it beats the full one
+                full = {path.suffix: nbytes for path, nbytes in outputs}
+                for path, nbytes in export_web(out_path, WEB_DIR, text):
+                    if nbytes < full[path.suffix]:
+                        outputs.append((path, nbytes))
+                    else:
+                        path.unlink()
+                        print(f"  {path.name}: {nbytes:,} bytes, not smaller than the full "
+                              f"{full[path.suffix]:,} — not kept")
+        except ImportError as e:
+            print(f"Skipping web fonts — {e} (WOFF2 needs: pip install brotli)")
+            return
+        print(f"\nWeb fonts (vs {size:,} byte TTF):")
+        for path, nbytes in outputs:
+            print(f"  {path.name:28} {nbytes:>7,} bytes  {100 * nbytes / size:5.1f}%")
 
 
 if __name__ == "__main__":
@@ -22,24 +22,51 @@ Usage:
     python generate_sprites.py --category ui_textures    # Generate UI panel/button textures
     python generate_sprites.py --category all            # Generate everything
     python generate_sprites.py --single barbarian_base   # Generate one specific sprite
+    python generate_sprites.py --category monsters --chroma  # Magenta key instead of rembg
+    python generate_sprites.py --category gear --sheet 4  # 16 icons per Forge image (256px cells)
+    python generate_sprites.py --category monsters --candidates 4  # Best of 4 seeds per asset
+    python generate_sprites.py --category heroes --animate  # Idle/attack/hit strips + SpriteFrames
     python generate_sprites.py --prototype               # Barbarian + 2 monsters test
+    python generate_sprites.py --coverage                # Game data vs prompts vs outputs diff
+    python generate_sprites.py --missing                 # Generate only what --coverage reports absent
+    python generate_sprites.py --pack                    # Web pack: sprites-<category>.<hash>.bin + sprites.json
+    python generate_sprites.py --provenance              # Which outputs are stale (reads PNG headers only)
+    python generate_sprites.py --category all --rebuild-stale  # Regenerate outputs whose inputs changed
+    python generate_sprites.py --check-quality           # List existing sprites failing the quality gate
+    python generate_sprites.py --category monsters --trim 2  # Crop to opaque box + 2px, offsets in sprite_trim.json
+    python generate_sprites.py --trim-existing           # Trim sprites already on disk
+    python generate_sprites.py --benchmark-downscale     # Time nearest vs block-majority downscaling
+    python generate_sprites.py --category gear --downscale majority-edges  # Override the downscaler
+    python generate_sprites.py --find-duplicates         # Cluster near-identical sprites (perceptual hash)
+    python generate_sprites.py --category all --shard 2/4 --output-root out/shard2  # One of 4 machines
+    python generate_sprites.py --merge-shards out/shard1 out/shard2 out/shard3 out/shard4
+    python generate_sprites.py --serve                   # Warm daemon: POST /jobs {"name": "slime"}
     python generate_sprites.py --download-models         # Download FLUX model files
+    python generate_sprites.py --verify-models           # Hash-check model files (cached)
 
 Requires:
-    pip install requests Pillow rembg[gpu]
+    pip install requests Pillow numpy rembg[gpu]
 
 SD WebUI Forge must be running with --api flag and FLUX.1 Dev model loaded.
 """
 
 import argparse
 import base64
+import contextlib
 import hashlib
 import io
+import itertools
 import json
+import mmap
 import os
+import queue
+import shutil
 import sys
 import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 
 # Add NVIDIA pip-installed CUDA libs to DLL search path (Windows)
@@ -62,20 +89,23 @@ if sys.platform == "win32":
         pass  # CUDA pip packages not installed, will fall back to CPU
 
 try:
+    import numpy as np
     import requests
     from PIL import Image
 except ImportError:
     print("Missing dependencies. Install with:")
-    print("  python -m pip install requests Pillow rembg[gpu]")
+    print("  python -m pip install requests Pillow numpy rembg[gpu]")
     sys.exit(1)
 
 # ── Configuration ───────────────────────────────────────────────────────────
 
 OUTPUT_DIR = Path(__file__).parent.parent / "assets" / "sprites" / "generated"
+BUILD_DIR = Path(__file__).parent.parent / "build" / "sprites"  # Reports, review files (not imported by Godot)
 FORGE_MODELS_DIR = Path("D:/stable-diffusion-webui-forge/models")
 
 # Target sprite sizes after downscale
 HERO_SIZE = 128       # Heroes: 128x128
+HERO_PORTRAIT_SIZE = 64  # Hero portraits: 64x64 head crop of the same generation
 MONSTER_SIZE = 128    # Monsters: 128x128
 FOLLOWER_SIZE = 64    # Followers: 64x64
 BG_WIDTH = 640        # Battle backgrounds: 640x360 (viewport size)
@@ -91,28 +121,62 @@ CONFIG = {
     "sd_sampler": "Euler",  # FLUX uses Euler sampler
 }
 
+# One keep-alive session for every Forge call (a daemon reuses it across jobs)
+FORGE = requests.Session()
+
+# Latest Forge sampler progress, updated by the poller while a job runs
+PROGRESS = {"active": False, "progress": 0.0, "step": 0, "steps": 0, "eta": 0.0}
+
+
 def _name_seed(name: str) -> int:
     """Deterministic seed from name for consistency."""
     return int(hashlib.md5(name.encode()).hexdigest()[:8], 16) % (2**31)
 
 
-def _try_img2img(prompt: str, name: str, seed: int = -1,
-                 width: int = None, height: int = None) -> "Image.Image | None":
-    """If --reference-dir is set and a matching file exists, use img2img; else txt2img."""
+def build_path(*parts: str) -> Path:
+    """Directory under BUILD_DIR, created on demand and hidden from the Godot importer."""
+    BUILD_DIR.mkdir(parents=True, exist_ok=True)
+    gdignore = BUILD_DIR.parent / ".gdignore"
+    if not gdignore.exists():
+        gdignore.touch()
+    path = BUILD_DIR.joinpath(*parts)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+REFERENCE_EXTS = (".png", ".jpg", ".jpeg", ".webp")  # Earlier wins when a name has several
+_reference_index = {}  # reference_dir -> (dir mtime_ns, {stem: path}); rescanned when files come or go
+_reference_warned = set()
+
+
+def _scan_references(ref_dir: str) -> dict:
+    index = {}
+    for entry in os.scandir(ref_dir):
+        stem, ext = os.path.splitext(entry.name)
+        ext = ext.lower()
+        if ext in REFERENCE_EXTS and entry.is_file():
+            current = index.get(stem)
+            if current is None or REFERENCE_EXTS.index(ext) < REFERENCE_EXTS.index(current.suffix.lower()):
+                index[stem] = Path(entry.path)
+    return index
+
+
+def _find_reference(name: str) -> "Path | None":
+    """Return the --reference-dir image matching name, if any (txt2img otherwise)."""
     ref_dir = CONFIG.get("reference_dir")
-    if ref_dir:
-        ref_dir = Path(ref_dir)
-        # Try common extensions
-        for ext in (".png", ".jpg", ".jpeg", ".webp"):
-            ref_path = ref_dir / f"{name}{ext}"
-            if ref_path.exists():
-                print(f"(img2img ref={ref_path.name}, strength={CONFIG['strength']}) ", end="", flush=True)
-                return generate_image_img2img(
-                    prompt, str(ref_path),
-                    strength=CONFIG["strength"],
-                    seed=seed, width=width, height=height
-                )
-    return generate_image(prompt, seed=seed, width=width, height=height)
+    if not ref_dir:
+        return None
+    try:
+        mtime = os.stat(ref_dir).st_mtime_ns
+        cached = _reference_index.get(ref_dir)
+        if cached is None or cached[0] != mtime:
+            _reference_index[ref_dir] = cached = (mtime, _scan_references(ref_dir))
+    except OSError as e:
+        if ref_dir not in _reference_warned:
+            _reference_warned.add(ref_dir)
+            print(f"  WARNING: reference dir unreadable ({e}) — using txt2img")
+        return None
+    return cached[1].get(name)
 
 
 # ── Style Prompts ─────────────────────────────────────────────────────────
@@ -891,7 +955,7 @@ LOGO_SPRITES = {
 def test_connection() -> bool:
     """Test if SD WebUI Forge API is reachable and check loaded model."""
     try:
-        r = requests.get(f"{CONFIG['sd_url']}/sdapi/v1/options", timeout=5)
+        r = FORGE.get(f"{CONFIG['sd_url']}/sdapi/v1/options", timeout=5)
         if r.status_code == 200:
             data = r.json()
             model = data.get("sd_model_checkpoint", "unknown")
@@ -910,11 +974,86 @@ def test_connection() -> bool:
         return False
 
 
-def _poll_progress(stop_event: threading.Event, bar_width: int = 30):
-    """Poll Forge progress endpoint and display a live progress bar."""
+# Telemetry kept across runs: effective seconds per sampling step by request
+# shape, used to size per-job deadlines and stall timeouts
+TELEMETRY_PATH = BUILD_DIR / "telemetry.json"
+TELEMETRY_SAMPLES = 50        # Recent timings kept per shape
+DEFAULT_DEADLINE = 900        # Seconds, until a shape has history
+DEFAULT_STALL_TIMEOUT = 120   # Seconds without a new step, until a shape has history
+
+
+def load_telemetry() -> dict:
+    if TELEMETRY_PATH.exists():
+        try:
+            return json.loads(TELEMETRY_PATH.read_text())
+        except ValueError:
+            pass
+    return {}
+
+
+def save_telemetry(telemetry: dict):
+    build_path()
+    tmp = TELEMETRY_PATH.with_name(TELEMETRY_PATH.name + ".tmp")
+    tmp.write_text(json.dumps(telemetry, indent=1, sort_keys=True))
+    tmp.replace(TELEMETRY_PATH)
+
+
+def _shape_key(endpoint: str, payload: dict) -> str:
+    return f"{endpoint} {payload['width']}x{payload['height']} x{payload.get('batch_size', 1)}"
+
+
+def step_time(shape: str) -> "float | None":
+    """Median seconds per step seen for this request shape, if any."""
+    samples = load_telemetry().get("step_times", {}).get(shape)
+    if not samples:
+        return None
+    return sorted(samples)[len(samples) // 2]
+
+
+def record_step_time(shape: str, seconds: float):
+    telemetry = load_telemetry()
+    samples = telemetry.setdefault("step_times", {}).setdefault(shape, [])
+    samples.append(round(seconds, 3))
+    del samples[:-TELEMETRY_SAMPLES]
+    save_telemetry(telemetry)
+
+
+def job_limits(shape: str, steps: int) -> "tuple[float, float]":
+    """(deadline, stall timeout) in seconds for one request.
+
+    The deadline is --deadline-factor times the historical duration plus a
+    fixed allowance for model load and VAE decode; a stall is no new step for
+    ten typical step times. --stall-timeout overrides the latter.
+    """
+    per_step = step_time(shape)
+    if per_step is None:
+        deadline, stall = DEFAULT_DEADLINE, DEFAULT_STALL_TIMEOUT
+    else:
+        deadline = per_step * steps * CONFIG.get("deadline_factor", 3.0) + 60
+        stall = max(30.0, per_step * 10)
+    return deadline, CONFIG.get("stall_timeout") or stall
+
+
+def interrupt_forge():
+    """Ask Forge to abandon the current generation."""
+    try:
+        FORGE.post(f"{CONFIG['sd_url']}/sdapi/v1/interrupt", timeout=10)
+    except requests.RequestException:
+        pass
+
+
+def _poll_progress(stop_event: threading.Event, watch: dict = None, bar_width: int = 30):
+    """Poll Forge progress endpoint and display a live progress bar.
+
+    With watch = {"deadline": s, "stall": s}, interrupt Forge when sampling
+    stops advancing for watch["stall"] seconds or the request outlives
+    watch["deadline"], recording why in watch["tripped"].
+    """
+    started = last_change = time.time()
+    last_step = None
     while not stop_event.is_set():
         try:
-            r = requests.get(f"{CONFIG['sd_url']}/sdapi/v1/progress", timeout=3)
+            r = FORGE.get(f"{CONFIG['sd_url']}/sdapi/v1/progress", timeout=3)
             if r.status_code == 200:
                 data = r.json()
                 pct = data.get("progress", 0)
@@ -922,6 +1061,9 @@ def _poll_progress(stop_event: threading.Event, bar_width: int = 30):
                 step = state.get("sampling_step", 0)
                 total_steps = state.get("sampling_steps", CONFIG["sd_steps"])
                 eta = data.get("eta_relative", 0)
+                PROGRESS.update(active=True, progress=pct, step=step, steps=total_steps, eta=eta)
+                if step != last_step:
+                    last_step, last_change = step, time.time()
 
                 filled = int(bar_width * pct)
                 bar = "█" * filled + "░" * (bar_width - filled)
@@ -929,48 +1071,62 @@ def _poll_progress(stop_event: threading.Event, bar_width: int = 30):
                 print(f"\r    [{bar}] {pct*100:5.1f}% step {step}/{total_steps} ETA {eta_str}  ", end="", flush=True)
         except Exception:
             pass
-        stop_event.wait(1.0)  # Poll every 1s
 
+        if watch is not None:
+            now = time.time()
+            # Before the first step, model loading counts against the deadline only
+            if last_step and now - last_change > watch["stall"]:
+                watch["tripped"] = f"no progress for {now - last_change:.0f}s at step {last_step}"
+            elif now - started > watch["deadline"]:
+                watch["tripped"] = f"exceeded {watch['deadline']:.0f}s deadline"
+            if watch.get("tripped"):
+                interrupt_forge()
+                return
+        stop_event.wait(1.0)  # Poll every 1s
 
-def generate_image(prompt: str, seed: int = -1,
-                   width: int = None, height: int = None) -> "Image.Image | None":
-    """Generate a single image via Forge txt2img API (FLUX.1 Dev settings)."""
-    width = width or CONFIG["gen_size"]
-    height = height or CONFIG["gen_size"]
 
-    payload = {
-        "prompt": prompt,
-        "negative_prompt": "",  # FLUX doesn't use negative prompts
-        "steps": CONFIG["sd_steps"],
-        "cfg_scale": CONFIG["sd_cfg"],
-        "sampler_name": CONFIG["sd_sampler"],
-        "scheduler": "Simple",                          # Required for FLUX
-        "distilled_cfg_scale": CONFIG["guidance"],      # FLUX guidance scale
-        "width": width,
-        "height": height,
-        "seed": seed,
-        "batch_size": 1,
-        "n_iter": 1,
-    }
+def _submit(endpoint: str, payload: dict) -> "list[Image.Image] | None":
+    """POST a generation payload to Forge with a live progress bar; return all images.
 
+    A watchdog interrupts requests that stall or run past their deadline and
+    resubmits them up to --stall-retries times; interrupted results (Forge
+    returns the partial image) are discarded.
+    """
+    shape = _shape_key(endpoint, payload)
+    retries = CONFIG.get("stall_retries", 1)
+    for attempt in range(retries + 1):
+        deadline, stall = job_limits(shape, payload["steps"])
+        watch = {"deadline": deadline, "stall": stall}
+        images = _submit_once(endpoint, payload, watch)
+        if not watch.get("tripped"):
+            return images
+        print(f"  STALLED: {watch['tripped']} — interrupted Forge", end="")
+        print(f", retrying ({attempt + 1}/{retries})" if attempt < retries else ", giving up")
+    return None
+
+
+def _submit_once(endpoint: str, payload: dict, watch: dict) -> "list[Image.Image] | None":
     # Start progress polling thread
     stop_event = threading.Event()
-    poll_thread = threading.Thread(target=_poll_progress, args=(stop_event,), daemon=True)
+    poll_thread = threading.Thread(target=_poll_progress, args=(stop_event, watch), daemon=True)
     poll_thread.start()
 
     try:
         t0 = time.time()
-        r = requests.post(
-            f"{CONFIG['sd_url']}/sdapi/v1/txt2img",
-            json=payload, timeout=900
+        r = FORGE.post(
+            f"{CONFIG['sd_url']}/sdapi/v1/{endpoint}",
+            json=payload, timeout=watch["deadline"] + 60
         )
         elapsed = time.time() - t0
 
         stop_event.set()
         poll_thread.join(timeout=2)
+        PROGRESS["active"] = False
         # Clear progress bar line
         print(f"\r    {'':60}", end="\r", flush=True)
 
+        if watch.get("tripped"):
+            return None
         if r.status_code != 200:
             print(f"  ERROR: Forge API returned {r.status_code}: {r.text[:200]}")
             return None
@@ -981,23 +1137,96 @@ def generate_image(prompt: str, seed: int = -1,
             print("  ERROR: No images returned")
             return None
 
-        img_data = base64.b64decode(images[0])
-        img = Image.open(io.BytesIO(img_data))
-        return img
+        record_step_time(_shape_key(endpoint, payload), elapsed / max(payload["steps"], 1))
+        return [Image.open(io.BytesIO(base64.b64decode(b64))) for b64 in images]
 
+    except requests.Timeout:
+        stop_event.set()
+        PROGRESS["active"] = False
+        watch["tripped"] = f"no response within {watch['deadline'] + 60:.0f}s"
+        interrupt_forge()
+        return None
     except requests.ConnectionError:
         stop_event.set()
+        PROGRESS["active"] = False
         print("  ERROR: Lost connection to Forge")
         return None
     except Exception as e:
         stop_event.set()
+        PROGRESS["active"] = False
         print(f"  ERROR: {e}")
         return None
 
 
-def generate_image_img2img(prompt: str, reference_path: str, strength: float = 0.5,
-                           seed: int = -1, width: int = None, height: int = None) -> "Image.Image | None":
-    """Generate an image via Forge img2img API using a reference image.
+def generate_images(prompt: str, seed: int = -1, width: int = None, height: int = None,
+                    batch_size: int = 1) -> "list[Image.Image] | None":
+    """Generate a batch via Forge txt2img API (FLUX.1 Dev settings).
+
+    Forge seeds batch item i with seed + i, so a batch of N explores N
+    consecutive seeds in one request.
+    """
+    width = width or CONFIG["gen_size"]
+    height = height or CONFIG["gen_size"]
+
+    payload = {
+        "prompt": prompt,
+        "negative_prompt": "",  # FLUX doesn't use negative prompts
+        "steps": CONFIG["sd_steps"],
+        "cfg_scale": CONFIG["sd_cfg"],
+        "sampler_name": CONFIG["sd_sampler"],
+        "scheduler": "Simple",                          # Required for FLUX
+        "distilled_cfg_scale": CONFIG["guidance"],      # FLUX guidance scale
+        "width": width,
+        "height": height,
+        "seed": seed,
+        "batch_size": batch_size,
+        "n_iter": 1,
+    }
+    return _submit("txt2img", _pinned(payload))
+
+
+def generate_image(prompt: str, seed: int = -1,
+                   width: int = None, height: int = None) -> "Image.Image | None":
+    """Generate a single image via Forge txt2img API (FLUX.1 Dev settings)."""
+    images = generate_images(prompt, seed=seed, width=width, height=height)
+    return images[0] if images else None
+
+
+def encode_init_image(img: Image.Image, width: int, height: int) -> str:
+    """Resize a reference to the generation size and base64-encode it for img2img.
+
+    --init-format webp sends lossless WebP, png-small a maximally compressed
+    PNG; both shrink the request body at some CPU cost, paid once per cache entry.
+    """
+    ref_img = img.convert("RGB").resize((width, height), Image.LANCZOS)
+    buf = io.BytesIO()
+    fmt = CONFIG.get("init_format", "png")
+    if fmt == "webp":
+        ref_img.save(buf, format="WEBP", lossless=True, method=4)
+    elif fmt == "png-small":
+        ref_img.save(buf, format="PNG", optimize=True)
+    else:
+        ref_img.save(buf, format="PNG")
+    return base64.b64encode(buf.getvalue()).decode("utf-8")
+
+
+_init_cache = {}  # (path, mtime_ns, size, width, height, format) -> base64 payload
+
+
+def cached_init_image(path: Path, width: int, height: int) -> str:
+    """encode_init_image for a file, memoized until the file changes."""
+    st = os.stat(path)
+    key = (str(path), st.st_mtime_ns, st.st_size, width, height, CONFIG.get("init_format", "png"))
+    if key not in _init_cache:
+        with Image.open(path) as img:
+            _init_cache[key] = encode_init_image(img, width, height)
+    return _init_cache[key]
+
+
+def generate_images_img2img(prompt: str, reference_path: str, strength: float = 0.5,
+                            seed: int = -1, width: int = None, height: int = None,
+                            batch_size: int = 1, init_image: str = None) -> "list[Image.Image] | None":
+    """Generate a batch via Forge img2img API using a reference image.
 
     Args:
         prompt: Text prompt describing desired output.
@@ -1006,15 +1235,14 @@ def generate_image_img2img(prompt: str, reference_path: str, strength: float = 0
         seed: RNG seed (-1 for random).
         width: Output width (default: CONFIG gen_size).
         height: Output height (default: CONFIG gen_size).
+        batch_size: Number of images (seeds seed..seed+batch_size-1).
+        init_image: Already-encoded reference (from encode_init_image); skips
+            reading reference_path when several requests share one reference.
     """
     width = width or CONFIG["gen_size"]
     height = height or CONFIG["gen_size"]
 
-    ref_img = Image.open(reference_path).convert("RGB")
-    ref_img = ref_img.resize((width, height), Image.LANCZOS)
-    buf = io.BytesIO()
-    ref_img.save(buf, format="PNG")
-    ref_b64 = base64.b64encode(buf.getvalue()).decode("utf-8")
+    ref_b64 = init_image or cached_init_image(Path(reference_path), width, height)
 
     payload = {
         "prompt": prompt,
@@ -1029,63 +1257,202 @@ def generate_image_img2img(prompt: str, reference_path: str, strength: float = 0
         "width": width,
         "height": height,
         "seed": seed,
-        "batch_size": 1,
+        "batch_size": batch_size,
         "n_iter": 1,
     }
+    return _submit("img2img", _pinned(payload))
 
-    stop_event = threading.Event()
-    poll_thread = threading.Thread(target=_poll_progress, args=(stop_event,), daemon=True)
-    poll_thread.start()
 
-    try:
-        t0 = time.time()
-        r = requests.post(
-            f"{CONFIG['sd_url']}/sdapi/v1/img2img",
-            json=payload, timeout=900
-        )
-        elapsed = time.time() - t0
+def generate_image_img2img(prompt: str, reference_path: str, strength: float = 0.5,
+                           seed: int = -1, width: int = None, height: int = None) -> "Image.Image | None":
+    """Generate a single image via Forge img2img API using a reference image."""
+    images = generate_images_img2img(prompt, reference_path, strength=strength,
+                                     seed=seed, width=width, height=height)
+    return images[0] if images else None
 
-        stop_event.set()
-        poll_thread.join(timeout=2)
-        print(f"\r    {'':60}", end="\r", flush=True)
 
-        if r.status_code != 200:
-            print(f"  ERROR: Forge API returned {r.status_code}: {r.text[:200]}")
-            return None
+# ── Preflight ───────────────────────────────────────────────────────────────
+#
+# Before a batch: confirm the FLUX checkpoint and VAE are the ones selected,
+# pin them with override_settings so nothing swaps models mid-run, and run a
+# tiny generation at every request shape in the plan so model loading and
+# kernel autotuning happen before the first real job. Cold and warm latency
+# per shape go to the telemetry file.
 
-        data = r.json()
-        images = data.get("images", [])
-        if not images:
-            print("  ERROR: No images returned")
-            return None
+WARMUP_STEPS = 2
+_warmed_shapes = set()  # (endpoint, width, height, batch) already warmed by this process
+_models_checked = set()  # (Forge URL, --checkpoint, --vae) whose models passed and are pinned
 
-        img_data = base64.b64decode(images[0])
-        img = Image.open(io.BytesIO(img_data))
-        return img
 
-    except requests.ConnectionError:
-        stop_event.set()
-        print("  ERROR: Lost connection to Forge")
+def _pinned(payload: dict) -> dict:
+    """Attach the models pinned at preflight to a generation payload."""
+    if CONFIG.get("override_settings"):
+        payload["override_settings"] = CONFIG["override_settings"]
+        payload["override_settings_restore_afterwards"] = False
+    return payload
+
+
+def check_models() -> bool:
+    """Check the selected checkpoint and VAE, then pin them for the batch.
+
+    A name other than the downloaded defaults is only a warning (another FLUX
+    quantization or a renamed file is fine); it fails only when --checkpoint
+    or --vae asked for a specific model.
+    """
+    r = FORGE.get(f"{CONFIG['sd_url']}/sdapi/v1/options", timeout=10)
+    r.raise_for_status()
+    options = r.json()
+    ok = True
+
+    checkpoint = options.get("sd_model_checkpoint") or ""
+    required = CONFIG.get("require_checkpoint")
+    expected = required or Path(FLUX_MODELS["checkpoint"]["dest"]).stem
+    if expected.lower() in checkpoint.lower():
+        print(f"  Checkpoint: {checkpoint}")
+    elif required:
+        print(f"  MISMATCH checkpoint: {checkpoint or 'none'} (--checkpoint {required})")
+        ok = False
+    else:
+        print(f"  WARNING checkpoint: {checkpoint or 'none'} (default is {expected}; "
+              f"pin one with --checkpoint)")
+
+    # Forge lists VAE and text encoders as additional modules; A1111 uses sd_vae
+    modules = options.get("forge_additional_modules")
+    selected = [Path(m).name for m in modules] if modules is not None else [options.get("sd_vae") or ""]
+    required = CONFIG.get("require_vae")
+    vae = required or Path(FLUX_MODELS["vae"]["dest"]).name
+    if any(vae.lower() in name.lower() for name in selected if name):
+        print(f"  VAE: {vae}")
+    elif required:
+        print(f"  MISMATCH VAE: {', '.join(filter(None, selected)) or 'none'} (--vae {required})")
+        ok = False
+    else:
+        print(f"  WARNING VAE: {', '.join(filter(None, selected)) or 'none'} (default is {vae}; "
+              f"pin one with --vae)")
+
+    pinned = {"sd_model_checkpoint": checkpoint}
+    if modules is not None:
+        pinned["forge_additional_modules"] = modules
+    elif options.get("sd_vae"):
+        pinned["sd_vae"] = options["sd_vae"]
+    CONFIG["override_settings"] = pinned
+    return ok
+
+
+def _timed_request(endpoint: str, payload: dict) -> "float | None":
+    t0 = time.time()
+    try:
+        r = FORGE.post(f"{CONFIG['sd_url']}/sdapi/v1/{endpoint}", json=_pinned(payload),
+                       timeout=DEFAULT_DEADLINE)
+    except requests.RequestException as e:
+        print(f"    ERROR: {e}")
         return None
-    except Exception as e:
-        stop_event.set()
-        print(f"  ERROR: {e}")
+    if r.status_code != 200:
+        print(f"    ERROR: Forge API returned {r.status_code}")
         return None
+    return time.time() - t0
+
+
+def models_ready() -> bool:
+    """check_models once per Forge URL and pin request; later calls reuse the pin."""
+    key = (CONFIG["sd_url"], CONFIG.get("require_checkpoint"), CONFIG.get("require_vae"))
+    if key in _models_checked and CONFIG.get("override_settings"):
+        return True
+    if not check_models():
+        return False
+    _models_checked.add(key)
+    return True
+
+
+def warmup_shapes(jobs: list, animate: bool = False) -> dict:
+    """(endpoint, width, height, batch) -> job for every request shape the jobs will send.
+
+    Mirrors run_plan (candidate batches, icon sheets) or, with animate, the
+    per-pose img2img batches of animate_job.
+    """
+    shapes = {}
+    if animate:
+        for job in jobs:
+            for count, *_ in ANIM_POSES.values():
+                shapes.setdefault(("img2img", job["width"], job["height"], count), job)
+        return shapes
+    batch = CONFIG.get("candidates", 1)
+    for entry in plan_entries(list(group_jobs(jobs).values())):
+        job = entry[0][0]
+        if len(entry) > 1:
+            grid, cell = sheet_shape(len(entry))
+            shapes.setdefault(("txt2img", cell * grid, cell * grid, 1), job)
+        else:
+            endpoint = "img2img" if job["ref"] else "txt2img"
+            shapes.setdefault((endpoint, job["width"], job["height"], batch), job)
+    return shapes
+
+
+def preflight(jobs: list, animate: bool = False) -> bool:
+    """Check and pin models, then warm up each request shape in the plan not yet warmed."""
+    print("\n=== PREFLIGHT ===")
+    try:
+        models_ok = models_ready()
+    except requests.RequestException as e:
+        print(f"  Cannot read Forge options: {e}")
+        return False
+    if not models_ok:
+        print("  Select the pinned models in Forge (or skip with --no-preflight)")
+        return False
+
+    telemetry = load_telemetry()
+    warmups = telemetry.setdefault("warmup", {})
+    for key, job in warmup_shapes(jobs, animate).items():
+        if key in _warmed_shapes:
+            continue
+        endpoint, width, height, batch = key
+        payload = {
+            "prompt": job["prompt"], "negative_prompt": "",
+            "steps": WARMUP_STEPS, "cfg_scale": CONFIG["sd_cfg"],
+            "sampler_name": CONFIG["sd_sampler"], "scheduler": "Simple",
+            "distilled_cfg_scale": CONFIG["guidance"],
+            "width": width, "height": height, "seed": 0,
+            "batch_size": batch, "n_iter": 1,
+        }
+        if endpoint == "img2img":
+            # Only the shape matters; pose strips have no reference file to send
+            payload["init_images"] = [cached_init_image(job["ref"], width, height) if job["ref"]
+                                      else encode_init_image(Image.new("RGB", (width, height)), width, height)]
+            payload["denoising_strength"] = CONFIG.get("strength", 0.5)
+        cold = _timed_request(endpoint, payload)
+        warm = _timed_request(endpoint, dict(payload)) if cold is not None else None
+        if warm is None:
+            print(f"  Warm-up {endpoint} {width}x{height} x{batch} FAILED")
+            return False
+        shape = _shape_key(endpoint, payload)
+        warmups[shape] = {"cold": round(cold, 2), "warm": round(warm, 2), "steps": WARMUP_STEPS,
+                          "checkpoint": CONFIG["override_settings"]["sd_model_checkpoint"],
+                          "at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        print(f"  Warm-up {shape}: cold {cold:.1f}s, warm {warm:.1f}s")
+        _warmed_shapes.add(key)
+    save_telemetry(telemetry)
+    return True
 
 
 # ── Background Removal ──────────────────────────────────────────────────────
 
 _rembg_session = None
 
+def rembg_session():
+    """The shared u2net session, loaded on first use. Raises ImportError without rembg."""
+    global _rembg_session
+    from rembg import new_session
+    if _rembg_session is None:
+        print("  Loading rembg model (first time only)...", flush=True)
+        _rembg_session = new_session("u2net")
+    return _rembg_session
+
+
 def remove_bg(img: Image.Image) -> Image.Image:
     """Remove background using rembg neural network."""
-    global _rembg_session
     try:
-        from rembg import remove, new_session
-        if _rembg_session is None:
-            print("  Loading rembg model (first time only)...", flush=True)
-            _rembg_session = new_session("u2net")
-        result = remove(img, session=_rembg_session, bgcolor=(0, 0, 0, 0))
+        from rembg import remove
+        result = remove(img, session=rembg_session(), bgcolor=(0, 0, 0, 0))
         return result
     except ImportError:
         print("  WARNING: rembg not installed, falling back to basic removal")
@@ -1137,14 +1504,155 @@ def _remove_bg_basic(img: Image.Image) -> Image.Image:
     return img
 
 
-def downscale_nearest(img: Image.Image, size: int) -> Image.Image:
-    """Downscale using NEAREST for pixel-crisp result."""
-    return img.resize((size, size), Image.NEAREST)
+# Chroma key: with --chroma, sprite categories ask FLUX for a flat magenta
+# background and key it out with numpy instead of running u2net. rembg is
+# only the fallback when the key doesn't look like it worked.
+CHROMA_KEY = (255, 0, 255)
+CHROMA_PROMPT = "solid flat pure magenta background (#FF00FF), no background shadows or gradients"
+CHROMA_DISTANCE = 90    # RGB distance from the sampled key color below which a pixel is background
+CHROMA_KEY_MATCH = 120  # Sampled border color must be this close to CHROMA_KEY
+CHROMA_BORDER = 4       # Frame (px) sampled for the key color and checked for coverage
+CHROMA_MIN_BORDER = 0.9  # Share of that frame that must key out
+CHROMA_SUBJECT = (0.02, 0.85)  # Opaque share of the image a plausible subject covers
+
+
+def _dilate(mask: np.ndarray) -> np.ndarray:
+    """3x3 binary dilation with numpy shifts."""
+    out = mask.copy()
+    out[1:] |= mask[:-1]
+    out[:-1] |= mask[1:]
+    grown = out.copy()
+    grown[:, 1:] |= out[:, :-1]
+    grown[:, :-1] |= out[:, 1:]
+    return grown
+
+
+def _erode(mask: np.ndarray) -> np.ndarray:
+    return ~_dilate(~mask)
 
 
-def downscale_bg(img: Image.Image, width: int, height: int) -> Image.Image:
-    """Downscale background to exact viewport size."""
-    return img.resize((width, height), Image.NEAREST)
+def chroma_key(img: Image.Image) -> "Image.Image | None":
+    """Key out a flat magenta background; None when the result fails its coverage check.
+
+    The key color is the median of the image border (FLUX never paints exact
+    #FF00FF). Foreground is an RGB-distance threshold, opened then closed
+    with a 3x3 kernel to drop speckles and pinholes. Pixels on the new edge
+    lose their magenta spill (red and blue pulled down toward green).
+    """
+    rgb = np.asarray(img.convert("RGB")).astype(np.int32)
+    h, w = rgb.shape[:2]
+    b = CHROMA_BORDER
+    frame = np.ones((h, w), dtype=bool)
+    frame[b:h - b, b:w - b] = False
+    key = np.median(rgb[frame], axis=0)
+    if np.linalg.norm(key - CHROMA_KEY) > CHROMA_KEY_MATCH:
+        return None  # Model ignored the key color
+
+    dist = np.sqrt(((rgb - key) ** 2).sum(axis=2))
+    fg = dist >= CHROMA_DISTANCE
+    fg = _dilate(_erode(fg))  # Open: drop isolated specks
+    fg = _erode(_dilate(fg))  # Close: fill pinholes
+    if (~fg[frame]).mean() < CHROMA_MIN_BORDER or not CHROMA_SUBJECT[0] <= fg.mean() <= CHROMA_SUBJECT[1]:
+        return None
+
+    edge = fg & _dilate(_dilate(~fg))  # Foreground within 2px of the key
+    spill = np.clip(np.minimum(rgb[..., 0], rgb[..., 2]) - rgb[..., 1], 0, None) * edge
+    out = np.empty((h, w, 4), dtype=np.uint8)
+    out[..., 0] = rgb[..., 0] - spill
+    out[..., 1] = rgb[..., 1]
+    out[..., 2] = rgb[..., 2] - spill
+    out[..., 3] = np.where(fg, 255, 0)
+    return Image.fromarray(out, "RGBA")
+
+
+def downscale_nearest(img: Image.Image, size: "tuple[int, int]") -> Image.Image:
+    """Downscale using NEAREST for pixel-crisp result."""
+    return img.resize(size, Image.NEAREST)
+
+
+MAJORITY_BITS = 4        # Bits per channel when grouping similar colors in a block
+EDGE_CONTRAST = 64       # Luma drop (0-255) that counts as outline against the block color
+EDGE_FRACTION = 0.25     # Share of a block an outline must cover to win it
+
+
+def _row_mode(codes: np.ndarray, levels: int) -> np.ndarray:
+    """Most common value in [0, levels) in each row (-1 where a row has none)."""
+    n, m = codes.shape
+    if n * (levels + 1) <= 1 << 24:
+        # One histogram for all rows at once: bin = row * (levels + 1) + code + 1
+        bins = (np.arange(n)[:, None] * (levels + 1) + codes + 1).ravel()
+        counts = np.bincount(bins, minlength=n * (levels + 1)).reshape(n, levels + 1)
+        counts[:, 0] = 0  # The -1 (transparent) bucket never wins
+        return np.where(counts.max(axis=1) > 0, counts.argmax(axis=1) - 1, -1)
+    # Many blocks: sort each row and take its longest run instead, in int16
+    # where codes and run lengths fit (half the memory traffic of int32)
+    small = np.int16 if max(levels, m) < 1 << 15 else codes.dtype.type
+    s = np.sort(codes.astype(small), axis=1)
+    idx = np.arange(m, dtype=small)
+    starts = np.ones((n, m), dtype=bool)
+    starts[:, 1:] = s[:, 1:] != s[:, :-1]
+    run_start = np.maximum.accumulate(np.where(starts, idx, small(0)), axis=1)
+    run_len = np.where(s >= 0, idx - run_start + 1, 0)
+    return s[np.arange(n), run_len.argmax(axis=1)].astype(codes.dtype)
+
+
+def _mean_where(values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """Per-row mean of the masked pixels (0 where a row has none)."""
+    count = np.maximum(mask.sum(axis=1, keepdims=True), 1)
+    return np.einsum("nm,nmc->nc", mask.astype(np.int32), values.astype(np.int32)) // count
+
+
+def downscale_majority(img: Image.Image, size: "tuple[int, int]",
+                       alpha_threshold: float = 0.5, edges: bool = False) -> Image.Image:
+    """Downscale by each block's dominant color instead of one sample per block.
+
+    Pixels are bucketed at MAJORITY_BITS per channel and the output pixel is
+    the mean (alpha included) of the block's most common bucket, so a
+    one-pixel shift of the source no longer changes the result and a
+    grid-aligned source comes back exactly. A block is drawn when at least
+    alpha_threshold of it is visible. With edges, a dark outline covering
+    EDGE_FRACTION of a block wins it, so thin outlines survive big reductions.
+    Non-integer ratios are first brought to a whole multiple with NEAREST.
+    """
+    w, h = size
+    src = img.convert("RGBA")
+    k = max(1, min(src.width // w, src.height // h))
+    if src.size != (w * k, h * k):
+        src = src.resize((w * k, h * k), Image.NEAREST)
+    # Block view: (h, k, w, k, 4) -> one row of k*k pixels per output pixel
+    blocks = np.asarray(src).reshape(h, k, w, k, 4).swapaxes(1, 2).reshape(h * w, k * k, 4)
+    visible = blocks[..., 3] > 0
+
+    shift = 8 - MAJORITY_BITS
+    q = (blocks[..., :3] >> shift).astype(np.int32)
+    codes = (q[..., 0] << (2 * MAJORITY_BITS)) | (q[..., 1] << MAJORITY_BITS) | q[..., 2]
+    codes[~visible] = -1  # Transparent pixels never win the color vote
+    levels = 1 << (3 * MAJORITY_BITS)
+    mode = _row_mode(codes, levels)
+    color = _mean_where(blocks, codes == mode[:, None])
+
+    if edges:
+        weights = np.array([299, 587, 114])
+        luma = (blocks[..., :3] @ weights) // 1000
+        mode_luma = (color[:, :3] @ weights) // 1000
+        dark = visible & (luma < mode_luma[:, None] - EDGE_CONTRAST)
+        outline = dark.mean(axis=1) >= EDGE_FRACTION
+        if outline.any():
+            dark_mode = _row_mode(np.where(dark, codes, -1), levels)
+            dark_color = _mean_where(blocks, codes == dark_mode[:, None])
+            color = np.where(outline[:, None], dark_color, color)
+
+    color[visible.mean(axis=1) < alpha_threshold, 3] = 0  # Hidden blocks keep their RGB, like NEAREST
+    result = Image.fromarray(color.astype(np.uint8).reshape(h, w, 4), "RGBA")
+    return result if img.mode == "RGBA" else result.convert(img.mode)
+
+
+# Per-category "downscale" choices (--downscale overrides every category)
+DOWNSCALERS = {
+    "nearest": downscale_nearest,
+    "majority": downscale_majority,
+    "majority-edges": lambda img, size: downscale_majority(img, size, edges=True),
+}
 
 
 GEAR_ICON_SIZE = 32  # 32x32 inventory icons
@@ -1158,261 +1666,808 @@ UI_TEX_BTN_WIDTH = 64   # Button textures: 64x24
 UI_TEX_BTN_HEIGHT = 24
 
 
-# ── Generation Functions ────────────────────────────────────────────────────
-
-def gen_hero(class_key: str, desc: str, seed: int = -1) -> "Path | None":
-    """Generate a hero base sprite (single 128x128 frame)."""
-    out_path = OUTPUT_DIR / "heroes" / f"{class_key}_base.png"
-    if out_path.exists() and not CONFIG.get("force"):
-        print(f"  SKIP (exists): {out_path.name}")
-        return out_path
-
-    if seed == -1:
-        seed = _name_seed(class_key)
-
-    print(f"  Generating hero: {class_key} (seed={seed})...", end=" ", flush=True)
-    prompt = f"{STYLE_SPRITE}, {desc}"
-    img = _try_img2img(prompt, f"{class_key}_base", seed=seed)
-    if img is None:
-        print("FAILED")
-        return None
-
-    img = remove_bg(img)
-    img = downscale_nearest(img, HERO_SIZE)
+# ── Candidate Scoring ───────────────────────────────────────────────────────
+#
+# Cheap whole-batch metrics on post-processed sprites. All candidates of one
+# asset share a size, so they are stacked into one (N, H, W, 4) array and
+# scored together.
 
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    img.save(out_path)
-    print(f"OK -> {out_path.name}")
-    return out_path
+CANDIDATE_TARGET_COVERAGE = 0.35   # Ideal opaque fraction of the canvas
+CANDIDATE_WEIGHTS = {
+    "coverage": 0.35,    # Alpha coverage after background removal
+    "centering": 0.25,   # Alpha centroid close to canvas center
+    "sharpness": 0.25,   # Edge contrast surviving the downscale
+    "colors": 0.15,      # Fewer unique colors per opaque pixel = cleaner pixel art
+}
 
 
-def gen_monster(monster_key: str, desc: str, seed: int = -1) -> "Path | None":
-    """Generate a monster sprite (single 128x128 frame)."""
-    out_path = OUTPUT_DIR / "monsters" / f"{monster_key}.png"
-    if out_path.exists() and not CONFIG.get("force"):
-        print(f"  SKIP (exists): {out_path.name}")
-        return out_path
+def score_candidates(images: list) -> list:
+    """Score same-sized RGBA sprites; returns one metrics dict per image."""
+    batch = np.stack([np.asarray(img.convert("RGBA")) for img in images]).astype(np.float32)
+    n, h, w, _ = batch.shape
+    opaque = batch[..., 3] > 127
+    counts = opaque.sum(axis=(1, 2))
+    coverage = counts / (h * w)
+
+    # Alpha centroid distance from center, 0 = centered, 1 = at a corner
+    ys = np.arange(h, dtype=np.float32)[None, :, None] / max(h - 1, 1)
+    xs = np.arange(w, dtype=np.float32)[None, None, :] / max(w - 1, 1)
+    safe = np.maximum(counts, 1)
+    cy = (opaque * ys).sum(axis=(1, 2)) / safe
+    cx = (opaque * xs).sum(axis=(1, 2)) / safe
+    offset = np.hypot(cx - 0.5, cy - 0.5) / np.hypot(0.5, 0.5)
+    centering = np.where(counts > 0, 1.0 - offset, 0.0)
+
+    # Mean luminance gradient where both neighbours are opaque
+    lum = batch[..., :3] @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    gx = np.abs(np.diff(lum, axis=2)) * (opaque[:, :, 1:] & opaque[:, :, :-1])
+    gy = np.abs(np.diff(lum, axis=1)) * (opaque[:, 1:, :] & opaque[:, :-1, :])
+    sharpness = (gx.sum(axis=(1, 2)) + gy.sum(axis=(1, 2))) / safe / 255.0
+
+    packed = (batch[..., 0].astype(np.int64) << 16) | (batch[..., 1].astype(np.int64) << 8) \
+        | batch[..., 2].astype(np.int64)
+    colors = np.array([np.unique(packed[i][opaque[i]]).size for i in range(n)])
+
+    coverage_score = 1.0 - np.minimum(1.0, np.abs(coverage - CANDIDATE_TARGET_COVERAGE)
+                                      / CANDIDATE_TARGET_COVERAGE)
+    sharpness_score = np.minimum(1.0, sharpness / 0.25)
+    color_score = np.where(counts > 0, 1.0 - colors / safe, 0.0)
+    total = (CANDIDATE_WEIGHTS["coverage"] * coverage_score
+             + CANDIDATE_WEIGHTS["centering"] * centering
+             + CANDIDATE_WEIGHTS["sharpness"] * sharpness_score
+             + CANDIDATE_WEIGHTS["colors"] * color_score)
+
+    return [{
+        "score": round(float(total[i]), 4),
+        "coverage": round(float(coverage[i]), 4),
+        "centering": round(float(centering[i]), 4),
+        "sharpness": round(float(sharpness[i]), 4),
+        "colors": int(colors[i]),
+    } for i in range(n)]
+
+
+def pick_candidate(job: dict, raws: list) -> "tuple[int, list]":
+    """Post-process every candidate, score them, and stash the losers for review.
+
+    Returns (best index, prepared full-resolution images).
+    """
+    prepared = [prepare(job, raw) for raw in raws]
+    processed = [render(job, full, job["size"]) for full in prepared]
+    scores = score_candidates(processed)
+    best = max(range(len(scores)), key=lambda i: scores[i]["score"])
+
+    review_dir = build_path("candidates", job["category"])
+    report = []
+    for i, (img, metrics) in enumerate(zip(processed, scores)):
+        seed = job["seed"] + i
+        mark = "*" if i == best else " "
+        print(f"    {mark} seed={seed} score={metrics['score']:.3f} "
+              f"cov={metrics['coverage']:.2f} center={metrics['centering']:.2f} "
+              f"sharp={metrics['sharpness']:.3f} colors={metrics['colors']}")
+        if i != best:
+            img.save(review_dir / f"{job['name']}_s{seed}.png")
+        report.append({"seed": seed, "chosen": i == best, **metrics})
+    (review_dir / f"{job['name']}.json").write_text(json.dumps(report, indent=2))
+    return best, prepared
+
+
+# ── Quality Gate ────────────────────────────────────────────────────────────
+#
+# Catches the classic failure modes before anything is written: rembg
+# eating the whole subject, a near-blank generation, or the background
+# leaking through to the canvas edge. Limits were calibrated against the
+# existing library. Keys: opaque = (min, max) opaque-pixel ratio,
+# bbox_fill = min opaque share of the alpha bounding box, border_alpha =
+# max mean alpha along the 1px canvas border, colors = min unique colors.
+
+QUALITY_DEFAULTS = {
+    "cutout": {"opaque": (0.05, 0.85), "bbox_fill": 0.2, "border_alpha": 0.4, "colors": 64},
+    "opaque": {"colors": 64},
+    "frame": {},
+}
 
-    if seed == -1:
-        seed = _name_seed(monster_key)
+_SMALL_ICON_QUALITY = {"opaque": (0.01, 0.85), "bbox_fill": 0.08, "colors": 4}
+
+QUALITY_THRESHOLDS = {
+    "gear": _SMALL_ICON_QUALITY,
+    "slot_icons": _SMALL_ICON_QUALITY,
+    "event_icons": _SMALL_ICON_QUALITY,
+    "skills": {"opaque": (0.01, 0.85), "bbox_fill": 0.1, "colors": 16},
+    "misc_icons": {"opaque": (0.01, 0.85), "bbox_fill": 0.1, "colors": 16},
+    "vfx": {"opaque": (0.005, 0.85), "bbox_fill": 0.05, "colors": 4},
+    "spell_vfx": {"opaque": (0.005, 0.85), "bbox_fill": 0.05, "colors": 4},
+    "npcs": {"opaque": (0.05, 0.9), "border_alpha": 0.5},  # Portraits may touch the frame
+    "logo": {"opaque": (0.03, 0.9), "bbox_fill": 0.1, "colors": 16},
+}
 
-    print(f"  Generating monster: {monster_key} (seed={seed})...", end=" ", flush=True)
-    prompt = (
-        f"{STYLE_SPRITE}, {desc}, "
-        f"single monster creature, enemy sprite, menacing"
-    )
-    img = _try_img2img(prompt, monster_key, seed=seed)
-    if img is None:
-        print("FAILED")
-        return None
 
-    img = remove_bg(img)
-    img = downscale_nearest(img, MONSTER_SIZE)
+def sprite_quality(img: Image.Image) -> dict:
+    """Opaque ratio, bounding-box fill, border alpha and unique colors of a sprite."""
+    a = np.asarray(img.convert("RGBA"))
+    h, w = a.shape[:2]
+    opaque = a[..., 3] > 127
+    count = int(opaque.sum())
+
+    bbox_fill = 0.0
+    if count:
+        rows = np.flatnonzero(opaque.any(axis=1))
+        cols = np.flatnonzero(opaque.any(axis=0))
+        bbox_fill = count / ((rows[-1] - rows[0] + 1) * (cols[-1] - cols[0] + 1))
+
+    alpha = a[..., 3]
+    border = np.concatenate([alpha[0], alpha[-1], alpha[1:-1, 0], alpha[1:-1, -1]])
+
+    rgb = a[..., :3].astype(np.int64)
+    packed = (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+    return {
+        "opaque": round(count / (h * w), 4),
+        "bbox_fill": round(float(bbox_fill), 4),
+        "border_alpha": round(float(border.mean()) / 255, 4),
+        "colors": int(np.unique(packed[opaque]).size),
+    }
 
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    img.save(out_path)
-    print(f"OK -> {out_path.name}")
-    return out_path
 
+def quality_limits(job: dict) -> dict:
+    limits = dict(QUALITY_DEFAULTS[job["post"]])
+    limits.update(QUALITY_THRESHOLDS.get(job["category"], {}))
+    return limits
+
+
+def check_quality(job: dict, img: Image.Image) -> "tuple[list, dict]":
+    """Return (reasons the sprite fails its category limits, metrics)."""
+    limits = quality_limits(job)
+    if not limits:
+        return [], {}
+    metrics = sprite_quality(img)
+    reasons = []
+    if "opaque" in limits:
+        lo, hi = limits["opaque"]
+        if metrics["opaque"] < lo:
+            reasons.append(f"opaque {metrics['opaque']:.3f} < {lo}")
+        elif metrics["opaque"] > hi:
+            reasons.append(f"opaque {metrics['opaque']:.3f} > {hi}")
+    if "bbox_fill" in limits and metrics["bbox_fill"] < limits["bbox_fill"]:
+        reasons.append(f"bbox fill {metrics['bbox_fill']:.2f} < {limits['bbox_fill']}")
+    if "border_alpha" in limits and metrics["border_alpha"] > limits["border_alpha"]:
+        reasons.append(f"border alpha {metrics['border_alpha']:.2f} > {limits['border_alpha']}")
+    if "colors" in limits and metrics["colors"] < limits["colors"]:
+        reasons.append(f"{metrics['colors']} colors < {limits['colors']}")
+    return reasons, metrics
+
+
+def _retry_seed(job: dict, attempt: int) -> int:
+    """Fresh deterministic seed for a requeued job."""
+    return _name_seed(f"{job['key']}#retry{attempt}")
+
+
+def validate_library():
+    """Run the quality gate over every existing output and list failures."""
+    print("\n=== QUALITY CHECK ===\n")
+    checked = failed = 0
+    for job in build_plan(list(CATEGORIES)):
+        if not job["out_path"].exists():
+            continue
+        checked += 1
+        reasons, _ = check_quality(job, load_sprite(job))
+        if reasons:
+            failed += 1
+            print(f"  FAIL {job['category']}/{job['out_path'].name}: {'; '.join(reasons)}")
+    print(f"\n{failed}/{checked} existing sprites fail the quality gate")
+    if failed:
+        print("Regenerate with: --single <name> (the gate requeues with fresh seeds)")
+
+
+def benchmark_downscale():
+    """Time each downscaler over the library and count exact round trips.
+
+    Each existing sprite is blown up with NEAREST to its generation size —
+    a perfect grid-aligned "raw" — then shrunk back with every method. A
+    round trip is exact when the full RGBA matches; "silhouette" counts
+    matches after cutting both sides' alpha at 128.
+    """
+    print("\n=== DOWNSCALE BENCHMARK ===\n")
+    upscaled = []
+    for job in build_plan(list(CATEGORIES)):
+        if job["out_path"].exists():
+            img = load_sprite(job)
+            upscaled.append((img, img.resize((job["width"], job["height"]), Image.NEAREST)))
+    if not upscaled:
+        print("No sprites on disk to benchmark.")
+        return
+    print(f"{len(upscaled)} sprites\n")
+    for name, scaler in DOWNSCALERS.items():
+        exact = silhouette = 0
+        start = time.perf_counter()
+        for img, big in upscaled:
+            out = np.asarray(scaler(big, img.size).convert("RGBA"))
+            ref = np.asarray(img.convert("RGBA"))
+            exact += np.array_equal(out, ref)
+            opaque = ref[..., 3] >= 128
+            silhouette += (np.array_equal(out[..., 3] >= 128, opaque)
+                           and np.array_equal(out[opaque][:, :3], ref[opaque][:, :3]))
+        elapsed = time.perf_counter() - start
+        print(f"  {name:15s} {elapsed:6.2f}s  ({elapsed / len(upscaled) * 1000:.0f} ms/sprite)"
+              f"  exact round trips: {exact}/{len(upscaled)}, silhouette: {silhouette}/{len(upscaled)}")
+
+
+# ── Asset Registry ──────────────────────────────────────────────────────────
+#
+# Every category maps a prompt table onto an output directory and a
+# post-processing recipe. Jobs are built from these specs so the planner can
+# see every generation input up front — prompt, seed, shape, reference —
+# before anything is sent to Forge.
+
+ASSETS_DIR = OUTPUT_DIR.parent.parent
+MANIFEST_NAME = "sprite_manifest.json"  # rel path -> how the file was made, at each output root
+
+
+def output_root() -> Path:
+    """Where outputs land: assets/, or a separate tree with --output-root."""
+    return Path(CONFIG.get("output_root") or ASSETS_DIR)
+
+
+def _vfx_shape(key: str) -> dict:
+    """Per-key overrides for VFX: wide HP frame, large slashes, small everything else."""
+    if key == "vfx_hp_frame":
+        # No rembg for frame — downscale to 256x32, then hollow out center
+        # Hard-edged border art: keep the baseline NEAREST, not the category's majority
+        return {"gen": (1024, 192), "size": (256, 32), "post": "frame", "downscale": "nearest"}
+    if key.startswith("vfx_slash") or key == "vfx_hit_crit":
+        return {"size": (VFX_SIZE_LARGE, VFX_SIZE_LARGE)}
+    return {}
+
+
+def _ui_texture_shape(key: str) -> dict:
+    """Buttons generate wide and land at 64x24; panels stay square."""
+    if key.startswith("ui_button_"):
+        return {"gen": (1024, 384), "size": (UI_TEX_BTN_WIDTH, UI_TEX_BTN_HEIGHT)}
+    return {}
+
+
+# post: "cutout" = rembg + downscale, "opaque" = downscale only (backgrounds,
+# textures), "frame" = downscale + hollow center (HP bar frame)
+# anim: character categories that --animate can turn into pose strips
+# trim: crop to the opaque box under --trim (offsets go to sprite_trim.json)
+# sheet: small flat icons that --sheet N may generate N x N per Forge image
+# chroma: prompt for a magenta background and key it out under --chroma (rembg as fallback)
+# variants: extra outputs cut from the same raw image, keyed by file suffix —
+# "scale" multiplies the base size, "size" + "crop" (fractions of the opaque
+# bounding box) make a portrait
+# downscale: "nearest" (default), "majority" or "majority-edges" — see DOWNSCALERS;
+# flat icons take the block vote so half-pixel grid drift doesn't smear them
+CATEGORIES = {
+    "heroes": {
+        "title": "HERO SPRITES (128x128)", "label": "hero",
+        "table": HERO_BASES, "dir": "sprites/generated/heroes", "name": "{key}_base",
+        "style": STYLE_SPRITE, "size": (HERO_SIZE, HERO_SIZE), "post": "cutout",
+        "img2img": True, "anim": True, "trim": True, "chroma": True,
+        "variants": {"_portrait": {"size": (HERO_PORTRAIT_SIZE, HERO_PORTRAIT_SIZE),
+                                   "crop": (0.2, 0.0, 0.8, 0.4)}},
+    },
+    "monsters": {
+        "title": "MONSTER SPRITES (128x128)", "label": "monster",
+        "table": MONSTERS, "dir": "sprites/generated/monsters",
+        "style": STYLE_SPRITE, "suffix": "single monster creature, enemy sprite, menacing",
+        "size": (MONSTER_SIZE, MONSTER_SIZE), "post": "cutout", "img2img": True, "anim": True,
+        "trim": True, "chroma": True,
+    },
+    "followers": {
+        "title": "FOLLOWER SPRITES (64x64)", "label": "follower",
+        "table": FOLLOWERS, "dir": "sprites/generated/followers",
+        "style": STYLE_SPRITE, "suffix": "tiny companion creature, small cute monster pet",
+        "size": (FOLLOWER_SIZE, FOLLOWER_SIZE), "post": "cutout", "img2img": True, "anim": True,
+        "trim": True, "chroma": True,
+    },
+    "gear": {
+        "title": "GEAR ICONS (32x32)", "label": "gear icon",
+        "table": GEAR_ICONS, "dir": "sprites/generated/gear",
+        "style": STYLE_ICON, "size": (GEAR_ICON_SIZE, GEAR_ICON_SIZE), "post": "cutout",
+        "downscale": "majority", "sheet": True,
+    },
+    "slot_icons": {
+        "title": "SLOT ICONS (32x32)", "label": "slot icon",
+        "table": SLOT_ICONS, "dir": "sprites/generated/gear",
+        "style": STYLE_ICON, "size": (GEAR_ICON_SIZE, GEAR_ICON_SIZE), "post": "cutout",
+        "downscale": "majority", "sheet": True,
+    },
+    "event_icons": {
+        # Same pipeline as slot icons (32x32 gear)
+        "title": "EVENT ICONS (32x32)", "label": "event icon",
+        "table": EVENT_ICONS, "dir": "sprites/generated/gear",
+        "style": STYLE_ICON, "size": (GEAR_ICON_SIZE, GEAR_ICON_SIZE), "post": "cutout",
+        "downscale": "majority", "sheet": True,
+    },
+    "event_icons_lg": {
+        "title": "LARGE EVENT ICONS (64x64)", "label": "event icon",
+        "table": EVENT_ICONS_LG, "dir": "sprites/generated/events",
+        "style": STYLE_ICON, "size": (EVENT_ICON_SIZE_LG, EVENT_ICON_SIZE_LG), "post": "cutout",
+    },
+    "misc_icons": {
+        "title": "MISC ICONS (48x48)", "label": "misc icon",
+        "table": MISC_ICONS, "dir": "sprites/generated/icons",
+        "style": STYLE_SKILL, "size": (SKILL_ICON_SIZE, SKILL_ICON_SIZE), "post": "cutout",
+    },
+    "npcs": {
+        "title": "NPC SPRITES (128x128)", "label": "NPC",
+        "table": NPC_SPRITES, "dir": "sprites/generated/npcs",
+        "style": STYLE_NPC, "size": (HERO_SIZE, HERO_SIZE), "post": "cutout",
+    },
+    "skills": {
+        "title": "SKILL ICONS (48x48)", "label": "skill icon",
+        "table": {**SKILL_ICON_SPRITES, **ULT_ICON_SPRITES}, "dir": "sprites/generated/skills",
+        "style": STYLE_SKILL, "size": (SKILL_ICON_SIZE, SKILL_ICON_SIZE), "post": "cutout",
+        "variants": {"@2x": {"scale": 2}},
+    },
+    "logo": {
+        # Generate at 1024x384 (~2.67:1 aspect ratio close to 3:1 logo)
+        "title": "GAME LOGO (480x160)", "label": "logo",
+        "table": LOGO_SPRITES, "dir": "sprites/generated/ui",
+        "style": STYLE_LOGO, "gen": (1024, 384), "size": (LOGO_WIDTH, LOGO_HEIGHT), "post": "cutout",
+    },
+    "backgrounds": {
+        # Generate at 1024x576 (16:9 closest to 1024)
+        "title": "BATTLE BACKGROUNDS (640x360)", "label": "background",
+        "table": BATTLE_BACKGROUNDS, "dir": "tilesets/battle_backgrounds",
+        "style": STYLE_BG, "gen": (1024, 576), "size": (BG_WIDTH, BG_HEIGHT), "post": "opaque",
+    },
+    "vfx": {
+        "title": "VFX SPRITES (48x48 / 32x32)", "label": "VFX",
+        "table": VFX_SPRITES, "dir": "sprites/generated/vfx",
+        "style": STYLE_VFX, "size": (VFX_SIZE_SMALL, VFX_SIZE_SMALL), "post": "cutout",
+        "shape": _vfx_shape, "downscale": "majority",
+    },
+    "spell_vfx": {
+        "title": "SPELL VFX SPRITES (32x32)", "label": "spell VFX",
+        "table": SPELL_VFX_SPRITES, "dir": "sprites/generated/vfx",
+        "style": STYLE_VFX, "size": (VFX_SIZE_SMALL, VFX_SIZE_SMALL), "post": "cutout",
+    },
+    "ui_textures": {
+        # No rembg — UI textures need opaque backgrounds
+        "title": "UI TEXTURES (64x64 / 64x24)", "label": "UI texture",
+        "table": UI_TEXTURES, "dir": "sprites/generated/ui",
+        "style": STYLE_UI_TEXTURE, "size": (UI_TEX_PANEL_SIZE, UI_TEX_PANEL_SIZE), "post": "opaque",
+        "shape": _ui_texture_shape,
+    },
+}
 
-def gen_follower(follower_key: str, desc: str, seed: int = -1) -> "Path | None":
-    """Generate a follower sprite (single 64x64 frame)."""
-    out_path = OUTPUT_DIR / "followers" / f"{follower_key}.png"
-    if out_path.exists() and not CONFIG.get("force"):
-        print(f"  SKIP (exists): {out_path.name}")
-        return out_path
 
+def find_category(name: str) -> "tuple[str, str] | None":
+    """Resolve a sprite name (key or output stem) to (category, key)."""
+    for category, spec in CATEGORIES.items():
+        if name in spec["table"]:
+            return category, name
+        stem = spec.get("name", "{key}")
+        if stem != "{key}":
+            prefix, _, suffix = stem.partition("{key}")
+            if name.startswith(prefix) and name.endswith(suffix):
+                key = name[len(prefix):len(name) - len(suffix)]
+                if key in spec["table"]:
+                    return category, key
+    return None
+
+
+def make_job(category: str, key: str, desc: str = None, seed: int = -1) -> dict:
+    """Describe one output: its generation inputs and how to post-process it."""
+    spec = CATEGORIES[category]
+    if desc is None:
+        desc = spec["table"][key]
     if seed == -1:
-        seed = _name_seed(follower_key)
+        seed = _name_seed(key)
+
+    shape = {"gen": spec.get("gen"), "size": spec["size"], "post": spec["post"],
+             "downscale": spec.get("downscale", "nearest")}
+    if "shape" in spec:
+        shape.update(spec["shape"](key))
+    width, height = shape["gen"] or (CONFIG["gen_size"], CONFIG["gen_size"])
+
+    style = spec["style"]
+    matte = "chroma" if CONFIG.get("chroma") and spec.get("chroma") else "rembg"
+    if matte == "chroma":
+        if "transparent background" in style:
+            style = style.replace("transparent background", CHROMA_PROMPT)
+        else:
+            style = f"{style}, {CHROMA_PROMPT}"
+    prompt = f"{style}, {desc}"
+    if spec.get("suffix"):
+        prompt = f"{prompt}, {spec['suffix']}"
+
+    name = spec.get("name", "{key}").format(key=key)
+    rel = f"{spec['dir']}/{name}.png"
+    variants = []
+    for suffix, variant in spec.get("variants", {}).items():
+        scale = variant.get("scale", 1)
+        size = variant.get("size") or (shape["size"][0] * scale, shape["size"][1] * scale)
+        variant_rel = f"{spec['dir']}/{name}{suffix}.png"
+        variants.append({"size": size, "crop": variant.get("crop"), "rel": variant_rel,
+                         "out_path": output_root() / variant_rel})
+    job = {
+        "category": category,
+        "key": key,
+        "name": name,
+        "desc": desc,
+        "prompt": prompt,
+        "seed": seed,
+        "width": width,
+        "height": height,
+        "ref": _find_reference(name) if spec.get("img2img") else None,
+        "size": shape["size"],
+        "post": shape["post"],
+        "matte": matte,
+        "downscale": CONFIG.get("downscale") or shape["downscale"],
+        "rel": rel,
+        "out_path": output_root() / rel,
+        "variants": variants,
+    }
+    # Planned inputs; provenance also records the fingerprint of the seed actually kept
+    job["fingerprint"] = input_fingerprint(job)
+    for variant in variants:
+        variant["fingerprint"] = input_fingerprint(dict(job, **variant))
+    return job
 
-    print(f"  Generating follower: {follower_key} (seed={seed})...", end=" ", flush=True)
-    prompt = (
-        f"{STYLE_SPRITE}, {desc}, "
-        f"tiny companion creature, small cute monster pet"
-    )
-    img = _try_img2img(prompt, follower_key, seed=seed)
-    if img is None:
-        print("FAILED")
-        return None
 
-    img = remove_bg(img)
-    img = downscale_nearest(img, FOLLOWER_SIZE)
+def _gen_key(job: dict) -> str:
+    """Fingerprint of everything Forge sees — equal keys produce equal raw images."""
+    parts = [
+        job["prompt"], job["seed"], job["width"], job["height"],
+        CONFIG["sd_steps"], CONFIG["sd_cfg"], CONFIG["sd_sampler"], CONFIG["guidance"],
+    ]
+    if job["ref"]:
+        parts += [str(job["ref"]), CONFIG["strength"]]
+    return hashlib.sha1(json.dumps(parts).encode()).hexdigest()
 
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    img.save(out_path)
-    print(f"OK -> {out_path.name}")
-    return out_path
 
+def input_fingerprint(job: dict) -> str:
+    """Fingerprint of everything that shapes an output: Forge inputs plus post-processing."""
+    parts = [_gen_key(job), list(job["size"]), job["post"], job["downscale"], job.get("crop")]
+    return hashlib.sha1(json.dumps(parts).encode()).hexdigest()
 
-def gen_background(bg_key: str, desc: str, seed: int = -1) -> "Path | None":
-    """Generate a battle background (640x360)."""
-    out_dir = OUTPUT_DIR.parent.parent / "tilesets" / "battle_backgrounds"
-    out_path = out_dir / f"{bg_key}.png"
-    if out_path.exists() and not CONFIG.get("force"):
-        print(f"  SKIP (exists): {out_path.name}")
-        return out_path
 
-    if seed == -1:
-        seed = _name_seed(bg_key)
-
-    print(f"  Generating background: {bg_key} (seed={seed})...", end=" ", flush=True)
-    prompt = f"{STYLE_BG}, {desc}"
-    # Generate at 1024x576 (16:9 closest to 1024)
-    img = generate_image(prompt, seed=seed, width=1024, height=576)
-    if img is None:
-        print("FAILED")
-        return None
+def build_plan(categories: list) -> list:
+    """All jobs for the given categories, in category order."""
+    return [make_job(category, key)
+            for category in categories
+            for key in CATEGORIES[category]["table"]]
 
-    img = downscale_bg(img, BG_WIDTH, BG_HEIGHT)
 
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    img.save(out_path)
-    print(f"OK -> {out_path.name}")
-    return out_path
+def group_jobs(jobs: list) -> dict:
+    """Group jobs by generation inputs, preserving first-seen order."""
+    groups = {}
+    for job in jobs:
+        groups.setdefault(_gen_key(job), []).append(job)
+    return groups
 
 
-def gen_gear_icon(item_key: str, desc: str, seed: int = -1) -> "Path | None":
-    """Generate a gear item icon (single 32x32 icon)."""
-    out_path = OUTPUT_DIR / "gear" / f"{item_key}.png"
-    if out_path.exists() and not CONFIG.get("force"):
-        print(f"  SKIP (exists): {out_path.name}")
-        return out_path
+# ── Output Writer ───────────────────────────────────────────────────────────
+#
+# Outputs are encoded in memory, written to a hidden temp file beside the
+# destination, fsynced and os.replace()d into place, so a killed run can
+# never leave a truncated PNG for the exists() skip to trust. The work runs
+# on a small thread pool and overlaps the next Forge call.
 
-    if seed == -1:
-        seed = _name_seed(item_key)
+WRITER_THREADS = 2
+_writer = None
 
-    print(f"  Generating gear icon: {item_key} (seed={seed})...", end=" ", flush=True)
-    prompt = f"{STYLE_ICON}, {desc}"
-    img = generate_image(prompt, seed=seed)
-    if img is None:
-        print("FAILED")
-        return None
 
-    img = remove_bg(img)
-    img = downscale_nearest(img, GEAR_ICON_SIZE)
+def atomic_save(img: Image.Image, path: Path, provenance: dict = None) -> str:
+    """Write img as PNG via temp file + fsync + rename; returns its sha256."""
+    buf = io.BytesIO()
+    img.save(buf, format="PNG", pnginfo=_provenance_chunk(provenance) if provenance else None)
+    return atomic_write(path, buf.getvalue())
 
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    img.save(out_path)
-    print(f"OK -> {out_path.name}")
-    return out_path
 
+def atomic_write(path: Path, data: bytes) -> str:
+    """Write bytes via temp file + fsync + rename; returns their sha256."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    if hasattr(os, "O_DIRECTORY"):  # Persist the rename itself (POSIX only)
+        fd = os.open(path.parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    return hashlib.sha256(data).hexdigest()
 
-def gen_npc(npc_key: str, desc: str, seed: int = -1) -> "Path | None":
-    """Generate an NPC sprite (single 128x128 frame)."""
-    out_path = OUTPUT_DIR / "npcs" / f"{npc_key}.png"
-    if out_path.exists() and not CONFIG.get("force"):
-        print(f"  SKIP (exists): {out_path.name}")
-        return out_path
 
-    if seed == -1:
-        seed = _name_seed(npc_key)
+def save_async(img: Image.Image, path: Path, provenance: dict = None):
+    """Queue atomic_save on the writer pool; the future resolves to the sha256."""
+    global _writer
+    if _writer is None:
+        _writer = ThreadPoolExecutor(max_workers=WRITER_THREADS, thread_name_prefix="writer")
+    return _writer.submit(atomic_save, img, path, provenance)
 
-    print(f"  Generating NPC: {npc_key} (seed={seed})...", end=" ", flush=True)
-    prompt = f"{STYLE_NPC}, {desc}"
-    img = generate_image(prompt, seed=seed)
-    if img is None:
-        print("FAILED")
-        return None
 
-    img = remove_bg(img)
-    img = downscale_nearest(img, HERO_SIZE)  # 128x128
+def collect_writes(writes: list, manifest: dict, block: bool = False) -> "tuple[int, int]":
+    """Record finished writes in the manifest (all of them when block).
 
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    img.save(out_path)
-    print(f"OK -> {out_path.name}")
-    return out_path
+    writes holds [future, rel, entry, is_main] and is trimmed in place.
+    Returns (entries recorded, main outputs that failed).
+    """
+    if block:
+        wait([w[0] for w in writes])
+    recorded = failed = 0
+    for item in [w for w in writes if w[0].done()]:
+        writes.remove(item)
+        future, rel, entry, is_main = item
+        error = future.exception()
+        if error:
+            print(f"    WRITE FAILED {rel}: {error}")
+            failed += is_main
+            continue
+        if entry is not None:
+            manifest[rel] = dict(entry, sha256=future.result())
+            recorded += 1
+    return recorded, failed
+
+
+# ── Provenance ──────────────────────────────────────────────────────────────
+#
+# Every output PNG carries one uncompressed iTXt chunk (ahead of the pixel
+# data) saying how it was made: the seed that was actually kept and the
+# input fingerprint for it, the planned fingerprint it answers to (the two
+# differ after a gate retry, a picked candidate or a reseed), the generation
+# parameters, the pipeline version and a hash of the raw image it was cut
+# from. Staleness is then a read of the file's first few hundred bytes — no
+# pixel decode, no side database.
+
+PIPELINE_VERSION = 2  # Bump when post-processing changes what the same inputs produce
+PROVENANCE_KEY = "pixel-arena:provenance"
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def provenance(job: dict, seed: int, raw_hash: str) -> dict:
+    """The record embedded in an output made from job's raw image."""
+    params = {
+        "prompt": job["prompt"], "width": job["width"], "height": job["height"],
+        "steps": CONFIG["sd_steps"], "cfg": CONFIG["sd_cfg"], "sampler": CONFIG["sd_sampler"],
+        "guidance": CONFIG["guidance"], "size": list(job["size"]), "post": job["post"],
+        "downscale": job["downscale"], "matte": job["matte"],
+    }
+    if job["ref"]:
+        params.update(ref=job["ref"].name, strength=CONFIG["strength"])
+    if job.get("crop"):
+        params["crop"] = list(job["crop"])
+    return {
+        "fingerprint": input_fingerprint(dict(job, seed=seed)),
+        "planned": job["fingerprint"],
+        "seed": seed,
+        "params": params,
+        "pipeline": PIPELINE_VERSION,
+        "raw_sha256": raw_hash,
+    }
 
 
-def gen_skill_icon(skill_key: str, desc: str, seed: int = -1) -> "Path | None":
-    """Generate a skill/ultimate ability icon (single 48x48 icon)."""
-    out_path = OUTPUT_DIR / "skills" / f"{skill_key}.png"
-    if out_path.exists() and not CONFIG.get("force"):
-        print(f"SKIP (exists): {out_path.name}")
-        return out_path
+def _provenance_chunk(record: dict):
+    from PIL.PngImagePlugin import PngInfo
+    info = PngInfo()
+    info.add_itxt(PROVENANCE_KEY, json.dumps(record, sort_keys=True, separators=(",", ":")))
+    return info
 
-    if seed == -1:
-        seed = _name_seed(skill_key)
 
-    print(f"{skill_key} (seed={seed})")
-    t0 = time.time()
-    prompt = f"{STYLE_SKILL}, {desc}"
-    img = generate_image(prompt, seed=seed)
-    if img is None:
-        print(f"    FAILED ({time.time()-t0:.1f}s)")
+def read_provenance(path: Path) -> "dict | None":
+    """The provenance record of a PNG, reading chunk headers only up to the pixel data."""
+    try:
+        with open(path, "rb") as f:
+            if f.read(8) != PNG_SIGNATURE:
+                return None
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    return None
+                length, kind = int.from_bytes(header[:4], "big"), header[4:]
+                if kind in (b"IDAT", b"IEND"):
+                    return None  # Text chunks after the pixels aren't ours
+                if kind not in (b"iTXt", b"tEXt"):
+                    f.seek(length + 4, os.SEEK_CUR)  # Skip data + CRC
+                    continue
+                data = f.read(length)
+                f.seek(4, os.SEEK_CUR)
+                keyword, _, rest = data.partition(b"\0")
+                if keyword.decode("latin-1") != PROVENANCE_KEY:
+                    continue
+                if kind == b"iTXt":
+                    # compression flag, method, language\0, translated keyword\0, text
+                    if rest[0]:
+                        return None  # We never write compressed records
+                    text = rest[2:].split(b"\0", 2)[2].decode("utf-8")
+                else:
+                    text = rest.decode("latin-1")
+                return json.loads(text)
+    except (OSError, ValueError, IndexError):
         return None
 
-    print(f"    Removing background...", end=" ", flush=True)
-    img = remove_bg(img)
-    img = downscale_nearest(img, SKILL_ICON_SIZE)
 
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    img.save(out_path)
-    print(f"OK -> {out_path.name} ({time.time()-t0:.1f}s)")
-    return out_path
+def staleness(job: dict, path: Path = None) -> str:
+    """"missing", "untracked" (no record), "stale" or "current" for a job's output.
 
+    Current means the planned inputs haven't changed, even if the kept seed
+    differs from the planned one.
+    """
+    path = path or _sprite_path(job)
+    if not path.exists():
+        return "missing"
+    record = read_provenance(path)
+    if record is None:
+        return "untracked"
+    planned = record.get("planned", record.get("fingerprint"))  # Older records hold only the plan
+    if planned != job["fingerprint"] or record.get("pipeline") != PIPELINE_VERSION:
+        return "stale"
+    return "current"
+
+
+def show_provenance(categories: list):
+    """Summarize output staleness from embedded provenance and list stale files."""
+    print("\n=== PROVENANCE ===\n")
+    counts = {"current": 0, "stale": 0, "untracked": 0, "missing": 0}
+    start = time.perf_counter()
+    for job in build_plan(categories):
+        state = staleness(job)
+        counts[state] += 1
+        if state == "stale":
+            print(f"  STALE {job['rel']}")
+    elapsed = time.perf_counter() - start
+    print(f"\n{counts['current']} current, {counts['stale']} stale, "
+          f"{counts['untracked']} untracked (made before provenance), {counts['missing']} missing "
+          f"— checked in {elapsed * 1000:.0f} ms")
+    if counts["stale"]:
+        print("Regenerate with: --category <name> --rebuild-stale")
+
+
+# ── Trimming ────────────────────────────────────────────────────────────────
+#
+# --trim crops character sprites (spec "trim") to their opaque bounding box
+# plus a little padding, so a crowded battle scene stops uploading and
+# overdrawing mostly-empty canvases. Where each trimmed image sat on its
+# original canvas goes to sprite_trim.json at the output root, keyed like
+# the manifest; LayeredSprite reads it to draw the sprite where the full
+# canvas would have put it.
+
+TRIM_NAME = "sprite_trim.json"
+TRIM_PADDING = 1  # Transparent px kept around the opaque box (--trim with no value)
+
+
+def trim(img: Image.Image, padding: int = TRIM_PADDING) -> "tuple[Image.Image, dict | None]":
+    """Crop to the alpha bounding box plus padding; returns (image, index entry).
+
+    The entry records the canvas size, the crop's offset on it and the pivot
+    (canvas center) in trimmed-image pixels. Empty or already-tight images
+    come back unchanged with no entry.
+    """
+    img = img.convert("RGBA")
+    w, h = img.size
+    bbox = img.getchannel("A").getbbox()
+    if not bbox:
+        return img, None
+    left, top = max(0, bbox[0] - padding), max(0, bbox[1] - padding)
+    right, bottom = min(w, bbox[2] + padding), min(h, bbox[3] + padding)
+    if (left, top, right, bottom) == (0, 0, w, h):
+        return img, None
+    return img.crop((left, top, right, bottom)), {
+        "canvas": [w, h],
+        "offset": [left, top],
+        "size": [right - left, bottom - top],
+        "pivot": [w // 2 - left, h // 2 - top],
+    }
 
-def gen_logo(logo_key: str, desc: str, seed: int = -1) -> "Path | None":
-    """Generate the game logo (480x160 wide banner)."""
-    out_path = OUTPUT_DIR / "ui" / f"{logo_key}.png"
-    if out_path.exists() and not CONFIG.get("force"):
-        print(f"  SKIP (exists): {out_path.name}")
-        return out_path
 
-    if seed == -1:
-        seed = _name_seed(logo_key)
-
-    print(f"  Generating logo: {logo_key} (seed={seed})...", end=" ", flush=True)
-    prompt = f"{STYLE_LOGO}, {desc}"
-    # Generate at 1024x384 (~2.67:1 aspect ratio close to 3:1 logo)
-    img = generate_image(prompt, seed=seed, width=1024, height=384)
-    if img is None:
-        print("FAILED")
-        return None
+def untrim(img: Image.Image, entry: dict) -> Image.Image:
+    """Put a trimmed image back on its original transparent canvas."""
+    canvas = Image.new("RGBA", tuple(entry["canvas"]), (0, 0, 0, 0))
+    canvas.paste(img.convert("RGBA"), tuple(entry["offset"]))
+    return canvas
 
-    img = remove_bg(img)
-    img = img.resize((LOGO_WIDTH, LOGO_HEIGHT), Image.NEAREST)
 
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    img.save(out_path)
-    print(f"OK -> {out_path.name}")
-    return out_path
+def load_trim_index(root: Path) -> dict:
+    path = root / TRIM_NAME
+    if path.exists():
+        return json.loads(path.read_text())
+    return {}
 
 
-def gen_vfx(vfx_key: str, desc: str, size: int = None, seed: int = -1) -> "Path | None":
-    """Generate a VFX combat sprite (48x48 for slashes/crit, 32x32 for others, 128x16 for hp_frame)."""
-    out_path = OUTPUT_DIR / "vfx" / f"{vfx_key}.png"
-    if out_path.exists() and not CONFIG.get("force"):
-        print(f"SKIP (exists): {out_path.name}")
-        return out_path
+def save_trim_index(root: Path, index: dict):
+    _save_json(root / TRIM_NAME, index)
 
-    # HP bar frame is a special wide aspect ratio
-    is_hp_frame = vfx_key == "vfx_hp_frame"
 
-    if size is None:
-        if is_hp_frame:
-            size = 256  # width; height will be 32
-        elif vfx_key.startswith("vfx_slash") or vfx_key == "vfx_hit_crit":
-            size = VFX_SIZE_LARGE
-        else:
-            size = VFX_SIZE_SMALL
+def load_sprite(job: dict) -> Image.Image:
+    """A job's saved output at full canvas size, undoing --trim if it was applied."""
+    img = Image.open(_sprite_path(job)).convert("RGBA")
+    entry = {**load_trim_index(ASSETS_DIR), **load_trim_index(output_root())}.get(job["rel"])
+    if entry and list(img.size) == entry["size"]:
+        return untrim(img, entry)
+    return img
 
-    if seed == -1:
-        seed = _name_seed(vfx_key)
 
-    print(f"{vfx_key} (seed={seed})")
-    t0 = time.time()
-    prompt = f"{STYLE_VFX}, {desc}"
-    if is_hp_frame:
-        img = generate_image(prompt, seed=seed, width=1024, height=192)
+def trim_existing(categories: list, padding: int):
+    """Trim sprites already on disk (those not yet trimmed) and index them."""
+    print(f"\n=== TRIM (padding {padding}px) ===\n")
+    root = output_root()
+    index = load_trim_index(root)
+    manifest = load_manifest(root)
+    before = after = count = 0
+    for job in build_plan(categories):
+        if not CATEGORIES[job["category"]].get("trim") or not job["out_path"].exists():
+            continue
+        img = load_sprite(job)  # Full canvas, so re-trimming with new padding works
+        trimmed, entry = trim(img, padding)
+        before += img.width * img.height
+        after += trimmed.width * trimmed.height
+        if entry == index.get(job["rel"]):
+            continue
+        sha = atomic_save(trimmed, job["out_path"], read_provenance(job["out_path"]))
+        if job["rel"] in manifest:
+            manifest[job["rel"]]["sha256"] = sha
+        if entry:
+            index[job["rel"]] = entry
+        else:
+            index.pop(job["rel"], None)
+        count += 1
+        print(f"  {job['rel']}: {img.width}x{img.height} -> {trimmed.width}x{trimmed.height}")
+    save_trim_index(root, index)
+    if manifest:
+        save_manifest(root, manifest)
+    saved = 100 * (1 - after / before) if before else 0
+    print(f"\n{count} sprites trimmed; texels {before} -> {after} ({saved:.0f}% smaller)")
+
+
+# ── Generation ──────────────────────────────────────────────────────────────
+
+def _generate_raw(job: dict, batch_size: int = 1) -> "list[Image.Image] | None":
+    """Run the Forge call for a job (img2img when a reference was found)."""
+    if job["ref"]:
+        print(f"    (img2img ref={job['ref'].name}, strength={CONFIG['strength']})")
+        return generate_images_img2img(
+            job["prompt"], str(job["ref"]),
+            strength=CONFIG["strength"],
+            seed=job["seed"], width=job["width"], height=job["height"],
+            batch_size=batch_size
+        )
+    return generate_images(job["prompt"], seed=job["seed"],
+                           width=job["width"], height=job["height"],
+                           batch_size=batch_size)
+
+
+def prepare(job: dict, raw: Image.Image) -> Image.Image:
+    """Full-resolution source every output size is cut from (background removed once)."""
+    if job["post"] == "cutout":
+        if job["matte"] == "chroma":
+            keyed = chroma_key(raw)
+            if keyed is not None:
+                return keyed
+            print("    Chroma key failed its coverage check — falling back to rembg")
+        return remove_bg(raw)
+    return raw
+
+
+def _crop_box(full: Image.Image, crop: tuple, size: "tuple[int, int]") -> tuple:
+    """Pixel box for crop fractions of the opaque area, widened to the target aspect."""
+    bbox = full.getchannel("A").getbbox() if full.mode == "RGBA" else None
+    left, top, right, bottom = bbox or (0, 0, *full.size)
+    bw, bh = right - left, bottom - top
+    x0, y0 = left + crop[0] * bw, top + crop[1] * bh
+    x1, y1 = left + crop[2] * bw, top + crop[3] * bh
+    w, h = x1 - x0, y1 - y0
+    aspect = size[0] / size[1]
+    if w / h < aspect:
+        x0, x1 = (x0 + x1 - h * aspect) / 2, (x0 + x1 + h * aspect) / 2
     else:
-        img = generate_image(prompt, seed=seed)
-    if img is None:
-        print(f"    FAILED ({time.time()-t0:.1f}s)")
-        return None
+        y0, y1 = (y0 + y1 - w / aspect) / 2, (y0 + y1 + w / aspect) / 2
+    return tuple(round(v) for v in (x0, y0, x1, y1))
 
-    if is_hp_frame:
-        # No rembg for frame — downscale to 256x32, then hollow out center
-        img = img.resize((256, 32), Image.NEAREST)
+
+def render(job: dict, full: Image.Image, size: "tuple[int, int]", crop: tuple = None) -> Image.Image:
+    """Cut one output size (optionally a crop) from a prepared full-resolution image."""
+    if crop:
+        full = full.crop(_crop_box(full, crop, size))
+    img = DOWNSCALERS[job["downscale"]](full, size)
+    if job["post"] == "frame":
         img = img.convert("RGBA")
         w, h = img.size
         border = 4
@@ -1421,528 +2476,1421 @@ def gen_vfx(vfx_key: str, desc: str, size: int = None, seed: int = -1) -> "Path
             for x in range(border, w - border):
                 r, g, b, a = img.getpixel((x, y))
                 img.putpixel((x, y), (r, g, b, 0))
-        print(f"    Hollowed center...", end=" ", flush=True)
-    else:
-        print(f"    Removing background...", end=" ", flush=True)
-        img = remove_bg(img)
-        img = downscale_nearest(img, size)
+    return img
 
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    img.save(out_path)
-    print(f"OK -> {out_path.name} ({time.time()-t0:.1f}s)")
-    return out_path
 
+def postprocess(job: dict, raw: Image.Image) -> Image.Image:
+    """Turn a raw 1024px generation into the job's final sprite."""
+    return render(job, prepare(job, raw), job["size"])
 
-def gen_slot_icon(slot_key: str, desc: str, seed: int = -1) -> "Path | None":
-    """Generate a slot placeholder icon (single 32x32 icon)."""
-    out_path = OUTPUT_DIR / "gear" / f"{slot_key}.png"
-    if out_path.exists() and not CONFIG.get("force"):
-        print(f"  SKIP (exists): {out_path.name}")
-        return out_path
 
-    if seed == -1:
-        seed = _name_seed(slot_key)
+def _sheetable(group: list) -> bool:
+    """Small flat icons with no reference image can share an icon sheet."""
+    return all(CATEGORIES[job["category"]].get("sheet") for job in group) and not group[0]["ref"]
 
-    print(f"  Generating slot icon: {slot_key} (seed={seed})...", end=" ", flush=True)
-    prompt = f"{STYLE_ICON}, {desc}"
-    img = generate_image(prompt, seed=seed)
-    if img is None:
-        print("FAILED")
-        return None
 
-    img = remove_bg(img)
-    img = downscale_nearest(img, GEAR_ICON_SIZE)
+def pack_sheets(groups: list, per_sheet: int) -> list:
+    """Deal sheetable groups into sheets of up to per_sheet cells, one style and size per sheet."""
+    buckets = {}
+    for group in groups:
+        first = group[0]
+        bucket = (CATEGORIES[first["category"]]["style"], tuple(first["size"]), first["post"])
+        buckets.setdefault(bucket, []).append(group)
+    return [members[k:k + per_sheet]
+            for members in buckets.values()
+            for k in range(0, len(members), per_sheet)]
 
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    img.save(out_path)
-    print(f"OK -> {out_path.name}")
-    return out_path
 
+def sheet_prompt(groups: list, grid: int) -> str:
+    """One prompt asking for a grid of distinct icons, listed in reading order."""
+    style = CATEGORIES[groups[0][0]["category"]]["style"]
+    items = "; ".join(f"{n}. {group[0]['desc']}" for n, group in enumerate(groups, 1))
+    return (f"{style}, icon sheet, {grid}x{grid} grid of {len(groups)} separate distinct icons, "
+            f"one item centered in each equal square cell, reading left to right then top to bottom, "
+            f"uniform plain flat background, wide empty gutters, nothing crossing cell borders: {items}")
 
-def gen_event_icon_lg(icon_key: str, desc: str, seed: int = -1) -> "Path | None":
-    """Generate a large event icon (64x64) for room overlays."""
-    out_path = OUTPUT_DIR / "events" / f"{icon_key}.png"
-    if out_path.exists() and not CONFIG.get("force"):
-        print(f"  SKIP (exists): {out_path.name}")
-        return out_path
 
-    if seed == -1:
-        seed = _name_seed(icon_key)
+def sheet_shape(count: int) -> "tuple[int, int]":
+    """(grid side, cell px) of a sheet holding count icons."""
+    return max(2, int(np.ceil(np.sqrt(count)))), CONFIG["gen_size"] // CONFIG["sheet"]
+
 
-    print(f"  Generating event icon: {icon_key} (seed={seed})...", end=" ", flush=True)
-    prompt = f"{STYLE_ICON}, {desc}"
-    img = generate_image(prompt, seed=seed)
-    if img is None:
-        print("FAILED")
+def plan_entries(groups: list) -> list:
+    """Queue entries for dedup groups: one group per generation, or several per icon sheet."""
+    entries = [[group] for group in groups]
+    if CONFIG.get("sheet"):
+        cells = [entry[0] for entry in entries if _sheetable(entry[0])]
+        sheets = [sheet for sheet in pack_sheets(cells, CONFIG["sheet"] ** 2) if len(sheet) > 1]
+        packed = {id(group) for sheet in sheets for group in sheet}
+        entries = sheets + [entry for entry in entries if id(entry[0]) not in packed]
+    return entries
+
+
+def generate_sheet(groups: list, seed: int) -> "tuple[list, int] | None":
+    """Generate one icon sheet; returns (cell images in group order, grid side)."""
+    grid, cell = sheet_shape(len(groups))
+    images = generate_images(sheet_prompt(groups, grid), seed=seed,
+                             width=cell * grid, height=cell * grid)
+    if not images:
         return None
+    sheet = images[0]
+    review = build_path("sheets") / f"sheet_s{seed}.png"
+    sheet.save(review)
+    cells = [sheet.crop((c * cell, r * cell, (c + 1) * cell, (r + 1) * cell))
+             for r in range(grid) for c in range(grid)]
+    return cells[:len(groups)], grid
+
+
+def run_plan(jobs: list) -> int:
+    """Generate every pending job, running each distinct Forge input once.
+
+    Jobs whose prompt, seed, shape and reference are identical share a
+    single raw image; each output still gets its own post-processing.
+    With --candidates N, each generation is a batch of N seeds and the
+    best-scoring one is kept. With --sheet N, small icons are packed N x N
+    into one generation and sliced. Outputs that fail the quality gate are
+    requeued with a fresh seed up to --max-retries times and logged to
+    the rejects report.
+    Returns the number of outputs written (or already present).
+    """
+    candidates = CONFIG.get("candidates", 1)
+    max_retries = CONFIG.get("max_retries", 2)
+    gate = CONFIG.get("quality_gate", True)
 
-    img = remove_bg(img)
-    img = downscale_nearest(img, EVENT_ICON_SIZE_LG)
+    pending = []
+    seen = set()
+    done = 0
+    for job in jobs:
+        if job["out_path"] in seen:
+            continue  # Same file reached through two tables
+        seen.add(job["out_path"])
+        if _already_done(job) and not CONFIG.get("force"):
+            if CONFIG.get("rebuild_stale") and staleness(job) == "stale":
+                print(f"  STALE (inputs changed): {job['out_path'].name}")
+                pending.append(job)
+                continue
+            print(f"  SKIP (exists): {job['out_path'].name}")
+            done += 1
+        else:
+            pending.append(job)
+
+    groups = group_jobs(pending)
+    shared = len(pending) - len(groups)
+    if shared:
+        print(f"  Dedup: {len(pending)} outputs from {len(groups)} generations "
+              f"({shared} shared)")
+
+    # Queue entries are (groups, attempt): one group is a normal generation,
+    # several are the cells of an icon sheet
+    entries = plan_entries(list(groups.values()))
+    sheets = [entry for entry in entries if len(entry) > 1]
+    if sheets:
+        print(f"  Icon sheets: {sum(map(len, sheets))} icons in {len(sheets)} generations")
+
+    manifest = load_manifest(output_root())
+    trim_index = load_trim_index(output_root())
+    trim_padding = CONFIG.get("trim")
+    writes = []  # [future, rel, manifest entry, is_main] until the file is in place
+    queue = deque((entry, 0) for entry in entries)
+    total = len(queue)
+    rejects = []
+    i = 0
+    batch_start = time.time()
 
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    img.save(out_path)
-    print(f"OK -> {out_path.name}")
-    return out_path
+    def finish(group: list, raw: Image.Image, seed: int, attempt: int, t0: float,
+               full: Image.Image = None, sheet: dict = None) -> list:
+        """Post-process, gate and queue the writes for one raw; returns the jobs that failed."""
+        nonlocal done
+        raw_hash = hashlib.sha256(raw.tobytes()).hexdigest()
+        # One full-resolution source per post kind, so rembg runs once per raw
+        # however many jobs and output sizes share it
+        sources = {group[0]["post"]: full} if full else {}
+        failed = []
+        for job in group:
+            if job["post"] not in sources:
+                sources[job["post"]] = prepare(job, raw)
+            full = sources[job["post"]]
+            img = render(job, full, job["size"])
+            reasons, metrics = check_quality(job, img) if gate else ([], {})
+            if reasons:
+                print(f"    REJECT {job['out_path'].name}: {'; '.join(reasons)}")
+                img.save(build_path("rejects", job["category"]) / f"{job['name']}_s{seed}.png")
+                rejects.append({"category": job["category"], "key": job["key"], "seed": seed,
+                                "attempt": attempt, "reasons": reasons, "metrics": metrics})
+                failed.append(job)
+                continue
+            if trim_padding is not None and CATEGORIES[job["category"]].get("trim"):
+                img, entry = trim(img, trim_padding)
+            else:
+                entry = None
+            if entry:
+                trim_index[job["rel"]] = entry
+            else:
+                trim_index.pop(job["rel"], None)  # A fresh full-canvas output
+            record = provenance(job, seed, raw_hash)
+            if sheet:
+                record["params"]["sheet"] = sheet
+            writes.append([save_async(img, job["out_path"], record),
+                           job["rel"], _manifest_entry(job, seed), True])
+            if CATEGORIES[job["category"]].get("anim"):
+                # Init image for --animate
+                writes.append([save_async(raw, base_raw_path(job)), "raw/" + job["name"], None, False])
+            for variant in job["variants"]:
+                variant_img = render(job, full, variant["size"], variant["crop"])
+                variant_job = dict(job, **variant)
+                writes.append([save_async(variant_img, variant["out_path"],
+                                          provenance(variant_job, seed, raw_hash)),
+                               variant["rel"], _manifest_entry(variant_job, seed), False])
+            done += 1
+            extra = f" + {len(job['variants'])} sizes" if job["variants"] else ""
+            print(f"    OK -> {job['out_path'].name}{extra} ({time.time()-t0:.1f}s)")
+        return failed
 
+    while queue:
+        entry, attempt = queue.popleft()
+        i += 1
+        retry = f", retry {attempt}/{max_retries}" if attempt else ""
+        t0 = time.time()
+        failed = []
+        if len(entry) > 1:
+            seed = _name_seed("sheet:" + ",".join(group[0]["key"] for group in entry))
+            label = CATEGORIES[entry[0][0]["category"]]["label"]
+            print(f"\n  [{i}/{total}] {label} sheet: {len(entry)} icons (seed={seed}{retry})")
+            made = generate_sheet(entry, seed)
+            if made is None:
+                # Don't lose the whole sheet: each icon gets its own generation
+                queue.extend(([group], attempt) for group in entry)
+                total += len(entry)
+                print(f"    FAILED ({time.time()-t0:.1f}s) — requeued {len(entry)} icons one by one")
+                continue
+            cells, grid = made
+            for n, (group, cell) in enumerate(zip(entry, cells)):
+                failed += finish(group, cell, seed, attempt, t0,
+                                 sheet={"grid": grid, "cell": n, "cell_size": cell.width})
+        else:
+            group = entry[0]
+            first = group[0]
+            label = CATEGORIES[first["category"]]["label"]
+            print(f"\n  [{i}/{total}] {label}: {first['key']} (seed={first['seed']}{retry})")
+            for other in group[1:]:
+                print(f"    + shared with {other['category']}/{other['key']}")
+
+            raws = _generate_raw(first, batch_size=candidates)
+            if raws is None:
+                print(f"    FAILED ({time.time()-t0:.1f}s)")
+                continue
+
+            best, prepared = 0, None
+            if len(raws) > 1:
+                best, prepared = pick_candidate(first, raws)
+            failed = finish(group, raws[best], first["seed"] + best, attempt, t0,
+                            full=prepared[best] if prepared else None)
+        recorded, lost = collect_writes(writes, manifest)
+        done -= lost
+        if recorded:
+            save_manifest(output_root(), manifest)
+            save_trim_index(output_root(), trim_index)
+
+        if failed and attempt < max_retries:
+            attempt += 1
+            # Members of one dedup group keep sharing a generation, so they share its new seed
+            seeds = {}
+            retried = [dict(job, seed=seeds.setdefault(_gen_key(job), _retry_seed(job, attempt)))
+                       for job in failed]
+            # Failed sheet cells retry alone, as ordinary full-size generations
+            requeue = [[group] for group in group_jobs(retried).values()]
+            queue.extend((item, attempt) for item in requeue)
+            total += len(requeue)
+            print(f"    Requeued {len(failed)} with a new seed")
+        elif failed:
+            print(f"    GAVE UP after {max_retries} retries — not saved")
 
-def gen_misc_icon(icon_key: str, desc: str, seed: int = -1) -> "Path | None":
-    """Generate a misc overlay icon (48x48, skill-style with bg removal)."""
-    out_path = OUTPUT_DIR / "icons" / f"{icon_key}.png"
-    if out_path.exists() and not CONFIG.get("force"):
-        print(f"  SKIP (exists): {out_path.name}")
-        return out_path
+        elapsed = time.time() - batch_start
+        remaining = elapsed / i * (total - i)
+        print(f"    Batch: {i}/{total} generations, {elapsed:.0f}s elapsed, ~{remaining:.0f}s remaining")
+
+    recorded, lost = collect_writes(writes, manifest, block=True)
+    done -= lost
+    if recorded:
+        save_manifest(output_root(), manifest)
+        save_trim_index(output_root(), trim_index)
+
+    if rejects:
+        report = build_path() / "rejects.json"
+        report.write_text(json.dumps(rejects, indent=2))
+        print(f"\n  {len(rejects)} rejected outputs logged to {report}")
+    return done
 
-    if seed == -1:
-        seed = _name_seed(icon_key)
 
-    print(f"  Generating misc icon: {icon_key} (seed={seed})...", end=" ", flush=True)
-    prompt = f"{STYLE_SKILL}, {desc}"
-    img = generate_image(prompt, seed=seed)
-    if img is None:
-        print("FAILED")
-        return None
+def derived_rels() -> set:
+    """Rel paths of outputs cut from another asset's generation (extra sizes, pose strips)."""
+    rels = set()
+    for job in build_plan(list(CATEGORIES)):
+        rels.update(variant["rel"] for variant in job["variants"])
+        if CATEGORIES[job["category"]].get("anim"):
+            rels.add(job["rel"][:-len(".png")] + "_anim.png")
+    return rels
 
-    img = remove_bg(img)
-    img = downscale_nearest(img, SKILL_ICON_SIZE)
 
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    img.save(out_path)
-    print(f"OK -> {out_path.name}")
-    return out_path
+def _already_done(job: dict) -> bool:
+    """Output exists in this tree (or, for a shard tree, already in assets/)."""
+    return job["out_path"].exists() or (ASSETS_DIR / job["rel"]).exists()
 
 
-def gen_ui_texture(tex_key: str, desc: str, seed: int = -1) -> "Path | None":
-    """Generate a UI texture (64x64 panels, 64x24 buttons). No background removal."""
-    out_path = OUTPUT_DIR / "ui" / f"{tex_key}.png"
-    if out_path.exists() and not CONFIG.get("force"):
-        print(f"SKIP (exists): {out_path.name}")
-        return out_path
+def load_manifest(root: Path) -> dict:
+    path = root / MANIFEST_NAME
+    if path.exists():
+        return json.loads(path.read_text())
+    return {}
 
-    if seed == -1:
-        seed = _name_seed(tex_key)
 
-    is_button = tex_key.startswith("ui_button_")
-    if is_button:
-        width = UI_TEX_BTN_WIDTH
-        height = UI_TEX_BTN_HEIGHT
-    else:
-        width = UI_TEX_PANEL_SIZE
-        height = UI_TEX_PANEL_SIZE
+def _save_json(path: Path, data: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, indent=1, sort_keys=True))
+    tmp.replace(path)
 
-    print(f"{tex_key} (seed={seed})")
-    t0 = time.time()
-    prompt = f"{STYLE_UI_TEXTURE}, {desc}"
-    # Generate at wider aspect for buttons, square for panels
-    if is_button:
-        img = generate_image(prompt, seed=seed, width=1024, height=384)
-    else:
-        img = generate_image(prompt, seed=seed)
-    if img is None:
-        print(f"    FAILED ({time.time()-t0:.1f}s)")
-        return None
 
-    # No rembg — UI textures need opaque backgrounds
-    img = img.resize((width, height), Image.NEAREST)
+def save_manifest(root: Path, manifest: dict):
+    _save_json(root / MANIFEST_NAME, manifest)
 
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    img.save(out_path)
-    print(f"    OK -> {out_path.name} ({time.time()-t0:.1f}s)")
-    return out_path
 
+def _manifest_entry(job: dict, seed: int) -> dict:
+    """Manifest record for an output; sha256 is filled in once the write lands."""
+    return {
+        "category": job["category"],
+        "key": job["key"],
+        "seed": seed,
+        "sha256": None,
+        "shard": CONFIG.get("shard_label"),
+    }
 
-# ── Batch Generation ────────────────────────────────────────────────────────
 
-def generate_heroes():
-    """Generate all hero base sprites."""
-    print("\n=== HERO SPRITES (128x128) ===")
-    total = len(HERO_BASES)
-    done = 0
-    for class_key, desc in HERO_BASES.items():
-        result = gen_hero(class_key, desc)
-        if result:
-            done += 1
-    print(f"\nHeroes: {done}/{total} completed")
+# ── Sharding ────────────────────────────────────────────────────────────────
+#
+# --shard i/N splits the full plan (not just what is missing locally) so
+# every machine computes the same partition without talking to the others.
+# Dedup groups stay whole; groups are dealt heaviest-first to the least
+# loaded shard, with ties broken by a stable hash of the asset key.
+
+def _stable_hash(text: str) -> int:
+    return int(hashlib.sha1(text.encode()).hexdigest()[:12], 16)
+
+
+def job_cost(job: dict) -> float:
+    """Rough relative cost: megapixels sampled, plus background removal."""
+    cost = job["width"] * job["height"] / (1024 * 1024)
+    if job["post"] == "cutout":
+        cost += 0.1
+    return cost
+
+
+def shard_jobs(jobs: list, index: int, count: int) -> list:
+    """Jobs belonging to shard index (1-based) of count."""
+    groups = list(group_jobs(jobs).values())
+    ranked = sorted(groups, key=lambda g: (
+        -job_cost(g[0]), _stable_hash(f"{g[0]['category']}/{g[0]['key']}")))
+    loads = [0.0] * count
+    mine = []
+    for group in ranked:
+        shard = min(range(count), key=lambda s: (loads[s], s))
+        loads[shard] += job_cost(group[0])
+        if shard == index - 1:
+            mine.extend(group)
+    mine_ids = {id(job) for job in mine}
+    print(f"  Shard {index}/{count}: {len(mine)} of {len(jobs)} assets "
+          f"(est. cost {loads[index - 1]:.1f} of {sum(loads):.1f})")
+    return [job for job in jobs if id(job) in mine_ids]
+
+
+def merge_shards(trees: list):
+    """Copy shard output trees into assets/ and merge their manifests."""
+    print(f"\n=== MERGE {len(trees)} SHARD TREE(S) -> {ASSETS_DIR} ===\n")
+    merged = load_manifest(ASSETS_DIR)
+    merged_trim = load_trim_index(ASSETS_DIR)
+    copied = 0
+    for tree in map(Path, trees):
+        manifest = load_manifest(tree)
+        trim_index = load_trim_index(tree)
+        if not manifest:
+            print(f"  WARNING: no {MANIFEST_NAME} in {tree}, skipping")
+            continue
+        for rel, entry in sorted(manifest.items()):
+            src_path = tree / rel
+            if not src_path.exists():
+                print(f"  WARNING: {rel} listed but missing in {tree}")
+                continue
+            digest = hashlib.sha256(src_path.read_bytes()).hexdigest()
+            if digest != entry["sha256"]:
+                print(f"  WARNING: {rel} in {tree} does not match its manifest, skipping")
+                continue
+            dest = ASSETS_DIR / rel
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            tmp = dest.with_name(dest.name + ".tmp")
+            shutil.copyfile(src_path, tmp)
+            tmp.replace(dest)
+            merged[rel] = entry
+            if rel in trim_index:
+                merged_trim[rel] = trim_index[rel]
+            else:
+                merged_trim.pop(rel, None)
+            copied += 1
+        print(f"  {tree}: {len(manifest)} assets")
+    save_manifest(ASSETS_DIR, merged)
+    save_trim_index(ASSETS_DIR, merged_trim)
+    print(f"\nMerged {copied} assets into {ASSETS_DIR}")
+
+
+def run_preflight(jobs: list) -> bool:
+    """Preflight the jobs that will actually generate (unless --no-preflight)."""
+    pending = [job for job in jobs if CONFIG.get("force") or not _already_done(job)
+               or (CONFIG.get("rebuild_stale") and staleness(job) == "stale")]
+    if not pending or not CONFIG.get("preflight"):
+        return True
+    if preflight(pending):
+        return True
+    print("\nPreflight failed — not starting the batch.")
+    return False
+
+
+def generate_categories(categories: list) -> int:
+    """Generate all assets in the given categories as one deduplicated plan."""
+    jobs = build_plan(categories)
+    if CONFIG.get("shard"):
+        jobs = shard_jobs(jobs, *CONFIG["shard"])
+    for category in categories:
+        spec = CATEGORIES[category]
+        count = sum(1 for job in jobs if job["category"] == category)
+        print(f"\n=== {spec['title']} === {count} assets")
+
+    if not run_preflight(jobs):
+        return 0
+    done = run_plan(jobs)
+    print(f"\nCompleted: {done}/{len(jobs)} assets")
     return done
 
 
-def generate_monsters():
-    """Generate all monster sprites."""
-    print("\n=== MONSTER SPRITES (128x128) ===")
-    total = len(MONSTERS)
-    done = 0
-    for monster_key, desc in MONSTERS.items():
-        result = gen_monster(monster_key, desc)
-        if result:
-            done += 1
-    print(f"\nMonsters: {done}/{total} completed")
-    return done
+def generate_prototype():
+    """Generate a small test set to validate quality."""
+    print("\n=== PROTOTYPE: Barbarian + 2 monsters + 1 follower + 1 background ===")
+    print("Validates quality before full batch generation.\n")
+    CONFIG["force"] = True
 
+    run_plan([
+        make_job("heroes", "barbarian"),
+        make_job("monsters", "skeleton"),
+        make_job("monsters", "dragon"),
+        make_job("followers", "frost_wolf"),
+        make_job("backgrounds", "dark_forest"),
+    ])
 
-def generate_followers():
-    """Generate all follower sprites."""
-    print("\n=== FOLLOWER SPRITES (64x64) ===")
-    total = len(FOLLOWERS)
-    done = 0
-    for follower_key, desc in FOLLOWERS.items():
-        result = gen_follower(follower_key, desc)
-        if result:
-            done += 1
-    print(f"\nFollowers: {done}/{total} completed")
-    return done
+    print("\nPrototype complete! Check files in:")
+    print(f"  Heroes:      {OUTPUT_DIR / 'heroes'}")
+    print(f"  Monsters:    {OUTPUT_DIR / 'monsters'}")
+    print(f"  Followers:   {OUTPUT_DIR / 'followers'}")
+    print(f"  Backgrounds: {ASSETS_DIR / 'tilesets' / 'battle_backgrounds'}")
+    print("\nIf quality looks good, run: --category all")
 
 
-def generate_backgrounds():
-    """Generate all battle backgrounds."""
-    print("\n=== BATTLE BACKGROUNDS (640x360) ===")
-    total = len(BATTLE_BACKGROUNDS)
-    done = 0
-    for bg_key, desc in BATTLE_BACKGROUNDS.items():
-        result = gen_background(bg_key, desc)
-        if result:
-            done += 1
-    print(f"\nBackgrounds: {done}/{total} completed")
-    return done
+def generate_single(name: str):
+    """Generate a single sprite by name."""
+    CONFIG["force"] = True
 
+    found = find_category(name)
+    if found:
+        run_plan([make_job(*found)])
+        return
 
-def generate_gear_icons():
-    """Generate all gear item icons."""
-    print("\n=== GEAR ICONS (32x32) ===")
-    total = len(GEAR_ICONS)
-    done = 0
-    for item_key, desc in GEAR_ICONS.items():
-        result = gen_gear_icon(item_key, desc)
-        if result:
-            done += 1
-    print(f"\nGear icons: {done}/{total} completed")
-    return done
+    print(f"Unknown sprite name: {name}")
+    print("Valid names:")
+    for category, spec in CATEGORIES.items():
+        print(f"  {category}: {', '.join(spec['table'].keys())}")
+
+
+# ── Web Asset Pack ──────────────────────────────────────────────────────────
+#
+# --pack bundles generated sprites for the web clients into one blob per
+# category plus a sprites.json index, so a page loads a handful of files
+# instead of hundreds of tiny PNGs. Blobs are named by content hash and can
+# be cached forever; only sprites.json (small) needs revalidating. A chunk
+# whose files are unchanged since the last pack keeps its name, so changing
+# one monster only invalidates the monster chunk.
+#
+# sprites.json:
+#   {"version": 1, "chunks": {"monsters": "sprites-monsters.<hash>.bin", ...},
+#    "assets": {"sprites/generated/monsters/slime.png":
+#               {"chunk": "monsters", "offset": 0, "length": 1234, "size": [128, 128],
+#                "trim": {...sprite_trim.json entry, when trimmed...}}, ...}}
+# Each slice is a complete PNG (text chunks stripped), ready for
+# createImageBitmap(new Blob([bytes.subarray(offset, offset + length)])).
+
+REPO_ROOT = Path(__file__).parent.parent.parent
+PACK_DIR = REPO_ROOT / "pixel-arena-website" / "sprites"
+PACK_INDEX = "sprites.json"
+PACK_VERSION = 1
+PNG_TEXT_CHUNKS = (b"tEXt", b"iTXt", b"zTXt")
+
+
+def strip_png_text(data: bytes) -> bytes:
+    """A PNG without its text chunks (provenance is for the build, not the browser)."""
+    if data[:8] != PNG_SIGNATURE:
+        return data
+    out = [data[:8]]
+    pos = 8
+    while pos + 8 <= len(data):
+        length = int.from_bytes(data[pos:pos + 4], "big")
+        end = pos + 12 + length  # length + type + data + CRC
+        if data[pos + 4:pos + 8] not in PNG_TEXT_CHUNKS:
+            out.append(data[pos:end])
+        pos = end
+    return b"".join(out)
+
+
+def _png_size(data: bytes) -> "list[int]":
+    """Width and height from the IHDR chunk, without decoding."""
+    return [int.from_bytes(data[16:20], "big"), int.from_bytes(data[20:24], "big")]
+
+
+def pack_assets(categories: list, out_dir: Path = PACK_DIR):
+    """Write (or refresh) one content-hashed blob per category plus the sprites.json index."""
+    print(f"\n=== WEB ASSET PACK -> {out_dir} ===\n")
+    state_path = build_path() / "pack_state.json"
+    state = json.loads(state_path.read_text()) if state_path.exists() else {}
+    root = output_root()
+    trim_index = load_trim_index(root)
+    full = categories == list(CATEGORIES)
+    new_state = {} if full else dict(state)  # A partial pack keeps the other chunks
+    rebuilt = reused = 0
+    for category in categories:
+        rels = []
+        for job in build_plan([category]):
+            rels += [job["rel"]] + [variant["rel"] for variant in job["variants"]]
+        files = []
+        for rel in dict.fromkeys(rels):  # Keep order, drop repeats
+            path = root / rel
+            with contextlib.suppress(FileNotFoundError):
+                st = path.stat()
+                files.append((rel, path, [st.st_size, st.st_mtime_ns]))
+        if not files:
+            new_state.pop(category, None)
+            continue
+        stats = {rel: stat for rel, _, stat in files}
+        previous = state.get(category, {})
+        if previous.get("stats") == stats and (out_dir / previous["file"]).exists():
+            # Nothing changed on disk: keep the chunk (and its cached name) as is
+            name, assets = previous["file"], previous["assets"]
+            reused += 1
+        else:
+            blob = bytearray()
+            assets = {}
+            for rel, path, _ in files:
+                data = strip_png_text(path.read_bytes())
+                assets[rel] = {"chunk": category, "offset": len(blob), "length": len(data),
+                               "size": _png_size(data)}
+                blob += data
+            digest = hashlib.sha256(blob).hexdigest()[:12]
+            name = f"sprites-{category}.{digest}.bin"
+            if not (out_dir / name).exists():
+                atomic_write(out_dir / name, bytes(blob))
+            rebuilt += 1
+            print(f"  {category}: {len(files)} assets, {len(blob) / 1024:.0f} KB -> {name}")
+        new_state[category] = {"file": name, "stats": stats, "assets": assets}
+
+    index = {"version": PACK_VERSION, "chunks": {}, "assets": {}}
+    for category, chunk in new_state.items():
+        index["chunks"][category] = chunk["file"]
+        for rel, record in chunk["assets"].items():
+            index["assets"][rel] = dict(record, trim=trim_index[rel]) if rel in trim_index else record
+    atomic_write(out_dir / PACK_INDEX, json.dumps(index, separators=(",", ":")).encode())
+    _save_json(state_path, new_state)
+    # Drop chunks nothing references any more
+    live = set(index["chunks"].values())
+    for old in out_dir.glob("sprites-*.bin"):
+        if old.name not in live:
+            old.unlink()
+    total = sum((out_dir / name).stat().st_size for name in index["chunks"].values())
+    print(f"\n{len(index['assets'])} assets in {len(index['chunks'])} chunks ({total / 1024:.0f} KB); "
+          f"{rebuilt} rebuilt, {reused} unchanged")
+
+
+# ── Game Data Coverage ──────────────────────────────────────────────────────
+#
+# The prompt tables above are written by hand; the game's own entities live in
+# data/*.json. The planner joins the two against what is on disk so a content
+# drop only generates what is new. Entities with no prompt entry get a stand-in
+# prompt built from their data until someone writes a proper one.
+
+DATA_DIR = Path(__file__).parent.parent / "data"
+
+
+def _snake(name: str) -> str:
+    """'Goblin Scout' -> 'goblin_scout' (matches the prompt table keys)."""
+    return "".join(c if c.isalnum() else "_" for c in name.lower()).strip("_")
+
+
+def _hero_entities(data: dict) -> dict:
+    return {key: f"{c['name']}, {c['name_short']}, hero character" for key, c in data.items()}
+
+
+def _monster_entities(data: list) -> dict:
+    return {_snake(m["name"]): f"{m['name'].lower()}, {m['type']} creature" for m in data}
+
+
+def _follower_entities(data: dict) -> dict:
+    return {_snake(f["name"]): f"{f['name'].lower()}, {f['rarity']} companion"
+            for f in data["templates"]}
+
+
+def _item_entities(data: dict) -> dict:
+    return {key: f"{item['name'].lower()}, {item['rarity']} {item.get('visual', {}).get('type', item['slot'])}"
+            for key, item in data.items() if not key.startswith("_")}
+
+
+def _skill_entities(data: dict) -> dict:
+    return {s["id"]: f"{s['name'].lower()} ability, {s['desc'].lower()}"
+            for s in data["skills"] + data["ultimates"]}
+
+
+# category -> (data file, entities(data) -> {table key: stand-in description})
+DATA_SOURCES = {
+    "heroes": ("classes.json", _hero_entities),
+    "monsters": ("monsters.json", _monster_entities),
+    "followers": ("followers.json", _follower_entities),
+    "gear": ("items.json", _item_entities),
+    "skills": ("skills.json", _skill_entities),
+}
 
 
-def generate_npcs():
-    """Generate all NPC sprites (Dio variants)."""
-    print("\n=== NPC SPRITES (128x128) ===")
-    total = len(NPC_SPRITES)
-    done = 0
-    for npc_key, desc in NPC_SPRITES.items():
-        result = gen_npc(npc_key, desc)
-        if result:
-            done += 1
-    print(f"\nNPCs: {done}/{total} completed")
-    return done
+def load_entities(categories: list) -> dict:
+    """category -> {key: stand-in description} for data-backed categories."""
+    entities = {}
+    for category in categories:
+        if category not in DATA_SOURCES:
+            continue
+        filename, extract = DATA_SOURCES[category]
+        with open(DATA_DIR / filename, encoding="utf-8") as f:
+            entities[category] = extract(json.load(f))
+    return entities
 
 
-def generate_skill_icons():
-    """Generate all skill and ultimate ability icons."""
-    print("\n=== SKILL ICONS (48x48) ===")
-    all_skills = {**SKILL_ICON_SPRITES, **ULT_ICON_SPRITES}
-    total = len(all_skills)
-    done = 0
-    batch_start = time.time()
-    for i, (skill_key, desc) in enumerate(all_skills.items()):
-        print(f"\n  [{i+1}/{total}] ", end="")
-        result = gen_skill_icon(skill_key, desc)
-        if result:
-            done += 1
-        elapsed = time.time() - batch_start
-        avg = elapsed / (i + 1)
-        remaining = avg * (total - i - 1)
-        print(f"    Batch: {done}/{total} done, {elapsed:.0f}s elapsed, ~{remaining:.0f}s remaining")
-    print(f"\nSkill icons: {done}/{total} completed")
+def coverage(categories: list) -> dict:
+    """Diff game data, prompt tables and outputs.
+
+    Returns {"unprompted": jobs for entities with no prompt entry,
+             "unbacked": (category, key) prompts with no game entity,
+             "missing": prompted jobs with no output,
+             "orphans": rel paths of outputs no job produces}.
+    """
+    entities = load_entities(categories)
+    report = {"unprompted": [], "unbacked": [], "missing": [], "orphans": []}
+    for category in categories:
+        table = CATEGORIES[category]["table"]
+        known = entities.get(category)
+        for key, desc in (known or {}).items():
+            if key not in table:
+                report["unprompted"].append(make_job(category, key, desc))
+        if known is not None:
+            report["unbacked"] += [(category, key) for key in table if key not in known]
+    report["missing"] = [job for job in build_plan(categories) if not _already_done(job)]
+
+    # Orphans are judged against every category, since several share a directory
+    produced = {job["rel"] for job in build_plan(list(CATEGORIES)) + report["unprompted"]}
+    produced |= derived_rels()
+    dirs = sorted({CATEGORIES[category]["dir"] for category in categories})
+    for rel_dir in dirs:
+        folder = output_root() / rel_dir
+        if folder.is_dir():
+            report["orphans"] += [f"{rel_dir}/{p.name}" for p in sorted(folder.glob("*.png"))
+                                  if f"{rel_dir}/{p.name}" not in produced]
+    return report
+
+
+def show_coverage(categories: list) -> list:
+    """Print the coverage diff and return the minimal job list it implies."""
+    print("\n=== COVERAGE (data/*.json vs prompt tables vs outputs) ===\n")
+    report = coverage(categories)
+
+    print(f"Game entities with no sprite prompt ({len(report['unprompted'])}):")
+    for job in report["unprompted"]:
+        state = "has output" if _already_done(job) else "no output"
+        print(f"  {job['category']}/{job['key']} ({state}): stand-in \"{job['desc']}\"")
+    print(f"\nPrompts with no game entity ({len(report['unbacked'])}):")
+    for category, key in report["unbacked"]:
+        print(f"  {category}/{key}")
+    print(f"\nPrompts with no output ({len(report['missing'])}):")
+    for job in report["missing"]:
+        print(f"  {job['rel']}")
+    print(f"\nSprites with no prompt or entity ({len(report['orphans'])}):")
+    for rel in report["orphans"]:
+        print(f"  {rel}")
+
+    jobs = report["missing"] + [job for job in report["unprompted"] if not _already_done(job)]
+    print(f"\nMinimal plan: {len(jobs)} jobs (run with --missing)")
+    return jobs
+
+
+def generate_missing(categories: list) -> int:
+    """Generate only what the coverage diff says is absent."""
+    jobs = show_coverage(categories)
+    if CONFIG.get("shard"):
+        jobs = shard_jobs(jobs, *CONFIG["shard"])
+    if not jobs or not run_preflight(jobs):
+        return 0
+    done = run_plan(jobs)
+    print(f"\nCompleted: {done}/{len(jobs)} assets")
     return done
 
 
-def generate_logo():
-    """Generate the game logo."""
-    print("\n=== GAME LOGO (480x160) ===")
-    total = len(LOGO_SPRITES)
-    done = 0
-    for logo_key, desc in LOGO_SPRITES.items():
-        result = gen_logo(logo_key, desc)
-        if result:
-            done += 1
-    print(f"\nLogos: {done}/{total} completed")
-    return done
+# ── Animation Sheets ────────────────────────────────────────────────────────
+#
+# --animate turns a character's base sprite into an idle/attack/hit strip
+# plus a Godot SpriteFrames resource. The base raw image is encoded once per
+# character and each pose is one batched img2img request off it. Forge takes
+# a single prompt per request, so poses are separate batches; frames within
+# a pose are the batch's consecutive seeds.
 
+# pose -> (frames, prompt addition, strength factor, fps, loop)
+ANIM_POSES = {
+    "idle": (4, "idle stance, standing ready, subtle breathing motion", 0.6, 6.0, True),
+    "attack": (4, "attacking, lunging forward mid-strike", 1.1, 10.0, False),
+    "hit": (2, "recoiling from a hit, flinching backward, hurt", 0.9, 8.0, False),
+}
+ANIM_SEED_STRIDE = 1000  # Pose i uses seeds base + (i+1)*stride onward
 
-def generate_vfx():
-    """Generate all VFX combat sprites."""
-    print("\n=== VFX SPRITES (48x48 / 32x32) ===")
-    total = len(VFX_SPRITES)
-    done = 0
-    batch_start = time.time()
-    for i, (vfx_key, desc) in enumerate(VFX_SPRITES.items()):
-        print(f"\n  [{i+1}/{total}] ", end="")
-        result = gen_vfx(vfx_key, desc)
-        if result:
-            done += 1
-        elapsed = time.time() - batch_start
-        avg = elapsed / (i + 1)
-        remaining = avg * (total - i - 1)
-        print(f"    Batch: {done}/{total} done, {elapsed:.0f}s elapsed, ~{remaining:.0f}s remaining")
-    print(f"\nVFX sprites: {done}/{total} completed")
-    return done
 
+def base_raw_path(job: dict) -> Path:
+    """Where the raw 1024px generation behind a character sprite is kept."""
+    return build_path("raw", job["category"]) / f"{job['name']}.png"
 
-def generate_event_icons():
-    """Generate all dungeon event icons."""
-    print("\n=== EVENT ICONS (32x32) ===")
-    total = len(EVENT_ICONS)
-    done = 0
-    for event_key, desc in EVENT_ICONS.items():
-        result = gen_slot_icon(event_key, desc)  # same pipeline as slot icons (32x32 gear)
-        if result:
-            done += 1
-    print(f"\nEvent icons: {done}/{total} completed")
-    return done
 
+def _sprite_path(job: dict) -> Path:
+    """The job's existing output, in this tree or (for a shard tree) in assets/."""
+    return job["out_path"] if job["out_path"].exists() else ASSETS_DIR / job["rel"]
 
-def generate_large_event_icons():
-    """Generate large (64x64) event icons for room overlays."""
-    print("\n=== LARGE EVENT ICONS (64x64) ===")
-    total = len(EVENT_ICONS_LG)
-    done = 0
-    for icon_key, desc in EVENT_ICONS_LG.items():
-        result = gen_event_icon_lg(icon_key, desc)
-        if result:
-            done += 1
-    print(f"\nLarge event icons: {done}/{total} completed")
-    return done
 
+def _base_image(job: dict) -> "Image.Image | None":
+    """The base raw image, or the saved sprite scaled back up if no raw was kept."""
+    raw = base_raw_path(job)
+    if raw.exists():
+        return Image.open(raw)
+    if not _already_done(job):
+        return None
+    sprite = load_sprite(job)
+    canvas = Image.new("RGBA", sprite.size, (255, 255, 255, 255))
+    canvas.alpha_composite(sprite)
+    return canvas.resize((job["width"], job["height"]), Image.NEAREST)
 
-def generate_misc_icons():
-    """Generate misc overlay icons (victory, defeat, potion)."""
-    print("\n=== MISC ICONS (48x48) ===")
-    total = len(MISC_ICONS)
-    done = 0
-    for icon_key, desc in MISC_ICONS.items():
-        result = gen_misc_icon(icon_key, desc)
-        if result:
-            done += 1
-    print(f"\nMisc icons: {done}/{total} completed")
-    return done
 
+def _anchor(img: Image.Image) -> "tuple[int, int] | None":
+    """Bottom-center of the opaque area — where a character's feet are."""
+    bbox = img.getchannel("A").getbbox()
+    if not bbox:
+        return None
+    return (bbox[0] + bbox[2]) // 2, bbox[3]
 
-def generate_slot_icons():
-    """Generate all slot placeholder icons."""
-    print("\n=== SLOT ICONS (32x32) ===")
-    total = len(SLOT_ICONS)
-    done = 0
-    for slot_key, desc in SLOT_ICONS.items():
-        result = gen_slot_icon(slot_key, desc)
-        if result:
-            done += 1
-    print(f"\nSlot icons: {done}/{total} completed")
-    return done
 
+def align_frames(frames: list, anchor: "tuple[int, int]") -> list:
+    """Shift every frame so its feet land on the base sprite's, keeping the strip steady."""
+    aligned = []
+    for frame in frames:
+        own = _anchor(frame)
+        if own is None or own == anchor:
+            aligned.append(frame)
+            continue
+        out = Image.new("RGBA", frame.size, (0, 0, 0, 0))
+        out.paste(frame, (anchor[0] - own[0], anchor[1] - own[1]))
+        aligned.append(out)
+    return aligned
 
-def generate_spell_vfx():
-    """Generate all spell VFX projectile sprites."""
-    print("\n=== SPELL VFX SPRITES (32x32) ===")
-    total = len(SPELL_VFX_SPRITES)
-    done = 0
-    batch_start = time.time()
-    for i, (vfx_key, desc) in enumerate(SPELL_VFX_SPRITES.items()):
-        print(f"\n  [{i+1}/{total}] ", end="")
-        result = gen_vfx(vfx_key, desc, size=VFX_SIZE_SMALL)
-        if result:
-            done += 1
-        elapsed = time.time() - batch_start
-        avg = elapsed / (i + 1)
-        remaining = avg * (total - i - 1)
-        print(f"    Batch: {done}/{total} done, {elapsed:.0f}s elapsed, ~{remaining:.0f}s remaining")
-    print(f"\nSpell VFX: {done}/{total} completed")
-    return done
 
+def write_sprite_frames(path: Path, texture_rel: str, size: "tuple[int, int]", poses: list):
+    """Write a Godot 4 SpriteFrames .tres slicing a horizontal strip.
 
-def generate_ui_textures():
-    """Generate all UI panel and button textures."""
-    print("\n=== UI TEXTURES (64x64 / 64x24) ===")
-    total = len(UI_TEXTURES)
+    poses: [(name, frame_count, fps, loop)] in strip order.
+    """
+    w, h = size
+    lines, anims = [], []
+    total = sum(count for _, count, _, _ in poses)
+    lines.append(f'[gd_resource type="SpriteFrames" load_steps={total + 2} format=3]\n')
+    lines.append(f'[ext_resource type="Texture2D" path="res://assets/{texture_rel}" id="1_strip"]\n')
+    index = 0
+    for name, count, fps, loop in poses:
+        frames = []
+        for _ in range(count):
+            lines.append(f'[sub_resource type="AtlasTexture" id="AtlasTexture_{index}"]')
+            lines.append('atlas = ExtResource("1_strip")')
+            lines.append(f"region = Rect2({index * w}, 0, {w}, {h})\n")
+            frames.append(f'{{\n"duration": 1.0,\n"texture": SubResource("AtlasTexture_{index}")\n}}')
+            index += 1
+        anims.append(f'{{\n"frames": [{", ".join(frames)}],\n"loop": {str(loop).lower()},\n'
+                     f'"name": &"{name}",\n"speed": {fps}\n}}')
+    lines.append("[resource]")
+    lines.append(f"animations = [{', '.join(anims)}]")
+    atomic_write(path, ("\n".join(lines) + "\n").encode())
+
+
+def anim_strip_path(job: dict) -> Path:
+    return job["out_path"].with_name(f"{job['name']}_anim.png")
+
+
+def animate_job(job: dict) -> bool:
+    """Generate, gate and pack the pose strip for one character. True when written."""
+    strip_path = anim_strip_path(job)
+    if strip_path.exists() and not CONFIG.get("force"):
+        print(f"  SKIP (exists): {strip_path.name}")
+        return True
+    base = _base_image(job)
+    if base is None:
+        print(f"  SKIP {job['name']}: no base sprite yet (generate it first)")
+        return False
+    anchor = _anchor(load_sprite(job)) or (job["size"][0] // 2, job["size"][1])
+
+    init = encode_init_image(base, job["width"], job["height"])
+    strength = CONFIG.get("strength", 0.5)
+    frames, poses = [], []
+    for i, (pose, (count, addition, factor, fps, loop)) in enumerate(ANIM_POSES.items()):
+        seed = (job["seed"] + (i + 1) * ANIM_SEED_STRIDE) % (2**31)
+        pose_strength = round(min(strength * factor, 0.95), 2)
+        print(f"    {pose}: {count} frames (seed={seed}, strength={pose_strength})")
+        raws = generate_images_img2img(
+            f"{job['prompt']}, {addition}", None, strength=pose_strength,
+            seed=seed, width=job["width"], height=job["height"],
+            batch_size=count, init_image=init,
+        )
+        if raws is None:
+            return False
+        kept = []
+        for n, raw in enumerate(raws):
+            frame = postprocess(job, raw).convert("RGBA")
+            reasons, _ = check_quality(job, frame) if CONFIG.get("quality_gate", True) else ([], {})
+            if reasons:
+                print(f"    REJECT {pose} frame {n}: {'; '.join(reasons)}")
+                continue
+            kept.append(frame)
+        if not kept:
+            print(f"    FAILED: every {pose} frame rejected — sheet not saved")
+            return False
+        frames += align_frames(kept, anchor)
+        poses.append((pose, len(kept), fps, loop))
+
+    w, h = job["size"]
+    strip = Image.new("RGBA", (w * len(frames), h), (0, 0, 0, 0))
+    for n, frame in enumerate(frames):
+        strip.paste(frame, (n * w, 0))
+    atomic_save(strip, strip_path)
+    strip_rel = job["rel"].rsplit("/", 1)[0] + "/" + strip_path.name
+    write_sprite_frames(strip_path.with_suffix(".tres"), strip_rel, job["size"], poses)
+    print(f"    OK -> {strip_path.name} + {strip_path.with_suffix('.tres').name} ({len(frames)} frames)")
+    return True
+
+
+def generate_animations(jobs: list) -> int:
+    """Build pose strips for every character job; returns the number written."""
+    jobs = [job for job in jobs if CATEGORIES[job["category"]].get("anim")]
+    print(f"\n=== ANIMATION SHEETS === {len(jobs)} characters, "
+          f"{sum(p[0] for p in ANIM_POSES.values())} frames each")
+    pending = [job for job in jobs if CONFIG.get("force") or not anim_strip_path(job).exists()]
+    if pending and CONFIG.get("preflight") and not preflight(pending, animate=True):
+        print("\nPreflight failed — not starting the batch.")
+        return 0
     done = 0
-    batch_start = time.time()
-    for i, (tex_key, desc) in enumerate(UI_TEXTURES.items()):
-        print(f"\n  [{i+1}/{total}] ", end="")
-        result = gen_ui_texture(tex_key, desc)
-        if result:
-            done += 1
-        elapsed = time.time() - batch_start
-        avg = elapsed / (i + 1)
-        remaining = avg * (total - i - 1)
-        print(f"    Batch: {done}/{total} done, {elapsed:.0f}s elapsed, ~{remaining:.0f}s remaining")
-    print(f"\nUI textures: {done}/{total} completed")
+    start = time.time()
+    for i, job in enumerate(jobs, 1):
+        print(f"\n  [{i}/{len(jobs)}] {CATEGORIES[job['category']]['label']}: {job['key']}")
+        done += animate_job(job)
+    print(f"\nCompleted: {done}/{len(jobs)} sheets in {time.time() - start:.0f}s")
     return done
 
 
-def generate_prototype():
-    """Generate a small test set to validate quality."""
-    print("\n=== PROTOTYPE: Barbarian + 2 monsters + 1 follower + 1 background ===")
-    print("Validates quality before full batch generation.\n")
-    CONFIG["force"] = True
+# ── Near-Duplicate Detection ────────────────────────────────────────────────
+#
+# 64-bit aHash / dHash / pHash per output, cached in an index keyed by path,
+# size and mtime so only new or changed files are re-hashed. Clusters are
+# found with a BK-tree, so each lookup only visits nodes whose distance can
+# still fall within the threshold instead of comparing every pair.
 
-    gen_hero("barbarian", HERO_BASES["barbarian"])
-    gen_monster("skeleton", MONSTERS["skeleton"])
-    gen_monster("dragon", MONSTERS["dragon"])
-    gen_follower("frost_wolf", FOLLOWERS["frost_wolf"])
-    gen_background("dark_forest", BATTLE_BACKGROUNDS["dark_forest"])
+HASH_INDEX_PATH = BUILD_DIR / "phash_index.json"
+HASH_KINDS = ("ahash", "dhash", "phash")
 
-    print("\nPrototype complete! Check files in:")
-    print(f"  Heroes:      {OUTPUT_DIR / 'heroes'}")
-    print(f"  Monsters:    {OUTPUT_DIR / 'monsters'}")
-    print(f"  Followers:   {OUTPUT_DIR / 'followers'}")
-    print(f"  Backgrounds: {OUTPUT_DIR.parent.parent / 'tilesets' / 'battle_backgrounds'}")
-    print("\nIf quality looks good, run: --category all")
 
+def _dct_matrix(n: int) -> np.ndarray:
+    """Orthonormal DCT-II basis, so a 2D DCT is C @ X @ C.T."""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    c = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    c[0] /= np.sqrt(2.0)
+    return c
 
-def generate_single(name: str):
-    """Generate a single sprite by name."""
-    CONFIG["force"] = True
 
-    if name.endswith("_base") and name[:-5] in HERO_BASES:
-        class_key = name[:-5]
-        gen_hero(class_key, HERO_BASES[class_key])
-        return
-    if name in HERO_BASES:
-        gen_hero(name, HERO_BASES[name])
-        return
-    if name in MONSTERS:
-        gen_monster(name, MONSTERS[name])
-        return
-    if name in FOLLOWERS:
-        gen_follower(name, FOLLOWERS[name])
-        return
-    if name in BATTLE_BACKGROUNDS:
-        gen_background(name, BATTLE_BACKGROUNDS[name])
-        return
-    if name in GEAR_ICONS:
-        gen_gear_icon(name, GEAR_ICONS[name])
-        return
-    if name in NPC_SPRITES:
-        gen_npc(name, NPC_SPRITES[name])
-        return
-    if name in SKILL_ICON_SPRITES:
-        gen_skill_icon(name, SKILL_ICON_SPRITES[name])
-        return
-    if name in ULT_ICON_SPRITES:
-        gen_skill_icon(name, ULT_ICON_SPRITES[name])
-        return
-    if name in LOGO_SPRITES:
-        gen_logo(name, LOGO_SPRITES[name])
-        return
-    if name in VFX_SPRITES:
-        gen_vfx(name, VFX_SPRITES[name])
-        return
-    if name in SPELL_VFX_SPRITES:
-        gen_vfx(name, SPELL_VFX_SPRITES[name], size=VFX_SIZE_SMALL)
-        return
-    if name in UI_TEXTURES:
-        gen_ui_texture(name, UI_TEXTURES[name])
-        return
-    if name in SLOT_ICONS:
-        gen_slot_icon(name, SLOT_ICONS[name])
-        return
-    if name in EVENT_ICONS:
-        gen_slot_icon(name, EVENT_ICONS[name])
-        return
-    if name in EVENT_ICONS_LG:
-        gen_event_icon_lg(name, EVENT_ICONS_LG[name])
-        return
-    if name in MISC_ICONS:
-        gen_misc_icon(name, MISC_ICONS[name])
-        return
+_DCT32 = _dct_matrix(32)
 
-    print(f"Unknown sprite name: {name}")
-    print("Valid names:")
-    print(f"  Heroes: {', '.join(HERO_BASES.keys())}")
-    print(f"  Monsters: {', '.join(MONSTERS.keys())}")
-    print(f"  Followers: {', '.join(FOLLOWERS.keys())}")
-    print(f"  Backgrounds: {', '.join(BATTLE_BACKGROUNDS.keys())}")
-    print(f"  Gear: {', '.join(GEAR_ICONS.keys())}")
-    print(f"  Slot icons: {', '.join(SLOT_ICONS.keys())}")
-    print(f"  Event icons: {', '.join(EVENT_ICONS.keys())}")
-    print(f"  Large event icons: {', '.join(EVENT_ICONS_LG.keys())}")
-    print(f"  Misc icons: {', '.join(MISC_ICONS.keys())}")
-    print(f"  NPCs: {', '.join(NPC_SPRITES.keys())}")
-    print(f"  Skills: {', '.join(SKILL_ICON_SPRITES.keys())}")
-    print(f"  Ultimates: {', '.join(ULT_ICON_SPRITES.keys())}")
-    print(f"  Logo: {', '.join(LOGO_SPRITES.keys())}")
-    print(f"  VFX: {', '.join(VFX_SPRITES.keys())}")
-    print(f"  Spell VFX: {', '.join(SPELL_VFX_SPRITES.keys())}")
-    print(f"  UI Textures: {', '.join(UI_TEXTURES.keys())}")
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.astype(np.uint8).ravel()).tobytes(), "big")
+
+
+def image_hashes(img: Image.Image) -> dict:
+    """aHash, dHash and pHash of a sprite as 16-digit hex strings."""
+    # Flatten transparency onto mid grey so the silhouette drives the hash
+    rgba = img.convert("RGBA")
+    flat = Image.new("RGBA", rgba.size, (128, 128, 128, 255))
+    flat.alpha_composite(rgba)
+    gray = flat.convert("L")
+
+    a = np.asarray(gray.resize((8, 8), Image.BOX), dtype=np.float32)
+    d = np.asarray(gray.resize((9, 8), Image.BOX), dtype=np.float32)
+    p = np.asarray(gray.resize((32, 32), Image.LANCZOS), dtype=np.float32)
+    coeffs = (_DCT32 @ p @ _DCT32.T)[:8, :8]
+    low = coeffs.ravel()[1:]  # Median without the DC term
+
+    return {
+        "ahash": f"{_bits_to_int(a > a.mean()):016x}",
+        "dhash": f"{_bits_to_int(d[:, 1:] > d[:, :-1]):016x}",
+        "phash": f"{_bits_to_int(coeffs > np.median(low)):016x}",
+    }
+
+
+def _hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """Metric tree over Hamming distance for radius queries on 64-bit hashes."""
+
+    def __init__(self):
+        self.root = None  # [hash, item, {distance: child}]
+
+    def add(self, value: int, item):
+        if self.root is None:
+            self.root = [value, item, {}]
+            return
+        node = self.root
+        while True:
+            dist = _hamming(value, node[0])
+            child = node[2].get(dist)
+            if child is None:
+                node[2][dist] = [value, item, {}]
+                return
+            node = child
+
+    def query(self, value: int, radius: int) -> list:
+        """All (distance, item) within radius of value."""
+        found = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            dist = _hamming(value, node[0])
+            if dist <= radius:
+                found.append((dist, node[1]))
+            # Triangle inequality: only subtrees in [dist - r, dist + r] can match
+            for edge, child in node[2].items():
+                if dist - radius <= edge <= dist + radius:
+                    stack.append(child)
+        return found
+
+
+def update_hash_index() -> dict:
+    """Hash every generated PNG, reusing index entries whose size and mtime match."""
+    index = {}
+    if HASH_INDEX_PATH.exists():
+        index = json.loads(HASH_INDEX_PATH.read_text())
+
+    dirs = sorted({ASSETS_DIR / spec["dir"] for spec in CATEGORIES.values()})
+    derived = derived_rels()  # Extra sizes and strips would match their own base
+    fresh = {}
+    hashed = 0
+    for d in dirs:
+        for path in sorted(d.glob("*.png")):
+            rel = path.relative_to(ASSETS_DIR).as_posix()
+            if rel in derived:
+                continue
+            st = path.stat()
+            entry = index.get(rel)
+            if entry and entry["size"] == st.st_size and entry["mtime"] == st.st_mtime:
+                fresh[rel] = entry
+                continue
+            fresh[rel] = {"size": st.st_size, "mtime": st.st_mtime, **image_hashes(Image.open(path))}
+            hashed += 1
+
+    if hashed or len(fresh) != len(index):
+        build_path()
+        HASH_INDEX_PATH.write_text(json.dumps(fresh, indent=1, sort_keys=True))
+    print(f"  Hash index: {len(fresh)} files ({hashed} hashed, {len(fresh) - hashed} cached)")
+    return fresh
+
+
+def find_duplicate_clusters(index: dict, kind: str = "phash", max_distance: int = 6) -> list:
+    """Group files whose hashes are within max_distance bits (transitively)."""
+    tree = BKTree()
+    values = {rel: int(entry[kind], 16) for rel, entry in index.items()}
+    for rel, value in values.items():
+        tree.add(value, rel)
+
+    parent = {rel: rel for rel in values}
+
+    def root(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for rel, value in values.items():
+        for _, other in tree.query(value, max_distance):
+            if other != rel:
+                parent[root(other)] = root(rel)
+
+    clusters = {}
+    for rel in values:
+        clusters.setdefault(root(rel), []).append(rel)
+    return sorted((sorted(c) for c in clusters.values() if len(c) > 1), key=len, reverse=True)
+
+
+def find_duplicates(kind: str = "phash", max_distance: int = 6) -> list:
+    """Print near-duplicate clusters across the library; returns them."""
+    print(f"\n=== NEAR-DUPLICATES ({kind}, distance <= {max_distance}) ===\n")
+    t0 = time.time()
+    index = update_hash_index()
+    clusters = find_duplicate_clusters(index, kind, max_distance)
+    for cluster in clusters:
+        base = int(index[cluster[0]][kind], 16)
+        print(f"  Cluster of {len(cluster)}:")
+        for rel in cluster:
+            print(f"    {rel}  (d={_hamming(base, int(index[rel][kind], 16))})")
+    print(f"\n{len(clusters)} clusters in {time.time() - t0:.2f}s")
+    return clusters
+
+
+def reseed_duplicates(clusters: list) -> int:
+    """Regenerate all but the first member of each cluster with a new seed."""
+    by_path = {job["out_path"]: job for job in build_plan(list(CATEGORIES))}
+    manifest = load_manifest(ASSETS_DIR)
+    jobs = []
+    for cluster in clusters:
+        for rel in cluster[1:]:
+            job = by_path.get(ASSETS_DIR / rel)
+            if job:
+                # Chain off the seed that made the duplicate, so every pass moves on
+                record = manifest.get(rel) or read_provenance(ASSETS_DIR / rel) or {}
+                previous = record.get("seed", job["seed"])
+                jobs.append(dict(job, seed=_name_seed(f"{job['key']}#reseed{previous}")))
+    if not jobs:
+        return 0
+    CONFIG["force"] = True
+    return run_plan(jobs)
 
 
 # ── Model Download ──────────────────────────────────────────────────────────
 
+# size / sha256 pin the exact upstream file. Where they are None, the pin is
+# read from Hugging Face's LFS metadata for the URL (the same size and SHA-256
+# the file page shows) and cached in build/sprites/model_pins.json. A file
+# with no pin at all fails verification — it cannot be told from a corrupt one.
 FLUX_MODELS = {
     "checkpoint": {
         "url": "https://huggingface.co/city96/FLUX.1-dev-gguf/resolve/main/flux1-dev-Q8_0.gguf",
         "dest": "Stable-diffusion/flux1-dev-Q8_0.gguf",
         "size_gb": 12.2,
+        "size": None,
+        "sha256": None,
     },
     "vae": {
         "url": "https://huggingface.co/SicariusSicariiStuff/FLUX.1-dev/resolve/main/ae.safetensors",
         "dest": "VAE/ae.safetensors",
         "size_gb": 0.3,
+        "size": None,
+        "sha256": None,
     },
     "clip_l": {
         "url": "https://huggingface.co/comfyanonymous/flux_text_encoders/resolve/main/clip_l.safetensors",
         "dest": "text_encoder/clip_l.safetensors",
         "size_gb": 0.25,
+        "size": None,
+        "sha256": None,
     },
     "t5xxl": {
         "url": "https://huggingface.co/city96/t5-v1_1-xxl-encoder-gguf/resolve/main/t5-v1_1-xxl-encoder-Q8_0.gguf",
         "dest": "text_encoder/t5-v1_1-xxl-encoder-Q8_0.gguf",
         "size_gb": 4.9,
+        "size": None,
+        "sha256": None,
     },
 }
 
 
+DOWNLOAD_SEGMENT_SIZE = 64 * 1024 * 1024   # Resume granularity and unit of work per connection
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024          # Bytes per write while streaming a segment
+DOWNLOAD_RETRIES = 3                       # Reconnects per segment before the file fails
+
+
+def _probe_download(url: str) -> "tuple[str, int, bool]":
+    """Resolve redirects and return (final url, total bytes, supports ranges)."""
+    r = requests.head(url, allow_redirects=True, timeout=30)
+    r.raise_for_status()
+    total = int(r.headers.get("content-length", 0))
+    ranged = r.headers.get("accept-ranges", "").lower() == "bytes" and total > 0
+    return r.url, total, ranged
+
+
+def _load_download_state(state_path: Path, part_path: Path, total: int) -> list:
+    """Segments [start, end, done] from a previous run, or a fresh layout."""
+    if state_path.exists() and part_path.exists():
+        try:
+            state = json.loads(state_path.read_text())
+            if state["size"] == total and part_path.stat().st_size == total:
+                return state["segments"]
+        except (ValueError, KeyError):
+            pass
+    with open(part_path, "wb") as f:
+        f.truncate(total)  # Sparse preallocation so segments can write at their offsets
+    return [[start, min(start + DOWNLOAD_SEGMENT_SIZE, total), 0]
+            for start in range(0, total, DOWNLOAD_SEGMENT_SIZE)]
+
+
+def _fetch_segment(url: str, part_path: Path, seg: list, lock: threading.Lock,
+                   stop: threading.Event):
+    """Stream one byte range into its offset of the partial file, resuming on error."""
+    start, end = seg[0], seg[1]
+    for attempt in range(DOWNLOAD_RETRIES + 1):
+        pos = start + seg[2]
+        if pos >= end or stop.is_set():
+            return
+        try:
+            headers = {"Range": f"bytes={pos}-{end - 1}"}
+            with requests.get(url, headers=headers, stream=True, timeout=30) as r:
+                r.raise_for_status()
+                if r.status_code != 206:
+                    raise RuntimeError(f"server ignored Range (HTTP {r.status_code})")
+                # Unbuffered, so recorded progress never runs ahead of the file
+                with open(part_path, "r+b", buffering=0) as f:
+                    f.seek(pos)
+                    for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        if stop.is_set():
+                            return
+                        chunk = chunk[:end - pos]
+                        f.write(chunk)
+                        pos += len(chunk)
+                        with lock:
+                            seg[2] = pos - start
+                        if pos >= end:
+                            return
+        except Exception:
+            if attempt == DOWNLOAD_RETRIES:
+                raise
+            stop.wait(2 ** attempt)
+
+
+def _hash_segments(part_path: Path, segments: list, lock: threading.Lock,
+                   stop: threading.Event) -> "str | None":
+    """SHA-256 the file in order, following the contiguous downloaded prefix."""
+    sha = hashlib.sha256()
+    pos = 0
+    with open(part_path, "rb") as f:
+        for seg in segments:
+            while pos < seg[1]:
+                with lock:
+                    available = seg[0] + seg[2]
+                if available > pos:
+                    f.seek(pos)
+                    data = f.read(min(available - pos, DOWNLOAD_CHUNK_SIZE * 8))
+                    sha.update(data)
+                    pos += len(data)
+                elif stop.is_set():
+                    return None
+                else:
+                    stop.wait(0.1)
+    return sha.hexdigest()
+
+
+def download_file(url: str, dest: Path, connections: int = 4,
+                  progress: dict = None, stop: threading.Event = None) -> str:
+    """Download url to dest over parallel HTTP Range requests; returns its SHA-256.
+
+    Data lands in dest + ".partial" with per-segment progress in a
+    ".partial.json" sidecar, so an interrupted download resumes where each
+    segment stopped. The file is hashed while it streams and only renamed
+    to dest once complete. progress (if given) receives done/total byte
+    counts; setting stop saves state and abandons the download.
+    """
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    part_path = dest.with_name(dest.name + ".partial")
+    state_path = dest.with_name(dest.name + ".partial.json")
+
+    final_url, total, ranged = _probe_download(url)
+    if not ranged:
+        connections = 1
+        total = total or 1  # Unknown length: one open-ended segment
+    segments = _load_download_state(state_path, part_path, total) if ranged \
+        else [[0, float("inf"), 0]]
+    if not ranged:
+        part_path.write_bytes(b"")
+
+    lock = threading.Lock()
+    stop = stop or threading.Event()
+    progress = progress if progress is not None else {}
+
+    def save_state():
+        with lock:
+            snapshot = [list(seg) for seg in segments]
+        progress["done"] = sum(seg[2] for seg in snapshot)
+        progress["total"] = total
+        if ranged:
+            state_path.write_text(json.dumps({"url": url, "size": total, "segments": snapshot}))
+
+    def fetch_all():
+        if ranged:
+            with ThreadPoolExecutor(max_workers=connections) as pool:
+                futures = [pool.submit(_fetch_segment, final_url, part_path, seg, lock, stop)
+                           for seg in segments if seg[2] < seg[1] - seg[0]]
+                for future in futures:
+                    future.result()
+        else:
+            with requests.get(final_url, stream=True, timeout=30) as r:
+                r.raise_for_status()
+                with open(part_path, "wb", buffering=0) as f:
+                    for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        if stop.is_set():
+                            return
+                        f.write(chunk)
+                        with lock:
+                            segments[0][2] += len(chunk)
+            with lock:
+                segments[0][1] = segments[0][2]  # Now we know where it ends
+
+    result = {}
+    hasher = threading.Thread(
+        target=lambda: result.update(sha256=_hash_segments(part_path, segments, lock, stop)),
+        daemon=True)
+    hasher.start()
+    try:
+        fetcher = threading.Thread(target=lambda: result.update(error=_capture(fetch_all)),
+                                   daemon=True)
+        fetcher.start()
+        while fetcher.is_alive():
+            fetcher.join(timeout=1.0)
+            save_state()
+        save_state()
+        if result.get("error"):
+            raise result["error"]
+        if stop.is_set() or any(seg[2] < seg[1] - seg[0] for seg in segments):
+            raise RuntimeError("download interrupted")
+        hasher.join()
+    except BaseException:
+        stop.set()
+        save_state()
+        raise
+
+    part_path.replace(dest)
+    if state_path.exists():
+        state_path.unlink()
+    return result["sha256"]
+
+
+def _capture(fn) -> "Exception | None":
+    """Run fn and return its exception instead of raising (for worker threads)."""
+    try:
+        fn()
+    except Exception as e:
+        return e
+    return None
+
+
+MODEL_HASH_CACHE = BUILD_DIR / "model_hashes.json"
+HASH_BLOCK_SIZE = 64 * 1024 * 1024
+
+
+def hash_file(path: Path) -> str:
+    """SHA-256 of a file via large zero-copy slices of a read-only mmap."""
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return sha.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            for offset in range(0, size, HASH_BLOCK_SIZE):
+                sha.update(view[offset:offset + HASH_BLOCK_SIZE])
+    return sha.hexdigest()
+
+
+def _load_hash_cache() -> dict:
+    if MODEL_HASH_CACHE.exists():
+        try:
+            return json.loads(MODEL_HASH_CACHE.read_text())
+        except ValueError:
+            pass
+    return {}
+
+
+def _save_hash_cache(cache: dict):
+    build_path()
+    MODEL_HASH_CACHE.write_text(json.dumps(cache, indent=2, sort_keys=True))
+
+
+def cached_hash(cache: dict, path: Path) -> "str | None":
+    """The cached SHA-256 of path if its size and mtime are unchanged."""
+    entry = cache.get(str(path))
+    st = path.stat()
+    if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+        return entry["sha256"]
+    return None
+
+
+def record_hash(cache: dict, path: Path, digest: str):
+    st = path.stat()
+    cache[str(path)] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+
+
+MODEL_PINS = BUILD_DIR / "model_pins.json"
+
+
+def fetch_pin(url: str) -> "dict | None":
+    """Size and SHA-256 of a Hugging Face LFS file, from its resolve headers."""
+    try:
+        r = requests.head(url, allow_redirects=False, timeout=30)
+    except requests.RequestException:
+        return None
+    sha = r.headers.get("x-linked-etag", "").strip('"').lower()
+    size = r.headers.get("x-linked-size", "")
+    if len(sha) != 64 or not all(c in "0123456789abcdef" for c in sha) or not size.isdigit():
+        return None
+    return {"size": int(size), "sha256": sha}
+
+
+def model_pin(name: str, fetch: bool = True) -> "dict | None":
+    """The pin for a model: FLUX_MODELS if set, else cached or (if fetch) from Hugging Face."""
+    info = FLUX_MODELS[name]
+    if info.get("sha256"):
+        return {"size": info.get("size"), "sha256": info["sha256"]}
+    pins = json.loads(MODEL_PINS.read_text()) if MODEL_PINS.exists() else {}
+    pin = pins.get(info["url"])
+    if pin is None and fetch:
+        pin = fetch_pin(info["url"])
+        if pin:
+            pins[info["url"]] = pin
+            build_path()
+            MODEL_PINS.write_text(json.dumps(pins, indent=2, sort_keys=True))
+    return pin
+
+
+def model_check(pin: "dict | None", path: Path, digest: "str | None") -> str:
+    """Compare a model file against its pinned size / hash; returns a status word."""
+    if not path.exists():
+        return "MISSING"
+    if pin is None:
+        return "UNPINNED"
+    if pin.get("size") and path.stat().st_size != pin["size"]:
+        return "SIZE MISMATCH"
+    if digest is None:
+        return "UNVERIFIED"
+    return "OK" if digest == pin["sha256"] else "CORRUPT"
+
+
+def verify_models(rehash: bool = False) -> bool:
+    """Hash every model file (only those changed since the last run) and check them."""
+    print("\n=== MODEL VERIFICATION ===\n")
+    models_dir = Path(CONFIG.get("models_dir", FORGE_MODELS_DIR))
+    cache = {} if rehash else _load_hash_cache()
+
+    paths = {name: models_dir / info["dest"] for name, info in FLUX_MODELS.items()}
+    stale = {name: path for name, path in paths.items()
+             if path.exists() and cached_hash(cache, path) is None}
+    if stale:
+        print(f"  Hashing {len(stale)} file(s)...", flush=True)
+        t0 = time.time()
+        with ThreadPoolExecutor(max_workers=len(stale)) as pool:
+            digests = dict(zip(stale, pool.map(hash_file, stale.values())))
+        for name, digest in digests.items():
+            record_hash(cache, stale[name], digest)
+        _save_hash_cache(cache)
+        print(f"  Hashed in {time.time() - t0:.1f}s\n")
+
+    ok = True
+    for name in FLUX_MODELS:
+        path = paths[name]
+        digest = cached_hash(cache, path) if path.exists() else None
+        status = model_check(model_pin(name), path, digest)
+        ok = ok and status == "OK"
+        print(f"  [{name}] {status}: {path.name}")
+        if status == "UNPINNED":
+            print(f"      sha256={digest} size={path.stat().st_size}")
+            print("      No pin in FLUX_MODELS and Hugging Face unreachable — cannot verify")
+        elif status in ("CORRUPT", "SIZE MISMATCH"):
+            print("      Delete it and re-run --download-models")
+    return ok
+
+
 def download_models():
-    """Download FLUX.1 Dev model files to Forge model directories."""
+    """Download FLUX.1 Dev model files to Forge model directories.
+
+    All files download concurrently, each over several ranged connections.
+    Interrupted downloads keep their .partial file and resume on the next run.
+    """
     print("\n=== FLUX.1 Dev Model Downloads ===\n")
+    models_dir = Path(CONFIG.get("models_dir", FORGE_MODELS_DIR))
+    connections = CONFIG.get("download_connections", 4)
 
     total_gb = sum(m["size_gb"] for m in FLUX_MODELS.values())
     print(f"Total download size: ~{total_gb:.1f} GB")
-    print(f"Destination: {FORGE_MODELS_DIR}\n")
+    print(f"Destination: {models_dir}")
+    print(f"Connections: {connections} per file\n")
 
+    todo = {}
     for name, info in FLUX_MODELS.items():
-        dest = FORGE_MODELS_DIR / info["dest"]
+        dest = models_dir / info["dest"]
         if dest.exists():
             size_mb = dest.stat().st_size / (1024 * 1024)
             print(f"  [{name}] SKIP (exists, {size_mb:.0f} MB): {dest.name}")
             continue
-
-        print(f"  [{name}] Downloading {info['size_gb']:.1f} GB: {dest.name}")
+        resume = " (resuming)" if dest.with_name(dest.name + ".partial.json").exists() else ""
+        print(f"  [{name}] Downloading {info['size_gb']:.1f} GB{resume}: {dest.name}")
         print(f"    From: {info['url']}")
         print(f"    To:   {dest}")
+        todo[name] = dest
 
-        dest.parent.mkdir(parents=True, exist_ok=True)
+    if not todo:
+        print("\nAll model files present.")
+        return
 
+    progress = {name: {} for name in todo}
+    stop = threading.Event()
+    t0 = time.time()
+    with ThreadPoolExecutor(max_workers=len(todo)) as pool:
+        futures = {name: pool.submit(download_file, FLUX_MODELS[name]["url"], dest,
+                                     connections, progress[name], stop)
+                   for name, dest in todo.items()}
         try:
-            r = requests.get(info["url"], stream=True, timeout=30)
-            r.raise_for_status()
-            total = int(r.headers.get("content-length", 0))
-            downloaded = 0
-            chunk_size = 8 * 1024 * 1024  # 8MB chunks
-
-            with open(dest, "wb") as f:
-                for chunk in r.iter_content(chunk_size=chunk_size):
-                    f.write(chunk)
-                    downloaded += len(chunk)
-                    if total > 0:
-                        pct = downloaded / total * 100
-                        mb = downloaded / (1024 * 1024)
-                        print(f"\r    Progress: {mb:.0f} MB / {total/(1024*1024):.0f} MB ({pct:.1f}%)", end="", flush=True)
-            print(f"\n    Done: {dest.name}")
-
+            while not all(f.done() for f in futures.values()):
+                time.sleep(1.0)
+                done = sum(p.get("done", 0) for p in progress.values())
+                total = sum(p.get("total", 0) for p in progress.values())
+                rate = done / max(time.time() - t0, 1e-6) / (1024 * 1024)
+                parts = " ".join(f"{name} {p['done'] / p['total'] * 100:.0f}%"
+                                 for name, p in progress.items() if p.get("total"))
+                print(f"\r    {done/(1024**3):.2f} / {total/(1024**3):.2f} GB "
+                      f"({rate:.0f} MB/s) | {parts}  ", end="", flush=True)
         except KeyboardInterrupt:
-            print(f"\n    Cancelled! Removing partial file...")
-            if dest.exists():
-                dest.unlink()
-            sys.exit(1)
+            print("\n    Cancelled! Saving progress — re-run to resume.")
+            stop.set()
+            wait(futures.values(), timeout=10)
+            os._exit(1)  # Don't block on a connection stuck in a read
+
+    print()
+    cache = _load_hash_cache()
+    for name, future in futures.items():
+        try:
+            digest = future.result()
         except Exception as e:
-            print(f"\n    FAILED: {e}")
-            if dest.exists():
-                dest.unlink()
+            print(f"  [{name}] FAILED: {e} (partial kept, re-run to resume)")
+            continue
+        dest = todo[name]
+        status = model_check(model_pin(name), dest, digest)
+        if status in ("CORRUPT", "SIZE MISMATCH"):
+            print(f"  [{name}] {status}: {dest.name} sha256={digest} — removed, re-run to retry")
+            dest.unlink()
             continue
+        record_hash(cache, dest, digest)  # Hashed while streaming; no re-read needed
+        print(f"  [{name}] Done ({status}): {dest.name}  sha256={digest}")
+    _save_hash_cache(cache)
 
     print("\nModel downloads complete!")
     print("\nNext steps:")
@@ -1958,89 +3906,306 @@ def show_status():
     """Show what sprites exist and what's missing."""
     print("\n=== SPRITE GENERATION STATUS ===\n")
 
-    def count_files(path: Path, pattern: str = "*.png") -> int:
-        if not path.exists():
-            return 0
-        return len(list(path.glob(pattern)))
+    # Count planned outputs that exist, not files on disk — size variants,
+    # animation strips and other derived files share these directories
+    seen = set()
+    done = total = 0
+    for category, spec in CATEGORIES.items():
+        jobs = [job for job in build_plan([category]) if job["out_path"] not in seen]
+        seen.update(job["out_path"] for job in jobs)
+        count = sum(1 for job in jobs if _already_done(job))
+        print(f"{spec['title']:<34} {count}/{len(jobs)}")
+        done += count
+        total += len(jobs)
+    print(f"\n{'Total:':<34} {done}/{total} assets")
+
+    # Check model files — size checks and cached hashes only, never re-hashes
+    print("\n=== MODEL STATUS ===\n")
+    cache = _load_hash_cache()
+    for name, info in FLUX_MODELS.items():
+        dest = Path(CONFIG.get("models_dir", FORGE_MODELS_DIR)) / info["dest"]
+        if not dest.exists():
+            print(f"  [{name}] MISSING — run --download-models")
+            continue
+        size_mb = dest.stat().st_size / (1024 * 1024)
+        status = model_check(model_pin(name, fetch=False), dest, cached_hash(cache, dest))
+        hint = " — run --verify-models" if status != "OK" else ""
+        print(f"  [{name}] {status} ({size_mb:.0f} MB){hint}")
 
-    hero_count = count_files(OUTPUT_DIR / "heroes")
-    hero_total = len(HERO_BASES)
-    print(f"Heroes (128x128):    {hero_count}/{hero_total}")
+    if done < total:
+        print(f"\nMissing {total - done} assets. Run: --category all")
 
-    monster_count = count_files(OUTPUT_DIR / "monsters")
-    monster_total = len(MONSTERS)
-    print(f"Monsters (128x128):  {monster_count}/{monster_total}")
 
-    follower_count = count_files(OUTPUT_DIR / "followers")
-    follower_total = len(FOLLOWERS)
-    print(f"Followers (64x64):   {follower_count}/{follower_total}")
+# ── Daemon ──────────────────────────────────────────────────────────────────
+#
+# --serve keeps the Forge session, the rembg model and the registry warm and
+# takes jobs over a localhost JSON API, so iterating on one sprite costs one
+# Forge call. Jobs run one at a time on a single worker (one GPU).
+#
+#   POST /jobs              {"name": "goblin_scout"} | {"names": [...]} |
+#                           {"category": "monsters"}; optional "seed",
+#                           "candidates", "force" (default true for names)
+#   GET  /jobs              all jobs, newest last
+#   GET  /jobs/<id>         one job: status, outputs
+#   GET  /jobs/<id>/events  NDJSON stream of log lines and progress until done
+#   GET  /status            Forge URL, queue depth, running job, sampler progress
 
-    gear_count = count_files(OUTPUT_DIR / "gear")
-    gear_total = len(GEAR_ICONS)
-    print(f"Gear icons (32x32):  {gear_count}/{gear_total}")
+DAEMON_PORT = 7870
 
-    slot_count = sum(1 for k in SLOT_ICONS if (OUTPUT_DIR / "gear" / f"{k}.png").exists())
-    slot_total = len(SLOT_ICONS)
-    print(f"Slot icons (32x32):  {slot_count}/{slot_total}")
+_daemon_jobs = {}
+_daemon_ids = itertools.count(1)
+_daemon_lock = threading.Lock()  # Guards _daemon_jobs and ID allocation
+_daemon_queue = queue.Queue()
+_daemon_cond = threading.Condition()
+_job_output = threading.local()  # .log: the _JobLog for the job running on this thread
 
-    event_count = sum(1 for k in EVENT_ICONS if (OUTPUT_DIR / "gear" / f"{k}.png").exists())
-    event_total = len(EVENT_ICONS)
-    print(f"Event icons (32x32): {event_count}/{event_total}")
 
-    event_lg_count = sum(1 for k in EVENT_ICONS_LG if (OUTPUT_DIR / "events" / f"{k}.png").exists())
-    event_lg_total = len(EVENT_ICONS_LG)
-    print(f"Event icons lg (64x64): {event_lg_count}/{event_lg_total}")
+def _jobs_snapshot() -> list:
+    with _daemon_lock:
+        return list(_daemon_jobs.values())
 
-    misc_count = sum(1 for k in MISC_ICONS if (OUTPUT_DIR / "icons" / f"{k}.png").exists())
-    misc_total = len(MISC_ICONS)
-    print(f"Misc icons (48x48): {misc_count}/{misc_total}")
 
-    npc_count = count_files(OUTPUT_DIR / "npcs")
-    npc_total = len(NPC_SPRITES)
-    print(f"NPCs (128x128):      {npc_count}/{npc_total}")
+class _ThreadStdout(io.TextIOBase):
+    """stdout that sends a thread's prints to its job log, if it is running a job.
 
-    skill_count = count_files(OUTPUT_DIR / "skills")
-    skill_total = len(SKILL_ICON_SPRITES) + len(ULT_ICON_SPRITES)
-    print(f"Skills (48x48):      {skill_count}/{skill_total}")
+    Only the worker thread running a job registers a log, so prints from the
+    writer pool, the ticker or handler threads never leak into a job's events.
+    """
 
-    logo_count = count_files(OUTPUT_DIR / "ui")
-    logo_total = len(LOGO_SPRITES)
-    print(f"Logo (480x160):      {logo_count}/{logo_total}")
+    def __init__(self, echo):
+        self.echo = echo
 
-    bg_dir = OUTPUT_DIR.parent.parent / "tilesets" / "battle_backgrounds"
-    bg_count = count_files(bg_dir)
-    bg_total = len(BATTLE_BACKGROUNDS)
-    print(f"Backgrounds (640x360): {bg_count}/{bg_total}")
+    def write(self, s: str) -> int:
+        target = getattr(_job_output, "log", None) or self.echo
+        return target.write(s)
 
-    vfx_count = count_files(OUTPUT_DIR / "vfx")
-    vfx_total = len(VFX_SPRITES)
-    print(f"VFX (48x48/32x32):   {vfx_count}/{vfx_total}")
+    def flush(self):
+        self.echo.flush()
 
-    spell_vfx_count = sum(1 for k in SPELL_VFX_SPRITES if (OUTPUT_DIR / "vfx" / f"{k}.png").exists())
-    spell_vfx_total = len(SPELL_VFX_SPRITES)
-    print(f"Spell VFX (32x32):   {spell_vfx_count}/{spell_vfx_total}")
 
-    # UI textures share the "ui" folder with logos, so count by prefix
-    ui_tex_count = count_files(OUTPUT_DIR / "ui", "ui_*.png")
-    ui_tex_total = len(UI_TEXTURES)
-    print(f"UI textures (64x64/64x24): {ui_tex_count}/{ui_tex_total}")
+class _JobLog(io.TextIOBase):
+    """stdout stand-in that records each printed line as a job event."""
 
-    total = hero_total + monster_total + follower_total + gear_total + slot_total + event_total + event_lg_total + misc_total + npc_total + skill_total + logo_total + bg_total + vfx_total + spell_vfx_total + ui_tex_total
-    done = hero_count + monster_count + follower_count + gear_count + slot_count + event_count + event_lg_count + misc_count + npc_count + skill_count + logo_count + bg_count + vfx_count + spell_vfx_count + ui_tex_count
-    print(f"\nTotal:               {done}/{total} assets")
+    def __init__(self, job: dict, echo):
+        self.job = job
+        self.echo = echo
+        self.buf = ""
 
-    # Check model files
-    print("\n=== MODEL STATUS ===\n")
-    for name, info in FLUX_MODELS.items():
-        dest = FORGE_MODELS_DIR / info["dest"]
-        if dest.exists():
-            size_mb = dest.stat().st_size / (1024 * 1024)
-            print(f"  [{name}] OK ({size_mb:.0f} MB)")
-        else:
-            print(f"  [{name}] MISSING — run --download-models")
+    def write(self, s: str) -> int:
+        self.echo.write(s)
+        self.buf += s
+        *lines, self.buf = self.buf.replace("\r", "\n").split("\n")
+        for line in lines:
+            if line.strip():
+                _job_event(self.job, {"type": "log", "line": line.rstrip()})
+        return len(s)
 
-    if done < total:
-        print(f"\nMissing {total - done} assets. Run: --category all")
+    def flush(self):
+        self.echo.flush()
+
+
+def _job_event(job: dict, event: dict):
+    with _daemon_cond:
+        job["events"].append(event)
+        _daemon_cond.notify_all()
+
+
+def _job_summary(job: dict) -> dict:
+    return {key: job[key] for key in
+            ("id", "request", "status", "created", "started", "finished", "outputs", "error")}
+
+
+def _resolve_request(request: dict) -> "tuple[list, bool]":
+    """Build asset jobs for an API request; returns (jobs, force default).
+
+    Raises ValueError for anything malformed (answered with a 400).
+    """
+    if not isinstance(request, dict):
+        raise ValueError("request body must be a JSON object")
+    seed = request.get("seed", -1)
+    for key in ("seed", "candidates"):
+        if key in request and (not isinstance(request[key], int) or isinstance(request[key], bool)):
+            raise ValueError(f"{key} must be an integer")
+    if request.get("candidates", 1) < 1:
+        raise ValueError("candidates must be at least 1")
+    if "force" in request and not isinstance(request["force"], bool):
+        raise ValueError("force must be true or false")
+    if "category" in request:
+        if request["category"] not in CATEGORIES:
+            raise ValueError(f"unknown category: {request['category']}")
+        return build_plan([request["category"]]), False
+    if "names" in request:
+        names = request["names"]
+        if not isinstance(names, list) or not names or not all(isinstance(n, str) for n in names):
+            raise ValueError("names must be a non-empty list of strings")
+    elif isinstance(request.get("name"), str):
+        names = [request["name"]]
+    else:
+        raise ValueError('expected "name" (string), "names" (list) or "category"')
+    jobs = []
+    for name in names:
+        found = find_category(name)
+        if not found:
+            raise ValueError(f"unknown sprite name: {name}")
+        jobs.append(make_job(*found, seed=seed))
+    return jobs, True
+
+
+def _run_daemon_job(job: dict):
+    request = job["request"]
+    saved = {key: CONFIG.get(key) for key in ("force", "candidates")}
+    try:
+        jobs, force = _resolve_request(request)
+        CONFIG["force"] = request.get("force", force)
+        CONFIG["candidates"] = request.get("candidates", saved["candidates"] or 1)
+        _job_output.log = _JobLog(job, sys.__stdout__)
+        try:
+            if not run_preflight(jobs):
+                raise RuntimeError("preflight failed")
+            run_plan(jobs)
+        finally:
+            _job_output.log = None
+        job["outputs"] = [str(j["out_path"]) for j in jobs if j["out_path"].exists()]
+        job["status"] = "done"
+    except Exception as e:
+        job["status"] = "failed"
+        job["error"] = str(e)
+    finally:
+        CONFIG.update(saved)
+
+
+def _daemon_worker():
+    while True:
+        job = _daemon_queue.get()
+        job["status"] = "running"
+        job["started"] = time.time()
+        _job_event(job, {"type": "status", "status": "running"})
+        _run_daemon_job(job)
+        job["finished"] = time.time()
+        _job_event(job, {"type": "done", **_job_summary(job)})
+
+
+def _progress_ticker():
+    """Forward sampler progress to the running job's event stream."""
+    last = None
+    while True:
+        time.sleep(0.5)
+        running = [job for job in _jobs_snapshot() if job["status"] == "running"]
+        snapshot = dict(PROGRESS)
+        if running and snapshot["active"] and snapshot != last:
+            _job_event(running[0], {"type": "progress", **snapshot})
+            last = snapshot
+
+
+class _DaemonHandler(BaseHTTPRequestHandler):
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send_json(self, obj, code: int = 200):
+        body = json.dumps(obj).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parts = self.path.strip("/").split("/")
+        if parts == ["status"]:
+            jobs = _jobs_snapshot()
+            running = [j["id"] for j in jobs if j["status"] == "running"]
+            return self._send_json({
+                "forge": CONFIG["sd_url"],
+                "queued": _daemon_queue.qsize(),
+                "running": running[0] if running else None,
+                "progress": PROGRESS,
+                "jobs": len(jobs),
+            })
+        if parts == ["jobs"]:
+            return self._send_json([_job_summary(j) for j in _jobs_snapshot()])
+        with _daemon_lock:
+            job = _daemon_jobs.get(parts[1]) if len(parts) >= 2 and parts[0] == "jobs" else None
+        if job:
+            if len(parts) == 2:
+                return self._send_json(_job_summary(job))
+            if parts[2:] == ["events"]:
+                return self._stream_events(job)
+        self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            return self._send_json({"error": "not found"}, 404)
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            _resolve_request(request)  # Validate before queueing
+        except (ValueError, TypeError) as e:
+            return self._send_json({"error": str(e)}, 400)
+
+        with _daemon_lock:
+            job_id = f"{next(_daemon_ids):04d}"
+            job = {"id": job_id, "request": request, "status": "queued", "created": time.time(),
+                   "started": None, "finished": None, "outputs": [], "error": None, "events": []}
+            _daemon_jobs[job_id] = job
+        _daemon_queue.put(job)
+        self._send_json(_job_summary(job), 202)
+
+    def _stream_events(self, job: dict):
+        """Send events as NDJSON lines as they happen; ends when the job does."""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        sent = 0
+        while True:
+            with _daemon_cond:
+                _daemon_cond.wait_for(lambda: len(job["events"]) > sent, timeout=15)
+                pending = job["events"][sent:]
+            try:
+                for event in pending:
+                    self.wfile.write(json.dumps(event).encode() + b"\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            sent += len(pending)
+            if pending and pending[-1]["type"] == "done":
+                return
+
+
+class _DaemonServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # The default listen backlog (5) resets bursts of POSTs
+
+
+def serve(port: int = DAEMON_PORT):
+    """Run the generation daemon on localhost until interrupted."""
+    print("\n=== SPRITE DAEMON ===\n")
+    if not test_connection():
+        print(f"\nCannot start — Forge not reachable at {CONFIG['sd_url']}")
+        sys.exit(1)
+    try:
+        rembg_session()
+    except ImportError:
+        print("  WARNING: rembg not installed, falling back to basic removal")
+    if CONFIG.get("preflight"):
+        # Models only; each job warms the shapes it uses the first time they come up
+        print("\n=== PREFLIGHT ===")
+        try:
+            if not models_ready():
+                sys.exit(1)
+        except requests.RequestException as e:
+            print(f"  Cannot read Forge options: {e}")
+            sys.exit(1)
+
+    sys.stdout = _ThreadStdout(sys.__stdout__)
+    threading.Thread(target=_daemon_worker, daemon=True).start()
+    threading.Thread(target=_progress_ticker, daemon=True).start()
+    server = _DaemonServer(("127.0.0.1", port), _DaemonHandler)
+    print(f"\nListening on http://127.0.0.1:{port}  (POST /jobs, GET /status)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down.")
+        server.server_close()
 
 
 # ── CLI ─────────────────────────────────────────────────────────────────────
@@ -2056,7 +4221,7 @@ def main():
     parser.add_argument("--status", action="store_true",
                         help="Show sprite + model status")
     parser.add_argument("--category",
-                        choices=["heroes", "monsters", "followers", "gear", "slot_icons", "event_icons", "event_icons_lg", "misc_icons", "npcs", "skills", "logo", "backgrounds", "vfx", "spell_vfx", "ui_textures", "all"],
+                        choices=[*CATEGORIES, "all"],
                         help="Generate assets by category")
     parser.add_argument("--single", type=str,
                         help="Generate a single sprite by name")
@@ -2064,6 +4229,12 @@ def main():
                         help="Generate test set (barbarian + skeleton + dragon + wolf + bg)")
     parser.add_argument("--download-models", action="store_true",
                         help="Download FLUX.1 Dev model files (~18GB)")
+    parser.add_argument("--verify-models", action="store_true",
+                        help="Hash model files (cached by size + mtime; --force re-hashes) and check pins")
+    parser.add_argument("--models-dir", type=str, default=None,
+                        help=f"Forge models directory (default: {FORGE_MODELS_DIR})")
+    parser.add_argument("--connections", type=int, default=4,
+                        help="Parallel HTTP connections per model file (default: 4)")
     parser.add_argument("--url", type=str, default=None,
                         help=f"Forge URL (default: {CONFIG['sd_url']})")
     parser.add_argument("--steps", type=int, default=None,
@@ -2073,11 +4244,84 @@ def main():
     parser.add_argument("--reference-dir", type=str, default=None,
                         help="Directory of reference images for img2img (matched by filename)")
     parser.add_argument("--strength", type=float, default=0.5,
-                        help="Denoising strength for img2img (0.0=copy, 1.0=ignore ref, default: 0.5)")
+                        help="Denoising strength for img2img (0.0=copy, 1.0=ignore ref, default: 0.5); --animate scales it per pose")
+    parser.add_argument("--init-format", choices=["png", "png-small", "webp"], default="png",
+                        help="Encoding of img2img init images sent to Forge (webp = lossless, smallest)")
     parser.add_argument("--force", action="store_true",
                         help="Regenerate even if file exists")
+    parser.add_argument("--max-retries", type=int, default=2,
+                        help="Requeue outputs failing the quality gate up to N times with new seeds (default: 2)")
+    parser.add_argument("--no-quality-gate", action="store_true",
+                        help="Save outputs without running the quality gate")
+    parser.add_argument("--check-quality", action="store_true",
+                        help="Run the quality gate over existing outputs and list failures")
+    parser.add_argument("--find-duplicates", action="store_true",
+                        help="Report near-duplicate sprites via perceptual hashes")
+    parser.add_argument("--reseed-duplicates", action="store_true",
+                        help="Regenerate all but one sprite of each near-duplicate cluster with new seeds")
+    parser.add_argument("--hash", choices=HASH_KINDS, default="phash",
+                        help="Hash used for --find-duplicates (default: phash)")
+    parser.add_argument("--max-distance", type=int, default=6,
+                        help="Hamming distance (of 64 bits) counted as a duplicate (default: 6)")
+    parser.add_argument("--shard", type=str, default=None, metavar="I/N",
+                        help="Generate only shard I of N (1-based) of the --category plan")
+    parser.add_argument("--output-root", type=str, default=None,
+                        help="Write outputs (and their manifest) under this tree instead of assets/")
+    parser.add_argument("--merge-shards", type=str, nargs="+", metavar="DIR",
+                        help="Merge shard output trees and manifests into assets/")
+    parser.add_argument("--serve", action="store_true",
+                        help="Run as a daemon with a localhost HTTP/JSON job API")
+    parser.add_argument("--port", type=int, default=DAEMON_PORT,
+                        help=f"Daemon port for --serve (default: {DAEMON_PORT})")
+    parser.add_argument("--coverage", action="store_true",
+                        help="Diff data/*.json, prompt tables and outputs (--category narrows it)")
+    parser.add_argument("--missing", action="store_true",
+                        help="Generate only what --coverage reports absent (--category narrows it)")
+    parser.add_argument("--animate", action="store_true",
+                        help="Build idle/attack/hit strips + SpriteFrames for --category/--single characters")
+    parser.add_argument("--stall-timeout", type=float, default=None,
+                        help="Seconds without a new sampling step before Forge is interrupted "
+                             "(default: 10x the typical step time from telemetry)")
+    parser.add_argument("--deadline-factor", type=float, default=3.0,
+                        help="Interrupt a request after this multiple of its historical duration (default: 3)")
+    parser.add_argument("--stall-retries", type=int, default=1,
+                        help="Resubmit an interrupted request up to N times (default: 1)")
+    parser.add_argument("--no-preflight", action="store_true",
+                        help="Skip the model check/pin and per-shape warm-up before batches")
+    parser.add_argument("--checkpoint", type=str, default=None, metavar="NAME",
+                        help="Require a checkpoint whose name contains NAME (otherwise a mismatch only warns)")
+    parser.add_argument("--vae", type=str, default=None, metavar="NAME",
+                        help="Require this VAE / additional module (otherwise a mismatch only warns)")
+    parser.add_argument("--downscale", choices=list(DOWNSCALERS), default=None,
+                        help="Override every category's downscaler (default: per-category spec)")
+    parser.add_argument("--benchmark-downscale", action="store_true",
+                        help="Time each downscaler over the library and count exact round trips")
+    parser.add_argument("--trim", type=int, nargs="?", const=TRIM_PADDING, default=None, metavar="PAD",
+                        help=f"Crop character sprites to their opaque box + PAD px (default {TRIM_PADDING}) "
+                             f"and record offsets in {TRIM_NAME}")
+    parser.add_argument("--trim-existing", action="store_true",
+                        help="Apply --trim to sprites already on disk (--category narrows it)")
+    parser.add_argument("--provenance", action="store_true",
+                        help="Report current/stale/untracked outputs from their embedded provenance")
+    parser.add_argument("--rebuild-stale", action="store_true",
+                        help="Also regenerate existing outputs whose embedded inputs no longer match the plan")
+    parser.add_argument("--sheet", type=int, default=None, metavar="N",
+                        help="Generate small icons as N x N sheets in one Forge image each "
+                             "(cells are gen_size/N px; failed cells retry alone)")
+    parser.add_argument("--chroma", action="store_true",
+                        help="Characters: prompt for a flat magenta background and chroma-key it "
+                             "instead of rembg (rembg only when the key fails)")
+    parser.add_argument("--pack", action="store_true",
+                        help="Bundle generated sprites into content-hashed blobs + sprites.json for the web "
+                             "(--category narrows it; unchanged categories are reused)")
+    parser.add_argument("--pack-dir", type=str, default=None,
+                        help=f"Where --pack writes (default: {PACK_DIR.relative_to(REPO_ROOT)})")
+    parser.add_argument("--candidates", type=int, default=1,
+                        help="Seeds per asset, generated as one batch; best-scoring is kept (default: 1)")
 
     args = parser.parse_args()
+    if args.candidates < 1:
+        parser.error("--candidates must be at least 1")
 
     if args.url:
         CONFIG["sd_url"] = args.url
@@ -2085,15 +4329,74 @@ def main():
         CONFIG["sd_steps"] = args.steps
     if args.guidance:
         CONFIG["guidance"] = args.guidance
+    # Part of every job's inputs, so set before any plan (or staleness check) is built
+    CONFIG["downscale"] = args.downscale
+    CONFIG["chroma"] = args.chroma
+    if args.reference_dir or args.animate:
+        CONFIG["strength"] = args.strength
+        CONFIG["init_format"] = args.init_format
+    if args.reference_dir:
+        CONFIG["reference_dir"] = args.reference_dir
+        if os.path.isdir(args.reference_dir):
+            print(f"img2img mode: reference_dir={args.reference_dir}, strength={args.strength}")
+        else:
+            print(f"WARNING: --reference-dir {args.reference_dir} is not a directory — using txt2img")
+    # The reports below read this tree too, so a shard can be checked in place
+    if args.output_root:
+        CONFIG["output_root"] = args.output_root
+        print(f"Output root: {args.output_root}")
+
+    if args.models_dir:
+        CONFIG["models_dir"] = args.models_dir
+    CONFIG["download_connections"] = args.connections
 
     if args.download_models:
         download_models()
         return
 
+    if args.verify_models:
+        if not verify_models(rehash=args.force):
+            sys.exit(1)
+        return
+
     if args.status:
         show_status()
         return
 
+    if args.check_quality:
+        validate_library()
+        return
+
+    if args.benchmark_downscale:
+        benchmark_downscale()
+        return
+
+    if args.trim_existing:
+        categories = [args.category] if args.category not in (None, "all") else list(CATEGORIES)
+        trim_existing(categories, TRIM_PADDING if args.trim is None else args.trim)
+        return
+
+    if args.merge_shards:
+        merge_shards(args.merge_shards)
+        return
+
+    if args.pack:
+        categories = [args.category] if args.category not in (None, "all") else list(CATEGORIES)
+        pack_assets(categories, Path(args.pack_dir) if args.pack_dir else PACK_DIR)
+        return
+
+    if args.provenance:
+        show_provenance([args.category] if args.category not in (None, "all") else list(CATEGORIES))
+        return
+
+    if args.coverage:
+        show_coverage([args.category] if args.category not in (None, "all") else list(CATEGORIES))
+        return
+
+    if args.find_duplicates and not args.reseed_duplicates:
+        find_duplicates(args.hash, args.max_distance)
+        return
+
     if args.test:
         if test_connection():
             print("\nConnection OK! Ready to generate sprites.")
@@ -2102,56 +4405,66 @@ def main():
             sys.exit(1)
         return
 
-    if args.category or args.single or args.prototype:
+    if args.category or args.single or args.prototype or args.reseed_duplicates or args.missing or args.animate:
         if not test_connection():
             print("\nCannot generate — Forge not reachable.")
             print(f"Expected at: {CONFIG['sd_url']}")
             sys.exit(1)
 
-    if args.reference_dir:
-        CONFIG["reference_dir"] = args.reference_dir
-        CONFIG["strength"] = args.strength
-        print(f"img2img mode: reference_dir={args.reference_dir}, strength={args.strength}")
     if args.force:
         print("--force: Will overwrite existing sprites\n")
         CONFIG["force"] = True
-
-    if args.prototype:
+    if args.shard:
+        try:
+            index, count = (int(part) for part in args.shard.split("/"))
+            assert 1 <= index <= count
+        except (ValueError, AssertionError):
+            parser.error("--shard must look like I/N with 1 <= I <= N, e.g. 2/4")
+        CONFIG["shard"] = (index, count)
+        CONFIG["shard_label"] = args.shard
+    CONFIG["max_retries"] = args.max_retries
+    CONFIG["stall_timeout"] = args.stall_timeout
+    CONFIG["deadline_factor"] = args.deadline_factor
+    CONFIG["stall_retries"] = args.stall_retries
+    CONFIG["preflight"] = not args.no_preflight
+    CONFIG["require_checkpoint"] = args.checkpoint
+    CONFIG["require_vae"] = args.vae
+    CONFIG["trim"] = args.trim
+    CONFIG["rebuild_stale"] = args.rebuild_stale
+    if args.sheet:
+        if args.sheet < 2 or CONFIG["gen_size"] // args.sheet < 128:
+            parser.error(f"--sheet must be 2..{CONFIG['gen_size'] // 128} (cells of at least 128px)")
+        CONFIG["sheet"] = args.sheet
+    if args.no_quality_gate:
+        CONFIG["quality_gate"] = False
+    if args.candidates > 1:
+        CONFIG["candidates"] = args.candidates
+        print(f"Candidates: best of {args.candidates} seeds per asset (others kept in {BUILD_DIR / 'candidates'})")
+
+    if args.serve:
+        serve(args.port)
+    elif args.reseed_duplicates:
+        reseed_duplicates(find_duplicates(args.hash, args.max_distance))
+    elif args.prototype:
         generate_prototype()
+    elif args.animate:
+        if args.single:
+            found = find_category(args.single)
+            jobs = [make_job(*found)] if found else []
+        else:
+            categories = [c for c in CATEGORIES if CATEGORIES[c].get("anim")]
+            jobs = build_plan(categories if args.category in (None, "all") else [args.category])
+        generate_animations(jobs)
+    elif args.missing:
+        generate_missing([args.category] if args.category not in (None, "all") else list(CATEGORIES))
     elif args.single:
         generate_single(args.single)
     elif args.category:
         start = time.time()
-        if args.category in ("heroes", "all"):
-            generate_heroes()
-        if args.category in ("monsters", "all"):
-            generate_monsters()
-        if args.category in ("followers", "all"):
-            generate_followers()
-        if args.category in ("gear", "all"):
-            generate_gear_icons()
-        if args.category in ("slot_icons", "all"):
-            generate_slot_icons()
-        if args.category in ("event_icons", "all"):
-            generate_event_icons()
-        if args.category in ("event_icons_lg", "all"):
-            generate_large_event_icons()
-        if args.category in ("misc_icons", "all"):
-            generate_misc_icons()
-        if args.category in ("npcs", "all"):
-            generate_npcs()
-        if args.category in ("skills", "all"):
-            generate_skill_icons()
-        if args.category in ("logo", "all"):
-            generate_logo()
-        if args.category in ("backgrounds", "all"):
-            generate_backgrounds()
-        if args.category in ("vfx", "all"):
-            generate_vfx()
-        if args.category in ("spell_vfx", "all"):
-            generate_spell_vfx()
-        if args.category in ("ui_textures", "all"):
-            generate_ui_textures()
+        if args.category == "all":
+            generate_categories(list(CATEGORIES))
+        else:
+            generate_categories([args.category])
         elapsed = time.time() - start
         print(f"\nTotal time: {elapsed:.1f}s")
         show_status()
@@ -0,0 +1,18 @@
+"""SpriteFrames output for --animate."""
+
+import generate_sprites as gs
+
+
+def test_sprite_frames_written_atomically(tmp_path, monkeypatch):
+    calls = []
+    real = gs.atomic_write
+    monkeypatch.setattr(gs, "atomic_write", lambda path, data: calls.append(path) or real(path, data))
+    path = tmp_path / "slime_anim.tres"
+    gs.write_sprite_frames(path, "sprites/generated/monsters/slime_anim.png", (128, 128),
+                           [("idle", 2, 6.0, True), ("hit", 1, 8.0, False)])
+    assert calls == [path]
+    text = path.read_text()
+    assert text.startswith('[gd_resource type="SpriteFrames" load_steps=5 format=3]')
+    assert "region = Rect2(256, 0, 128, 128)" in text
+    assert '"name": &"hit"' in text and '"loop": false' in text
+    assert [p.name for p in tmp_path.iterdir()] == ["slime_anim.tres"]  # No temp file left
@@ -0,0 +1,41 @@
+"""Chroma key: magenta backgrounds key out; anything doubtful falls back to rembg."""
+
+import numpy as np
+from PIL import Image
+
+import generate_sprites as gs
+
+
+def _scene(background=(250, 10, 245), size=128):
+    px = np.empty((size, size, 3), dtype=np.uint8)
+    px[:] = background
+    px[32:96, 40:88] = (40, 160, 60)   # Subject
+    px[32:96, 40] = (170, 90, 150)     # Magenta-tinted rim (spill)
+    px[5, 5] = (30, 30, 30)            # Lone speck in the background
+    return Image.fromarray(px, "RGB")
+
+
+def test_keys_out_background_and_specks():
+    out = np.asarray(gs.chroma_key(_scene()))
+    alpha = out[..., 3] == 255
+    assert alpha[32:96, 40:88].all()
+    assert alpha.sum() == 64 * 48  # Subject only; the speck is opened away
+    assert tuple(out[50, 40, :3]) == (110, 90, 90)  # Spill pulled down to green
+    assert tuple(out[50, 60, :3]) == (40, 160, 60)  # Interior untouched
+
+
+def test_rejects_when_the_model_ignored_the_key():
+    assert gs.chroma_key(_scene(background=(20, 20, 20))) is None
+
+
+def test_rejects_implausible_coverage():
+    empty = Image.new("RGB", (128, 128), (250, 10, 245))
+    assert gs.chroma_key(empty) is None
+
+
+def test_chroma_jobs_prompt_for_the_key(monkeypatch):
+    monkeypatch.setitem(gs.CONFIG, "chroma", True)
+    job = gs.build_plan(["monsters"])[0]
+    assert job["matte"] == "chroma" and gs.CHROMA_PROMPT in job["prompt"]
+    assert "transparent background" not in job["prompt"]
+    assert gs.build_plan(["gear"])[0]["matte"] == "rembg"  # Category not opted in
@@ -0,0 +1,74 @@
+"""CLI reports read the tree and inputs the flags point at."""
+
+import sys
+
+import pytest
+from PIL import Image
+
+import generate_sprites as gs
+
+
+@pytest.fixture
+def run_main(monkeypatch):
+    monkeypatch.setattr(gs, "CONFIG", dict(gs.CONFIG))
+    monkeypatch.setattr(gs, "_reference_index", {})
+
+    def run(*argv):
+        monkeypatch.setattr(sys, "argv", ["generate_sprites.py", *argv])
+        gs.main()
+    return run
+
+
+def _write_current(job):
+    job["out_path"].parent.mkdir(parents=True, exist_ok=True)
+    gs.atomic_save(Image.new("RGBA", (8, 8)), job["out_path"], gs.provenance(job, job["seed"], "raw"))
+
+
+def test_provenance_reads_output_root(tmp_path, run_main, capsys):
+    gs.CONFIG["output_root"] = str(tmp_path)
+    jobs = gs.build_plan(["gear"])
+    for job in jobs:
+        _write_current(job)
+    gs.CONFIG["output_root"] = None
+
+    run_main("--category", "gear", "--output-root", str(tmp_path), "--provenance")
+    assert f"{len(jobs)} current, 0 stale" in capsys.readouterr().out
+
+
+def test_provenance_replans_img2img_with_references(tmp_path, run_main, capsys):
+    refs = tmp_path / "refs"
+    refs.mkdir()
+    gs.CONFIG["output_root"] = str(tmp_path / "out")
+    gs.CONFIG.update(reference_dir=str(refs), strength=0.5)
+    job = gs.build_plan(["heroes"])[0]
+    Image.new("RGBA", (8, 8)).save(refs / f"{job['name']}.png")
+    job = gs.make_job(job["category"], job["key"])
+    assert job["ref"] is not None
+    _write_current(job)
+    gs.CONFIG.update(output_root=None, reference_dir=None)
+
+    run_main("--category", "heroes", "--output-root", str(tmp_path / "out"),
+             "--reference-dir", str(refs), "--provenance")
+    assert "1 current, 0 stale" in capsys.readouterr().out
+
+
+def test_coverage_and_quality_read_output_root(tmp_path, run_main, capsys):
+    gs.CONFIG["output_root"] = str(tmp_path)
+    job = gs.build_plan(["gear"])[0]
+    gs.CONFIG["output_root"] = None
+    job["out_path"].parent.mkdir(parents=True)
+    Image.new("RGBA", (32, 32)).save(job["out_path"])
+    Image.new("RGBA", (32, 32)).save(job["out_path"].parent / "stray.png")
+
+    run_main("--category", "gear", "--output-root", str(tmp_path), "--coverage")
+    out = capsys.readouterr().out
+    assert "Sprites with no prompt or entity (1):" in out
+    assert "sprites/generated/gear/stray.png" in out
+
+    run_main("--output-root", str(tmp_path), "--check-quality")
+    assert "/1 existing sprites fail the quality gate" in capsys.readouterr().out
+
+
+def test_candidates_below_one_is_rejected(run_main):
+    with pytest.raises(SystemExit):
+        run_main("--candidates", "0", "--status")
@@ -0,0 +1,83 @@
+"""--serve request validation, job bookkeeping and per-thread job logs."""
+
+import http.client
+import json
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import generate_sprites as gs
+
+
+@pytest.mark.parametrize("body, message", [
+    (["slime"], "JSON object"),
+    ({"names": "slime"}, "list of strings"),
+    ({"names": [1, 2]}, "list of strings"),
+    ({"names": []}, "list of strings"),
+    ({"name": 5}, "expected"),
+    ({}, "expected"),
+    ({"name": "slime", "seed": "7"}, "seed must be an integer"),
+    ({"name": "slime", "candidates": 0}, "at least 1"),
+    ({"name": "slime", "candidates": -3}, "at least 1"),
+    ({"name": "slime", "force": "yes"}, "force must be"),
+    ({"name": "slime", "force": 1}, "force must be"),
+    ({"name": "no_such_sprite"}, "unknown sprite name"),
+    ({"category": "nope"}, "unknown category"),
+])
+def test_bad_requests_are_rejected(body, message):
+    with pytest.raises(ValueError, match=message):
+        gs._resolve_request(body)
+
+
+def test_good_requests_resolve():
+    jobs, force = gs._resolve_request({"names": ["slime"], "seed": 3})
+    assert [job["key"] for job in jobs] == ["slime"] and jobs[0]["seed"] == 3 and force
+    jobs, force = gs._resolve_request({"category": "followers"})
+    assert len(jobs) == len(gs.FOLLOWERS) and not force
+
+
+@pytest.fixture
+def daemon(monkeypatch):
+    monkeypatch.setattr(gs, "_daemon_jobs", {})
+    monkeypatch.setattr(gs, "_daemon_queue", gs.queue.Queue())
+    server = gs._DaemonServer(("127.0.0.1", 0), gs._DaemonHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def _post(port, payload: bytes):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    conn.request("POST", "/jobs", payload, {"Content-Type": "application/json"})
+    response = conn.getresponse()
+    return response.status, json.loads(response.read())
+
+
+def test_non_object_body_gets_400(daemon):
+    status, body = _post(daemon, b'["x"]')
+    assert status == 400 and "JSON object" in body["error"]
+
+
+def test_concurrent_posts_get_unique_ids(daemon):
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda _: _post(daemon, b'{"name": "slime"}'), range(64)))
+    ids = [body["id"] for status, body in results if status == 202]
+    assert len(ids) == 64 and len(set(ids)) == 64
+    assert len(gs._daemon_jobs) == 64
+
+
+def test_job_log_only_captures_its_own_thread(monkeypatch, capsys):
+    job = {"events": []}
+    monkeypatch.setattr(sys, "stdout", gs._ThreadStdout(sys.__stdout__))
+    gs._job_output.log = gs._JobLog(job, sys.__stdout__)
+    try:
+        other = threading.Thread(target=print, args=("from another thread",))
+        other.start()
+        other.join()
+        print("from the job")
+    finally:
+        gs._job_output.log = None
+    assert [e["line"] for e in job["events"]] == ["from the job"]
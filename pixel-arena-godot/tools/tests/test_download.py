@@ -0,0 +1,99 @@
+"""Ranged, resumable model download against a local HTTP server."""
+
+import hashlib
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import generate_sprites as gs
+
+PAYLOAD = os.urandom(300 * 1024)
+
+
+class _RangeHandler(BaseHTTPRequestHandler):
+    """Serves PAYLOAD with Range support; drops the connection once if told to."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(PAYLOAD)))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+
+    def do_GET(self):
+        server = self.server
+        match = re.fullmatch(r"bytes=(\d+)-(\d+)", self.headers.get("Range", ""))
+        start, end = (int(match[1]), int(match[2]) + 1) if match else (0, len(PAYLOAD))
+        with server.lock:
+            server.ranges.append((start, end))
+            cut = server.cut_after
+            server.cut_after = None
+        self.send_response(206 if match else 200)
+        self.send_header("Content-Length", str(end - start))
+        if match:
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{len(PAYLOAD)}")
+        self.end_headers()
+        if cut is not None:
+            self.wfile.write(PAYLOAD[start:start + cut])
+            self.wfile.flush()
+            self.close_connection = True
+            self.connection.shutdown(2)  # Mid-body disconnect
+            return
+        self.wfile.write(PAYLOAD[start:end])
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _RangeHandler)
+    httpd.daemon_threads = True
+    httpd.lock = threading.Lock()
+    httpd.ranges = []
+    httpd.cut_after = None
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def small_segments(monkeypatch):
+    monkeypatch.setattr(gs, "DOWNLOAD_SEGMENT_SIZE", 64 * 1024)
+    monkeypatch.setattr(gs, "DOWNLOAD_CHUNK_SIZE", 4 * 1024)
+    monkeypatch.setattr(gs, "DOWNLOAD_RETRIES", 0)
+
+
+def _url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}/model.bin"
+
+
+def test_download_matches_sha256(server, tmp_path):
+    dest = tmp_path / "model.bin"
+    digest = gs.download_file(_url(server), dest, connections=3)
+    assert dest.read_bytes() == PAYLOAD
+    assert digest == hashlib.sha256(PAYLOAD).hexdigest()
+    assert not dest.with_name("model.bin.partial").exists()
+    assert not dest.with_name("model.bin.partial.json").exists()
+    assert len(server.ranges) == 5  # ceil(300 KB / 64 KB) segments
+
+
+def test_interrupted_download_resumes(server, tmp_path):
+    dest = tmp_path / "model.bin"
+    server.cut_after = 20 * 1024
+    with pytest.raises(Exception):
+        gs.download_file(_url(server), dest, connections=1)
+    assert not dest.exists()
+    assert dest.with_name("model.bin.partial.json").exists()
+
+    first_attempt = len(server.ranges)
+    digest = gs.download_file(_url(server), dest, connections=2)
+    assert digest == hashlib.sha256(PAYLOAD).hexdigest()
+    assert dest.read_bytes() == PAYLOAD
+    resumed = server.ranges[first_attempt:]
+    # The cut segment restarts past what was already on disk, not at byte 0
+    assert min(start for start, _ in resumed) > 0
+    assert sum(end - start for start, end in resumed) < len(PAYLOAD)
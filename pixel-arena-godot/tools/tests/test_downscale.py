@@ -0,0 +1,38 @@
+"""Downscalers: round trips through a NEAREST blow-up."""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import generate_sprites as gs
+
+
+def _sprite(alpha, size=8):
+    rng = np.random.default_rng(0)
+    px = rng.integers(0, 256, (size, size, 4), dtype=np.uint8)
+    px[..., 3] = alpha
+    px[:2, :2, 3] = 0
+    return Image.fromarray(px, "RGBA")
+
+
+@pytest.mark.parametrize("alpha", [255, 200, 60])
+@pytest.mark.parametrize("size", [8, 128])  # 128 blocks of 64 px take _row_mode's sort path
+def test_grid_aligned_source_round_trips_exactly(alpha, size):
+    img = _sprite(alpha, size)
+    big = img.resize((size * 8, size * 8), Image.NEAREST)
+    for scaler in gs.DOWNSCALERS.values():
+        assert np.array_equal(np.asarray(scaler(big, img.size)), np.asarray(img))
+
+
+def test_row_mode_paths_agree():
+    codes = np.random.default_rng(1).integers(-1, 64, (300, 50))
+    codes[0] = -1
+    sorted_path = gs._row_mode(codes, 1 << 16)  # Too many bins for one histogram
+    assert sorted_path[0] == -1
+    assert np.array_equal(sorted_path, gs._row_mode(codes, 64))
+
+
+def test_hp_frame_stays_on_nearest():
+    jobs = {job["key"]: job for job in gs.build_plan(["vfx"])}
+    assert jobs["vfx_hp_frame"]["downscale"] == "nearest"
+    assert {job["downscale"] for key, job in jobs.items() if key != "vfx_hp_frame"} == {"majority"}
@@ -0,0 +1,58 @@
+"""Near-duplicate search: BK-tree radius queries, clustering and reseeding."""
+
+import random
+
+import numpy as np
+from PIL import Image
+
+import generate_sprites as gs
+
+
+def test_bktree_query_matches_brute_force():
+    rng = random.Random(0)
+    base = [rng.getrandbits(64) for _ in range(20)]
+    # Near copies of each base hash, a few bits flipped
+    values = base + [b ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64)) for b in base for _ in range(5)]
+    tree = gs.BKTree()
+    for n, value in enumerate(values):
+        tree.add(value, n)
+    for probe in values[:30] + [rng.getrandbits(64) for _ in range(10)]:
+        for radius in (0, 3, 10):
+            expected = {(gs._hamming(probe, v), n) for n, v in enumerate(values)
+                        if gs._hamming(probe, v) <= radius}
+            assert set(tree.query(probe, radius)) == expected
+
+
+def test_clusters_are_transitive():
+    index = {"a.png": {"phash": "0000000000000000"},
+             "b.png": {"phash": "000000000000000f"},  # 4 bits from a
+             "c.png": {"phash": "00000000000000ff"},  # 4 from b, 8 from a
+             "d.png": {"phash": "ffffffffffffffff"}}
+    assert gs.find_duplicate_clusters(index, "phash", 4) == [["a.png", "b.png", "c.png"]]
+    assert gs.find_duplicate_clusters(index, "phash", 3) == []
+
+
+def test_hashes_see_through_small_changes():
+    rng = np.random.default_rng(0)
+    px = np.zeros((64, 64, 4), dtype=np.uint8)
+    px[12:52, 16:48] = np.concatenate([rng.integers(0, 256, (40, 32, 3)), np.full((40, 32, 1), 255)], axis=2)
+    img = Image.fromarray(px, "RGBA")
+    tweaked = px.copy()
+    tweaked[30, 30, :3] ^= 0xFF
+    a, b = gs.image_hashes(img), gs.image_hashes(Image.fromarray(tweaked, "RGBA"))
+    other = gs.image_hashes(Image.fromarray(np.roll(px, 20, axis=0)[::-1], "RGBA"))
+    assert gs._hamming(int(a["phash"], 16), int(b["phash"], 16)) <= 6
+    assert gs._hamming(int(a["phash"], 16), int(other["phash"], 16)) > 6
+
+
+def test_reseed_moves_on_from_the_seed_that_made_the_duplicate(tmp_path, monkeypatch):
+    monkeypatch.setattr(gs, "ASSETS_DIR", tmp_path)
+    monkeypatch.setattr(gs, "CONFIG", dict(gs.CONFIG))
+    job = gs.build_plan(["monsters"])[1]
+    planned = []
+    monkeypatch.setattr(gs, "run_plan", lambda jobs: planned.extend(jobs) or len(jobs))
+    for previous in (job["seed"], 1234):
+        gs.save_manifest(tmp_path, {job["rel"]: {"seed": previous}})
+        gs.reseed_duplicates([["keep.png", job["rel"]]])
+    first, second = (j["seed"] for j in planned)
+    assert len({job["seed"], first, second}) == 3
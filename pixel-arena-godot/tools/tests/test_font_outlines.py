@@ -0,0 +1,52 @@
+"""Glyph outlines: merged rectangles and traced unions cover exactly the bitmap."""
+
+import pytest
+
+import generate_font as gf
+
+
+def _cells(bitmap):
+    return {(col, row) for row, line in enumerate(bitmap) for col, ch in enumerate(line) if ch == '#'}
+
+
+def _winding(contours, x, y):
+    """Nonzero winding number of (x, y) over grid-unit contours."""
+    total = 0
+    for contour in contours:
+        for (x0, y0), (x1, y1) in zip(contour, contour[1:] + contour[:1]):
+            if x0 == x1 and min(y0, y1) < y < max(y0, y1) and x0 > x:
+                total += 1 if y1 > y0 else -1
+    return total
+
+
+@pytest.mark.parametrize("char", sorted(gf.G))
+def test_merged_rects_tile_the_bitmap(char):
+    bitmap, _ = gf.G[char]
+    covered = []
+    for col, row, w, h in gf.merge_rects(bitmap):
+        covered += [(c, r) for c in range(col, col + w) for r in range(row, row + h)]
+    assert len(covered) == len(set(covered))  # No overlaps
+    assert set(covered) == _cells(bitmap)
+
+
+@pytest.mark.parametrize("char", sorted(gf.G))
+def test_traced_union_fills_exactly_the_bitmap(char):
+    bitmap, _ = gf.G[char]
+    contours = gf.trace_outlines(bitmap)
+    n = len(bitmap)
+    width = max((len(line) for line in bitmap), default=0)
+    inside = {(col, row) for row in range(n) for col in range(width)
+              if _winding(contours, col + 0.5, n - row - 0.5) != 0}
+    assert inside == _cells(bitmap)
+
+
+def test_hole_gets_its_own_contour():
+    ring = ['###', '#.#', '###']
+    contours = gf.trace_outlines(ring)
+    assert len(contours) == 2 and all(len(c) == 4 for c in contours)
+    assert gf.merge_rects(ring) == [(0, 0, 3, 1), (0, 1, 1, 1), (2, 1, 1, 1), (0, 2, 3, 1)]
+
+
+def test_merging_shrinks_the_outlines():
+    runs, rects, union = (gf.outline_stats(mode) for mode in ("runs", "rects", "union"))
+    assert rects[1] < runs[1] and union[1] < runs[1]
@@ -0,0 +1,140 @@
+"""Model pins: Hugging Face LFS headers and the verification verdict."""
+
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import generate_sprites as gs
+
+SHA = hashlib.sha256(b"weights").hexdigest()
+
+
+class _LfsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.send_response(302)
+        self.send_header("Location", "https://cdn.example/blob")
+        if self.path == "/lfs":
+            self.send_header("X-Linked-Etag", f'"{SHA}"')
+            self.send_header("X-Linked-Size", "7")
+        self.end_headers()
+
+
+@pytest.fixture
+def base_url():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _LfsHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_fetch_pin_reads_lfs_headers(base_url):
+    assert gs.fetch_pin(f"{base_url}/lfs") == {"size": 7, "sha256": SHA}
+    assert gs.fetch_pin(f"{base_url}/plain") is None
+
+
+def test_model_check(tmp_path):
+    path = tmp_path / "model.bin"
+    path.write_bytes(b"weights")
+    pin = {"size": 7, "sha256": SHA}
+    assert gs.model_check(pin, path, SHA) == "OK"
+    assert gs.model_check(pin, path, "0" * 64) == "CORRUPT"
+    assert gs.model_check({"size": 8, "sha256": SHA}, path, SHA) == "SIZE MISMATCH"
+    assert gs.model_check(None, path, SHA) == "UNPINNED"
+    assert gs.model_check(pin, tmp_path / "absent.bin", None) == "MISSING"
+
+
+def test_unpinned_model_fails_verification(tmp_path, monkeypatch):
+    monkeypatch.setattr(gs, "MODEL_HASH_CACHE", tmp_path / "hashes.json")
+    monkeypatch.setattr(gs, "MODEL_PINS", tmp_path / "pins.json")
+    monkeypatch.setattr(gs, "BUILD_DIR", tmp_path / "build")
+    monkeypatch.setattr(gs, "fetch_pin", lambda url: None)  # Offline
+    monkeypatch.setitem(gs.CONFIG, "models_dir", str(tmp_path))
+    for info in gs.FLUX_MODELS.values():
+        dest = tmp_path / info["dest"]
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        dest.write_bytes(b"weights")
+    pinned = {name: dict(info, size=7, sha256=SHA) for name, info in gs.FLUX_MODELS.items()}
+    monkeypatch.setattr(gs, "FLUX_MODELS", pinned)
+    assert gs.verify_models()
+    pinned["vae"].update(size=None, sha256=None)
+    assert not gs.verify_models()
+
+
+class _Options:
+    def __init__(self, options):
+        self.options = options
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.options
+
+
+@pytest.fixture
+def forge_options(monkeypatch):
+    options = {"sd_model_checkpoint": "flux1-dev-Q4_K_S.gguf [abc]",
+               "forge_additional_modules": ["/models/VAE/ae.safetensors"]}
+    monkeypatch.setattr(gs.FORGE, "get", lambda *a, **kw: _Options(options))
+    monkeypatch.setitem(gs.CONFIG, "override_settings", {})
+    monkeypatch.setitem(gs.CONFIG, "require_checkpoint", None)
+    monkeypatch.setitem(gs.CONFIG, "require_vae", None)
+    return options
+
+
+def test_check_models_warns_on_other_checkpoint(forge_options, capsys):
+    assert gs.check_models()
+    assert "WARNING checkpoint" in capsys.readouterr().out
+
+
+def test_check_models_fails_on_pinned_mismatch(forge_options):
+    gs.CONFIG["require_checkpoint"] = "flux1-dev-Q8_0"
+    assert not gs.check_models()
+    gs.CONFIG["require_checkpoint"] = "Q4_K_S"
+    assert gs.check_models()
+
+
+@pytest.fixture
+def warmups(forge_options, monkeypatch):
+    """Record warm-up requests instead of sending them."""
+    sent = []
+    monkeypatch.setattr(gs, "_warmed_shapes", set())
+    monkeypatch.setattr(gs, "_models_checked", set())
+    monkeypatch.setattr(gs, "_timed_request", lambda endpoint, payload: sent.append(
+        (endpoint, payload["width"], payload["height"], payload["batch_size"])) or 0.1)
+    monkeypatch.setattr(gs, "load_telemetry", dict)
+    monkeypatch.setattr(gs, "save_telemetry", lambda telemetry: None)
+    return sent
+
+
+def test_warmup_covers_candidate_batches_and_sheets(monkeypatch):
+    monkeypatch.setitem(gs.CONFIG, "candidates", 3)
+    monkeypatch.setitem(gs.CONFIG, "sheet", 4)
+    jobs = gs.build_plan(["gear", "npcs"])
+    grid, cell = gs.sheet_shape(16)
+    assert set(gs.warmup_shapes(jobs)) == {("txt2img", cell * grid, cell * grid, 1),
+                                           ("txt2img", jobs[-1]["width"], jobs[-1]["height"], 3)}
+
+
+def test_warmup_covers_pose_batches():
+    job = gs.build_plan(["heroes"])[0]
+    assert set(gs.warmup_shapes([job], animate=True)) == {
+        ("img2img", job["width"], job["height"], count) for count, *_ in gs.ANIM_POSES.values()}
+
+
+def test_preflight_warms_each_shape_once(warmups, monkeypatch):
+    calls = []
+    get = gs.FORGE.get
+    monkeypatch.setattr(gs.FORGE, "get", lambda *a, **kw: calls.append(a) or get(*a, **kw))
+    jobs = gs.build_plan(["heroes"])
+    assert gs.preflight(jobs, animate=True)
+    assert len(warmups) == 2 * len(set(count for count, *_ in gs.ANIM_POSES.values()))
+    warmups.clear()
+    assert gs.preflight(jobs, animate=True)
+    assert warmups == [] and len(calls) == 1  # Models checked once, no shape re-warmed
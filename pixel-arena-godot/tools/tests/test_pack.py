@@ -0,0 +1,39 @@
+"""Web pack: content-hashed chunks built from the active output tree."""
+
+import hashlib
+import json
+
+from PIL import Image
+
+import generate_sprites as gs
+
+
+def _pack(tmp_path):
+    out = tmp_path / "pack"
+    gs.pack_assets(["misc_icons"], out)
+    return out, json.loads((out / gs.PACK_INDEX).read_text())
+
+
+def test_pack_reads_output_root_and_hashes_content(tmp_path, monkeypatch):
+    monkeypatch.setattr(gs, "BUILD_DIR", tmp_path / "build")
+    monkeypatch.setitem(gs.CONFIG, "output_root", str(tmp_path / "shard"))
+    jobs = gs.build_plan(["misc_icons"])
+    for i, job in enumerate(jobs[:2]):
+        job["out_path"].parent.mkdir(parents=True, exist_ok=True)
+        Image.new("RGBA", (4, 4), (i, 0, 0, 255)).save(job["out_path"], pnginfo=gs._provenance_chunk({"x": i}))
+
+    out, index = _pack(tmp_path)
+    assert set(index["assets"]) == {job["rel"] for job in jobs[:2]}
+    name = index["chunks"]["misc_icons"]
+    blob = (out / name).read_bytes()
+    assert name == f"sprites-misc_icons.{hashlib.sha256(blob).hexdigest()[:12]}.bin"
+    record = index["assets"][jobs[1]["rel"]]
+    data = blob[record["offset"]:record["offset"] + record["length"]]
+    assert data == gs.strip_png_text(jobs[1]["out_path"].read_bytes())
+    assert record["size"] == [4, 4]
+
+    # Unchanged files reuse the chunk; a changed file renames it and drops the old one
+    assert _pack(tmp_path)[1]["chunks"]["misc_icons"] == name
+    Image.new("RGBA", (4, 4), (9, 9, 9, 255)).save(jobs[0]["out_path"])
+    renamed = _pack(tmp_path)[1]["chunks"]["misc_icons"]
+    assert renamed != name and not (out / name).exists()
@@ -0,0 +1,82 @@
+"""run_plan against a stand-in Forge: dedup groups, icon sheets, retries."""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import generate_sprites as gs
+
+
+@pytest.fixture
+def forge(tmp_path, monkeypatch):
+    """Fake generate_images: solid images whose color encodes the seed (sheets: the cell)."""
+    monkeypatch.setattr(gs, "CONFIG", dict(gs.CONFIG, quality_gate=False, force=False))
+    monkeypatch.setattr(gs, "ASSETS_DIR", tmp_path / "assets")
+    monkeypatch.setattr(gs, "BUILD_DIR", tmp_path / "build")
+    monkeypatch.setattr(gs, "prepare", lambda job, raw: raw.convert("RGBA"))
+    calls = []
+
+    def generate_images(prompt, seed=-1, width=None, height=None, batch_size=1):
+        calls.append({"prompt": prompt, "seed": seed, "size": (width, height), "batch": batch_size})
+        if forge.fail and forge.fail(calls[-1]):
+            return None
+        if "icon sheet" in prompt:
+            grid = width // (gs.CONFIG["gen_size"] // gs.CONFIG["sheet"])
+            cells = np.arange(grid * grid, dtype=np.uint8).reshape(grid, grid) * 10 + 5
+            px = np.kron(cells, np.ones((height // grid, width // grid), dtype=np.uint8))
+            return [Image.fromarray(np.dstack([px, px, px]), "RGB")]
+        return [Image.new("RGB", (width, height), ((seed + n) % 251,) * 3) for n in range(batch_size)]
+
+    monkeypatch.setattr(gs, "generate_images", generate_images)
+    forge.calls, forge.fail = calls, None
+    return forge
+
+
+def _color(job):
+    with Image.open(job["out_path"]) as img:
+        return img.convert("RGB").getpixel((0, 0))[0]
+
+
+def test_dedup_group_shares_one_generation(forge):
+    job = gs.build_plan(["gear"])[0]
+    twin = dict(job, category="slot_icons", rel="x/twin.png", out_path=job["out_path"].with_name("twin.png"),
+                variants=[])
+    assert list(gs.group_jobs([job, twin]).values()) == [[job, twin]]
+    assert gs.run_plan([job, twin]) == 2
+    assert len(forge.calls) == 1
+    assert _color(job) == _color(twin) == job["seed"] % 251
+
+
+def test_retried_group_keeps_sharing_one_seed(forge, monkeypatch):
+    gs.CONFIG.update(quality_gate=True, sheet=2)
+    jobs = gs.build_plan(["gear"])[:4]
+    # Same inputs under another key (e.g. an explicit seed): one generation, two retry seeds
+    twin = dict(jobs[0], category="slot_icons", key="twin", rel="x/twin.png",
+                out_path=jobs[0]["out_path"].with_name("twin.png"), variants=[])
+    # Every sheet cell fails the gate; the single retries pass
+    monkeypatch.setattr(gs, "check_quality",
+                        lambda job, img: (["sheet"], {}) if len(forge.calls) == 1 else ([], {}))
+    assert gs.run_plan(jobs + [twin]) == 5
+    assert len(forge.calls) == 1 + 4  # The dedup pair still shares its retry generation
+    for out in (jobs[0], twin):
+        assert gs.read_provenance(out["out_path"])["seed"] == forge.calls[1]["seed"]
+        assert _color(out) == forge.calls[1]["seed"] % 251
+
+
+def test_sheet_cells_land_on_their_icons(forge):
+    gs.CONFIG["sheet"] = 2
+    jobs = gs.build_plan(["gear"])[:4]
+    assert gs.run_plan(jobs) == 4
+    assert len(forge.calls) == 1 and "icon sheet" in forge.calls[0]["prompt"]
+    assert [_color(job) for job in jobs] == [5, 15, 25, 35]  # Reading order
+    record = gs.read_provenance(jobs[3]["out_path"])
+    assert record["params"]["sheet"] == {"grid": 2, "cell": 3, "cell_size": 512}
+
+
+def test_failed_sheet_falls_back_to_single_generations(forge):
+    gs.CONFIG["sheet"] = 2
+    forge.fail = lambda call: "icon sheet" in call["prompt"]
+    jobs = gs.build_plan(["gear"])[:4]
+    assert gs.run_plan(jobs) == 4
+    assert [call["seed"] for call in forge.calls[1:]] == [job["seed"] for job in jobs]
+    assert all(job["out_path"].exists() for job in jobs)
@@ -0,0 +1,35 @@
+"""Provenance records the seed actually kept, and staleness follows the plan."""
+
+from PIL import Image
+
+import generate_sprites as gs
+
+
+def _save(job, seed, path):
+    gs.atomic_save(Image.new("RGBA", (8, 8)), path, gs.provenance(job, seed, "raw"))
+
+
+def test_retry_records_the_seed_it_used(tmp_path):
+    job = gs.build_plan(list(gs.CATEGORIES))[0]
+    retry = gs._retry_seed(job, 1)
+    path = tmp_path / "out.png"
+    _save(dict(job, seed=retry), retry, path)
+
+    record = gs.read_provenance(path)
+    assert record["seed"] == retry
+    assert record["fingerprint"] == gs.input_fingerprint(dict(job, seed=retry))
+    assert record["fingerprint"] != job["fingerprint"]
+    assert record["planned"] == job["fingerprint"]
+    assert gs.staleness(job, path) == "current"
+
+    changed = dict(job, prompt=job["prompt"] + ", glowing")
+    changed["fingerprint"] = gs.input_fingerprint(changed)
+    assert gs.staleness(changed, path) == "stale"
+
+
+def test_planned_seed_matches_plan(tmp_path):
+    job = gs.build_plan(list(gs.CATEGORIES))[0]
+    path = tmp_path / "out.png"
+    _save(job, job["seed"], path)
+    assert gs.read_provenance(path)["fingerprint"] == job["fingerprint"]
+    assert gs.staleness(job, path) == "current"
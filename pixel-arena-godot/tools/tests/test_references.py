@@ -0,0 +1,25 @@
+"""--reference-dir lookup: missing directories and files added later."""
+
+import os
+
+import generate_sprites as gs
+
+
+def test_missing_reference_dir_falls_back(tmp_path, monkeypatch, capsys):
+    monkeypatch.setitem(gs.CONFIG, "reference_dir", str(tmp_path / "nope"))
+    assert gs._find_reference("slime") is None
+    assert gs._find_reference("goblin") is None
+    assert capsys.readouterr().out.count("WARNING") == 1
+    assert gs.make_job("monsters", "slime")["ref"] is None
+
+
+def test_reference_added_later_is_found(tmp_path, monkeypatch):
+    monkeypatch.setitem(gs.CONFIG, "reference_dir", str(tmp_path))
+    (tmp_path / "slime.jpg").write_bytes(b"x")
+    assert gs._find_reference("slime") == tmp_path / "slime.jpg"
+    assert gs._find_reference("goblin") is None
+    (tmp_path / "goblin.png").write_bytes(b"x")
+    (tmp_path / "slime.png").write_bytes(b"x")
+    os.utime(tmp_path, ns=(0, os.stat(tmp_path).st_mtime_ns + 1))  # Coarse-mtime filesystems
+    assert gs._find_reference("goblin") == tmp_path / "goblin.png"
+    assert gs._find_reference("slime") == tmp_path / "slime.png"  # .png beats .jpg
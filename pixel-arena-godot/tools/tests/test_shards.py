@@ -0,0 +1,46 @@
+"""Sharding: a deterministic, balanced partition and the merge back into assets/."""
+
+import hashlib
+
+from PIL import Image
+
+import generate_sprites as gs
+
+
+def test_shards_partition_the_plan_and_keep_groups_whole():
+    jobs = gs.build_plan(list(gs.CATEGORIES))
+    jobs.append(dict(jobs[0], category="slot_icons", rel="x/twin.png", variants=[]))
+    shards = [gs.shard_jobs(jobs, i, 3) for i in (1, 2, 3)]
+    ids = [{id(job) for job in shard} for shard in shards]
+    assert sum(map(len, ids)) == len(jobs) and set().union(*ids) == {id(job) for job in jobs}
+    assert any(id(jobs[0]) in s and id(jobs[-1]) in s for s in ids)  # Dedup pair stays together
+    assert [[job["rel"] for job in shard] for shard in shards] == \
+           [[job["rel"] for job in gs.shard_jobs(jobs, i, 3)] for i in (1, 2, 3)]
+    loads = [sum(gs.job_cost(group[0]) for group in gs.group_jobs(shard).values()) for shard in shards]
+    assert max(loads) - min(loads) <= max(gs.job_cost(job) for job in jobs)
+
+
+def _shard_tree(root, files):
+    manifest, trim = {}, {}
+    for rel, color in files.items():
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        Image.new("RGBA", (4, 4), color).save(path)
+        manifest[rel] = {"seed": 1, "sha256": hashlib.sha256(path.read_bytes()).hexdigest()}
+        trim[rel] = {"offset": [1, 2], "canvas": [8, 8]}
+    gs.save_manifest(root, manifest)
+    gs.save_trim_index(root, trim)
+    return manifest
+
+
+def test_merge_copies_verified_files_and_indexes(tmp_path, monkeypatch):
+    assets = tmp_path / "assets"
+    monkeypatch.setattr(gs, "ASSETS_DIR", assets)
+    _shard_tree(tmp_path / "s1", {"a/one.png": (1, 0, 0, 255)})
+    _shard_tree(tmp_path / "s2", {"a/two.png": (2, 0, 0, 255), "a/bad.png": (3, 0, 0, 255)})
+    Image.new("RGBA", (4, 4), (9, 9, 9, 255)).save(tmp_path / "s2/a/bad.png")  # Changed after the run
+
+    gs.merge_shards([str(tmp_path / "s1"), str(tmp_path / "s2")])
+    assert sorted(p.name for p in (assets / "a").glob("*.png")) == ["one.png", "two.png"]
+    assert set(gs.load_manifest(assets)) == {"a/one.png", "a/two.png"}
+    assert set(gs.load_trim_index(assets)) == {"a/one.png", "a/two.png"}
@@ -0,0 +1,19 @@
+"""--status counts planned outputs, not every PNG in a category directory."""
+
+from PIL import Image
+
+import generate_sprites as gs
+
+
+def test_status_ignores_variants_and_strips(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(gs, "ASSETS_DIR", tmp_path)
+    monkeypatch.setattr(gs, "FLUX_MODELS", {})
+    heroes = tmp_path / "sprites/generated/heroes"
+    heroes.mkdir(parents=True)
+    for name in ("barbarian_base", "barbarian_base_portrait", "barbarian_base_anim", "stray"):
+        Image.new("RGBA", (8, 8)).save(heroes / f"{name}.png")
+    gs.show_status()
+    out = capsys.readouterr().out
+    assert f"HERO SPRITES (128x128)             1/{len(gs.HERO_BASES)}" in out
+    total = len({job["out_path"] for job in gs.build_plan(list(gs.CATEGORIES))})
+    assert f"1/{total} assets" in out
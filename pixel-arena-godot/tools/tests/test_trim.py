@@ -0,0 +1,48 @@
+"""Trimming: opaque-box crops, their index entries and the round trip back."""
+
+import numpy as np
+from PIL import Image
+
+import generate_sprites as gs
+
+
+def _sprite(box, size=(64, 64)):
+    px = np.zeros((size[1], size[0], 4), dtype=np.uint8)
+    left, top, right, bottom = box
+    px[top:bottom, left:right] = np.random.default_rng(0).integers(1, 256, (bottom - top, right - left, 4))
+    px[top:bottom, left:right, 3] = 255
+    return Image.fromarray(px, "RGBA")
+
+
+def test_trim_records_offset_and_pivot():
+    img = _sprite((10, 20, 30, 60))
+    trimmed, entry = gs.trim(img, 2)
+    assert trimmed.size == (24, 44)
+    assert entry == {"canvas": [64, 64], "offset": [8, 18], "size": [24, 44], "pivot": [24, 14]}
+    assert np.array_equal(np.asarray(gs.untrim(trimmed, entry)), np.asarray(img))
+
+
+def test_trim_clamps_padding_and_skips_tight_or_empty():
+    img = _sprite((0, 5, 64, 64))
+    trimmed, entry = gs.trim(img, 4)
+    assert entry["offset"] == [0, 1] and trimmed.size == (64, 63)
+    assert gs.trim(_sprite((0, 0, 64, 64)), 2)[1] is None
+    assert gs.trim(Image.new("RGBA", (16, 16)), 2)[1] is None
+
+
+def test_trim_existing_indexes_and_load_sprite_restores(tmp_path, monkeypatch):
+    monkeypatch.setattr(gs, "ASSETS_DIR", tmp_path)
+    monkeypatch.setattr(gs, "CONFIG", dict(gs.CONFIG, output_root=None))
+    job = gs.build_plan(["monsters"])[0]
+    job["out_path"].parent.mkdir(parents=True)
+    img = _sprite((20, 30, 50, 60), tuple(job["size"]))
+    img.save(job["out_path"])
+
+    gs.trim_existing(["monsters"], 1)
+    entry = gs.load_trim_index(tmp_path)[job["rel"]]
+    with Image.open(job["out_path"]) as saved:
+        assert list(saved.size) == entry["size"] == [32, 32]
+    assert np.array_equal(np.asarray(gs.load_sprite(job)), np.asarray(img))
+
+    gs.trim_existing(["monsters"], 3)  # Re-trims from the full canvas with the new padding
+    assert gs.load_trim_index(tmp_path)[job["rel"]]["size"] == [36, 36]